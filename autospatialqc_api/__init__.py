@@ -11,19 +11,30 @@ Additionally, it directly exports the following objects:
     * User: class that represents a user.
 """
 
-import logging
+import atexit
+import os
+import sqlite3
 from http import HTTPStatus
-from typing import Any, Mapping, Optional
+from typing import Any, Dict, Mapping, Optional
 
 import flask
 import pymysql
 from flask_jwt_extended import JWTManager
 
 from autospatialqc_api import models
-from autospatialqc_api.environment import require_env, require_envs
+from autospatialqc_api.compression import configure_compression
+from autospatialqc_api.environment import get_env, get_envs, require_env, require_envs
 from autospatialqc_api.models import Database, Permissions, Sample, User
-from autospatialqc_api.models.errors import ResponseError
-from autospatialqc_api.routes import authentication_blueprint, samples_blueprint
+from autospatialqc_api.models.backends import Backend, MySQLBackend, SQLiteBackend
+from autospatialqc_api.models.cache import LRUCache
+from autospatialqc_api.models.errors import HashingOverloaded, PoolTimeout, ResponseError
+from autospatialqc_api.models.hashing import PasswordHashingPool
+from autospatialqc_api.models.profiling import ExplainCapture, QueryProfiler, SlowQueryLog
+from autospatialqc_api.models.qc import QCThresholds
+from autospatialqc_api.models.snapshot import SampleSnapshot
+from autospatialqc_api.routes import authentication_blueprint, metrics_blueprint, samples_blueprint
+from autospatialqc_api.routes.metrics import UNHANDLED_DATABASE_ERRORS, collect_database_statistics
+from autospatialqc_api.structured_logging import configure_logging
 
 __all__ = [
     # Sub-Modules
@@ -36,6 +47,111 @@ __all__ = [
 ]
 
 
+def create_backend() -> Backend:
+    """Create the app's storage backend from environmental variables.
+
+    `DB_BACKEND` selects "mysql", the default, or "sqlite". SQLite databases are stored at `DB_PATH`, which defaults to
+    ":memory:".
+
+    Returns:
+        The Backend for the API's database.
+
+    Raises:
+        RequiredEnvironmentalUnprovided: if the backend is MySQL and any connection variable is not provided.
+        ValueError: if the backend is unknown.
+    """
+
+    backend = (get_env("DB_BACKEND") or "mysql").lower()
+
+    if backend == "mysql":
+        return MySQLBackend(
+            **require_envs(
+                host="DB_HOST",
+                database="DB_NAME",
+                username="DB_USERNAME",
+                password="DB_PASSWORD",
+            )
+        )
+    if backend == "sqlite":
+        return SQLiteBackend(get_env("DB_PATH") or ":memory:")
+
+    raise ValueError(f"Unknown database backend '{backend}'.")
+
+
+def create_database() -> Database:
+    """Create the app's database from environmental variables.
+
+    Connections are only opened once the database is first queried, so this is safe to call before forking worker
+    processes. In-memory SQLite databases are the exception, since they are opened up front and are not shared with
+    other processes.
+
+    Returns:
+        The Database for the API.
+
+    Raises:
+        RequiredEnvironmentalUnprovided: if the backend is MySQL and any connection variable is not provided.
+        ValueError: if the backend is unknown.
+    """
+
+    hashing = PasswordHashingPool(
+        **{
+            option: int(value)
+            for option, value in get_envs(
+                workers="ARGON2_WORKERS",
+                queue_limit="ARGON2_QUEUE_LIMIT",
+                time_cost="ARGON2_TIME_COST",
+                memory_cost="ARGON2_MEMORY_COST",
+                parallelism="ARGON2_PARALLELISM",
+            ).items()
+        }
+    )
+
+    pool_options: Dict[str, Any] = {
+        **{
+            option: int(value)
+            for option, value in get_envs(pool_size="DB_POOL_SIZE", pool_min_size="DB_POOL_MIN_SIZE").items()
+        },
+        **{
+            option: float(value)
+            for option, value in get_envs(pool_timeout="DB_POOL_TIMEOUT", pool_recycle="DB_POOL_RECYCLE").items()
+        },
+    }
+
+    cache_options = get_envs(max_size="SAMPLE_CACHE_SIZE", ttl="SAMPLE_CACHE_TTL")
+    cache = (
+        LRUCache(max_size=int(cache_options["max_size"]), ttl=float(cache_options.get("ttl", 60.0)))
+        if "max_size" in cache_options
+        else None
+    )
+
+    statistics_options: Dict[str, Any] = {
+        option: float(value) for option, value in get_envs(statistics_max_age="SAMPLE_STATS_MAX_AGE").items()
+    }
+
+    qc_thresholds = None
+    if (qc_thresholds_path := get_env("QC_THRESHOLDS")) is not None:
+        with open(qc_thresholds_path) as file:
+            qc_thresholds = QCThresholds.model_validate_json(file.read())
+
+    slow_query_seconds = float(threshold) if (threshold := get_env("SLOW_QUERY_SECONDS")) is not None else None
+
+    database = Database(
+        backend=create_backend(),
+        **pool_options,
+        cache=cache,
+        hashing=hashing,
+        **statistics_options,
+        qc_thresholds=qc_thresholds,
+        profiler=None if slow_query_seconds is None else QueryProfiler([SlowQueryLog(slow_query_seconds)]),
+    )
+
+    explain = (get_env("SLOW_QUERY_EXPLAIN") or "").lower() == "true"
+    if database.profiler is not None and slow_query_seconds is not None and explain:
+        database.profiler.hooks.insert(0, ExplainCapture(database, slow_query_seconds))
+
+    return database
+
+
 def create_app(test_config: Optional[Mapping[str, Any]] = None) -> flask.Flask:
     """Create main Flask app.
 
@@ -48,17 +164,15 @@ def create_app(test_config: Optional[Mapping[str, Any]] = None) -> flask.Flask:
 
     app = flask.Flask(__name__, instance_relative_config=True)
 
-    # Configure logging
-    if app.debug:
-        file_handler = logging.FileHandler("logs/debug.log", mode="w")
-    else:
-        file_handler = logging.FileHandler("logs/app.log")
-    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-    file_handler.setFormatter(formatter)
-    app.logger.addHandler(file_handler)
+    configure_logging(app)
+    configure_compression(app)
 
     app.config.from_mapping(
         JWT_SECRET_KEY=require_env("JWT_SECRET_KEY"),
+        # Tokens in the original format, which are still accepted, have the whole user as their subject rather than a
+        # string
+        JWT_VERIFY_SUB=False,
+        METRICS_TOKEN=get_env("METRICS_TOKEN"),
     )
 
     JWTManager(app)
@@ -68,28 +182,55 @@ def create_app(test_config: Optional[Mapping[str, Any]] = None) -> flask.Flask:
     else:
         app.config.from_mapping(test_config)
 
+    # The database, with its connection pool, caches and password hashing, is shared by every request of this process
+    app.extensions["database"] = database = app.config.get("DATABASE") or create_database()
+    atexit.register(database.close)
+    collect_database_statistics(database)
+
+    app.extensions["sample_snapshot"] = SampleSnapshot(
+        app.config.get("SAMPLE_SNAPSHOT_DIR") or os.path.join(app.instance_path, "snapshot")
+    )
+
     @app.before_request
     def _():
-        if "database" not in flask.g:
-            flask.g.database = Database(
-                **require_envs(
-                    host="DB_HOST",
-                    database="DB_NAME",
-                    username="DB_USERNAME",
-                    password="DB_PASSWORD",
-                )
-            )
+        flask.g.database = database
+        # Build the sample statistics before the first write needs them, rather than scanning the table in that
+        # request. Each worker builds its own on its first request, since threads are not inherited by forks.
+        database.prepare_sample_statistics()
 
     @app.errorhandler(ResponseError)
     def _(error: ResponseError) -> flask.Response:
         return error.response
 
+    @app.errorhandler(PoolTimeout)
+    def _(error: PoolTimeout) -> flask.Response:
+        app.logger.error("Database connection pool exhausted: %s.", error)
+        # Aborting here would raise from the error handler, which Flask turns into a 500
+        return flask.make_response("The database is busy. Please try again later.", HTTPStatus.SERVICE_UNAVAILABLE)
+
+    @app.errorhandler(HashingOverloaded)
+    def _(error: HashingOverloaded) -> flask.Response:
+        app.logger.warning("Password hashing pool full: %s.", error)
+        response = flask.make_response(
+            "Too many concurrent logins. Please try again later.", HTTPStatus.SERVICE_UNAVAILABLE
+        )
+        response.retry_after = error.retry_after
+        return response
+
     @app.errorhandler(pymysql.Error)
     def _(error: pymysql.Error) -> flask.Response:
-        logging.error(f"Unhandled PyMySQL error raised: {str(error)}.")
+        app.logger.error("Unhandled PyMySQL error raised: %s.", error)
+        UNHANDLED_DATABASE_ERRORS.labels(type(error).__name__).inc()
+        flask.abort(HTTPStatus.INTERNAL_SERVER_ERROR)
+
+    @app.errorhandler(sqlite3.Error)
+    def _(error: sqlite3.Error) -> flask.Response:
+        app.logger.error("Unhandled SQLite error raised: %s.", error)
+        UNHANDLED_DATABASE_ERRORS.labels(type(error).__name__).inc()
         flask.abort(HTTPStatus.INTERNAL_SERVER_ERROR)
 
     app.register_blueprint(authentication_blueprint)
     app.register_blueprint(samples_blueprint)
+    app.register_blueprint(metrics_blueprint)
 
     return app
@@ -0,0 +1,216 @@
+"""Module for compressing responses with the encodings clients accept.
+
+Responses are compressed by an `after_request` hook, once their body is known. Bodies held in memory are compressed in
+one pass, and streamed bodies are compressed chunk by chunk as they are sent, with every chunk flushed so that clients
+receive data as soon as the route produces it.
+
+Brotli and Zstandard are only offered when the `brotli` and `zstandard` packages are installed, which
+`poetry install --extras compression` does; gzip is always available.
+
+Exported objects include:
+
+    * available_encodings: function that lists the encodings this process can produce.
+    * configure_compression: function that enables compression for an app.
+"""
+
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import flask
+
+try:
+    import brotli  # type: ignore[import-untyped,import-not-found,unused-ignore]
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard  # type: ignore[import-not-found,unused-ignore]
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+from autospatialqc_api.environment import get_env
+
+# Only text is worth compressing; the API's binary downloads, such as snapshot columns, are served from files as is
+_COMPRESSIBLE_MIMETYPES = {"application/json", "application/x-ndjson", "text/csv", "text/html", "text/plain"}
+
+_DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+
+class _Compressor(ABC):
+    """Incremental compressor for one response body."""
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk, returning whatever output is ready."""
+
+    @abstractmethod
+    def flush(self) -> bytes:
+        """Return the output for everything compressed so far, without ending the stream."""
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        """End the stream, returning the rest of the output."""
+
+
+class _GzipCompressor(_Compressor):
+    def __init__(self, level: int):
+        self.__compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.__compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.__compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor(_Compressor):
+    def __init__(self, level: int):
+        self.__compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.__compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.__compressor.finish()
+
+
+class _ZstdCompressor(_Compressor):
+    def __init__(self, level: int):
+        self.__compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.__compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self.__compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self.__compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encodings() -> List[str]:
+    """List the content codings this process can produce, in order of preference."""
+
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def _factories() -> Dict[str, Callable[[int], _Compressor]]:
+    compressors = {"zstd": _ZstdCompressor, "br": _BrotliCompressor, "gzip": _GzipCompressor}
+    return {encoding: compressors[encoding] for encoding in available_encodings()}
+
+
+def parse_levels(value: Optional[str]) -> Dict[str, int]:
+    """Parse compression levels written as comma-separated `encoding=level` pairs, such as "gzip=5,zstd=6".
+
+    Returns:
+        The level of every available encoding, with defaults for those that are not listed.
+
+    Raises:
+        ValueError: if a pair is malformed or names an unknown encoding.
+    """
+
+    levels = {encoding: _DEFAULT_LEVELS[encoding] for encoding in available_encodings()}
+    for pair in filter(None, (pair.strip() for pair in (value or "").split(","))):
+        encoding, _, level = pair.partition("=")
+        if (encoding := encoding.strip()) not in _DEFAULT_LEVELS:
+            raise ValueError(f"Unknown compression encoding '{encoding}'.")
+        if encoding in levels:
+            levels[encoding] = int(level)
+    return levels
+
+
+class _CompressedStream:
+    """Streamed body that compresses the chunks of another, flushing the compressor after each one."""
+
+    def __init__(self, chunks: Iterable[Any], compressor: _Compressor):
+        self.__chunks = chunks
+        self.__compressor = compressor
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self.__chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if chunk and (output := self.__compressor.compress(chunk) + self.__compressor.flush()):
+                yield output
+        yield self.__compressor.finish()
+
+    def close(self):
+        # Let the route's generator release what it holds, such as a database connection, if the client goes away
+        if (close := getattr(self.__chunks, "close", None)) is not None:
+            close()
+
+
+def _compressible(response: flask.Response) -> bool:
+    return (
+        response.status_code == 200
+        and response.mimetype in _COMPRESSIBLE_MIMETYPES
+        and "Content-Encoding" not in response.headers
+        and not response.direct_passthrough
+    )
+
+
+def configure_compression(app: flask.Flask):
+    """Compress the app's text responses with the best encoding each client accepts.
+
+    Compression is configured by the following environmental variables, all of which are optional:
+
+        * COMPRESSION_MIN_SIZE: the size in bytes below which bodies are sent as they are. Streamed bodies, whose size
+          is unknown, are always compressed. Defaults to 1024.
+        * COMPRESSION_LEVELS: comma-separated `encoding=level` pairs, such as "gzip=5,zstd=6". Default to 6 for gzip,
+          4 for Brotli and 3 for Zstandard.
+
+    Set the app's `COMPRESSION_ENABLED` configuration to False to turn compression off.
+
+    Arguments:
+        app (flask.Flask): the app.
+    """
+
+    min_size = int(get_env("COMPRESSION_MIN_SIZE") or 1024)
+    levels = parse_levels(get_env("COMPRESSION_LEVELS"))
+    factories = _factories()
+
+    @app.after_request
+    def _(response: flask.Response) -> flask.Response:
+        if not app.config.get("COMPRESSION_ENABLED", True) or not _compressible(response):
+            return response
+
+        # Caches must not serve a compressed body to clients that did not ask for one, or the other way around
+        response.vary.add("Accept-Encoding")
+
+        if flask.request.method == "HEAD":
+            return response
+        # Ties between encodings the client weighs equally go to the most efficient one
+        if (encoding := flask.request.accept_encodings.best_match(list(factories))) is None:
+            return response
+
+        compressor = factories[encoding](levels[encoding])
+
+        if response.is_streamed:
+            response.response = _CompressedStream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            if len(data := response.get_data()) < min_size:
+                return response
+            response.set_data(compressor.compress(data) + compressor.finish())
+
+        response.content_encoding = encoding
+
+        # The compressed body is a different representation, so a strong tag would no longer identify its bytes
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+
+        return response
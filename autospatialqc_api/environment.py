@@ -6,6 +6,7 @@ and '.env.secret', in order of increasing priority.
 This file's main use is as an imported module, which contains the following objects:
 
     * get_env: method for getting an environmental variable that may not exist.
+    * get_envs: method for getting the environmental variables that exist out of several.
     * require_env: method for getting an environmental variable that must exist.
     * RequiredEnvironmentalUnprovided: exception for when a required environmental can't be found.
 """
@@ -35,6 +36,19 @@ def get_env(identifier: str) -> Optional[str]:
     return os.getenv(identifier)
 
 
+def get_envs(**aliases: str) -> Dict[str, str]:
+    """Get the environmental variables that exist out of several.
+
+    Arguments:
+        aliases (str): alias to variable mappings.
+
+    Returns:
+        An alias -> value mapping of the environmental variables that are provided.
+    """
+
+    return {alias: value for alias, var in aliases.items() if (value := get_env(var)) is not None}
+
+
 class RequiredEnvironmentalUnprovided(Exception):
     """Raised when a required environmental variable is not provided."""
 
@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Type, Union
+
+import pymysql.cursors
+from pymysql.constants import CLIENT
+
+_NAMED_PARAMETER = re.compile(r"%\((\w+)\)s")
+
+# Columns that SQLite stores as text and that are read back as datetimes
+_SQLITE_TIMESTAMP_COLUMNS = frozenset({"created_at", "updated_at"})
+
+_SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        internal_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+        email           TEXT NOT NULL UNIQUE,
+        first_name      TEXT NOT NULL,
+        last_name       TEXT NOT NULL,
+        password_hash   TEXT NOT NULL,
+        created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TRIGGER IF NOT EXISTS users_updated_at AFTER UPDATE ON users
+    WHEN NEW.updated_at = OLD.updated_at
+    BEGIN
+        UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE internal_id = NEW.internal_id;
+    END;
+
+    CREATE TABLE IF NOT EXISTS permissions (
+        id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+        permission_name     TEXT NOT NULL,
+        description         TEXT
+    );
+
+    INSERT OR IGNORE INTO permissions (id, permission_name, description) VALUES
+        (1, 'get_sample', 'Allows getting a sample'),
+        (2, 'post_sample', 'Allows posting a sample'),
+        (3, 'delete_sample', 'Allows deleting a sample'),
+        (4, 'create_user', 'Allows creating a new user'),
+        (5, 'change_password', 'Allows a user to change their own password');
+
+    CREATE TABLE IF NOT EXISTS user_permissions (
+        user_id         INTEGER NOT NULL REFERENCES users(internal_id),
+        permission_id   INTEGER NOT NULL REFERENCES permissions(id),
+        PRIMARY KEY (user_id, permission_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS samples (
+        id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+
+        assay                   TEXT NOT NULL,
+        tissue                  TEXT NOT NULL,
+
+        area                    REAL NOT NULL,
+        assigned_transcripts    REAL NOT NULL,
+        cell_count              INTEGER NOT NULL,
+        cell_over25_count       INTEGER NOT NULL,
+        complexity              REAL NOT NULL,
+        false_discovery_rate    REAL NOT NULL,
+        median_counts           REAL NOT NULL,
+        median_genes            REAL NOT NULL,
+        reference_correlation   REAL NOT NULL,
+        sparsity                REAL NOT NULL,
+        volume                  REAL NOT NULL,
+        x_transcript_count      INTEGER NOT NULL,
+        y_transcript_count      INTEGER NOT NULL,
+        transcripts_per_area    REAL NOT NULL,
+        transcripts_per_feature REAL NOT NULL,
+
+        qc_status               TEXT CHECK (qc_status IN ('pass', 'warn', 'fail')),
+        qc_flags                TEXT,
+
+        version                 INTEGER NOT NULL DEFAULT 1,
+
+        created_at              TIMESTAMP DEFAULT (STRFTIME('%Y-%m-%d %H:%M:%f', 'now')),
+        updated_at              TIMESTAMP DEFAULT (STRFTIME('%Y-%m-%d %H:%M:%f', 'now')),
+
+        UNIQUE (assay, tissue)
+    );
+
+    CREATE INDEX IF NOT EXISTS samples_updated_at ON samples (updated_at);
+
+    CREATE TRIGGER IF NOT EXISTS samples_updated_at AFTER UPDATE ON samples
+    WHEN NEW.updated_at = OLD.updated_at
+    BEGIN
+        UPDATE samples SET updated_at = STRFTIME('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id;
+    END;
+"""
+
+
+class Backend(ABC):
+    """Interface for the database servers and engines that can store the application's data.
+
+    Connections made by a backend behave like PyMySQL connections with dictionary cursors: they take `%s` and
+    `%(name)s` parameters, and their cursors are context managers that return rows as dictionaries. The few
+    statements whose syntax differs between engines are built by the backend.
+    """
+
+    # Base class of the errors raised by connections, and of the errors raised on constraint violations
+    Error: Type[Exception]
+    IntegrityError: Type[Exception]
+
+    # The maximum number of connections the engine supports at once, or None for no limit
+    max_connections: Optional[int] = None
+
+    @abstractmethod
+    def connect(self) -> Any:
+        """Open a new connection."""
+
+    @abstractmethod
+    def streaming_cursor(self, connection: Any) -> Any:
+        """Open a cursor that reads rows from the engine as they are consumed, rather than all at once."""
+
+    @abstractmethod
+    def ignore_duplicates(self, column: str) -> str:
+        """Get the clause that makes an INSERT skip rows that duplicate a unique key.
+
+        Arguments:
+            column (str): a column of the table, which is left unchanged.
+        """
+
+    @abstractmethod
+    def upsert(self, keys: Sequence[str], columns: Sequence[str]) -> str:
+        """Get the clause that makes an INSERT overwrite the rows that duplicate a unique key.
+
+        Arguments:
+            keys (Sequence[str]): the columns of the unique key.
+            columns (Sequence[str]): the columns to overwrite with the inserted values.
+        """
+
+    def rows_in(self, columns: Sequence[str], count: int) -> str:
+        """Get the condition that matches rows whose values of some columns equal any of several tuples.
+
+        The condition takes the values of each tuple in turn as `%s` parameters, and can use a composite index on the
+        columns. It defaults to a row constructor IN list.
+
+        Arguments:
+            columns (Sequence[str]): the columns to compare.
+            count (int): the number of tuples, which must be positive.
+        """
+
+        row = f"({', '.join(['%s'] * len(columns))})"
+        return f"({', '.join(columns)}) IN ({', '.join([row] * count)})"
+
+    def lock_for_update(self, connection: Any) -> str:
+        """Make the rows a connection's transaction reads next unchangeable by other connections until it ends.
+
+        Arguments:
+            connection (Any): the connection, which must be in the transaction that will change the rows.
+
+        Returns:
+            The clause to end the SELECT statements that read the rows with. Defaults to "FOR UPDATE".
+        """
+
+        return "FOR UPDATE"
+
+    def explain(self, sql: str) -> str:
+        """Get the statement that reads the engine's query plan for another statement.
+
+        Arguments:
+            sql (str): the statement to explain.
+        """
+
+        return f"EXPLAIN {sql}"
+
+    def close(self):
+        """Release anything the backend holds besides its connections."""
+
+
+class MySQLBackend(Backend):
+    """Backend for a MySQL server, through PyMySQL."""
+
+    Error = pymysql.Error
+    IntegrityError = pymysql.IntegrityError
+
+    def __init__(self, host: str, database: str, username: str, password: str):
+        """Initializes a new MySQL backend.
+
+        Arguments:
+            host (str): the database's host.
+            database (str): the database to use.
+            username (str): the SQL user's username.
+            password (str): the SQL user's password.
+        """
+
+        self.__host = host
+        self.__database = database
+        self.__username = username
+        self.__password = password
+
+    def connect(self) -> pymysql.Connection:
+        return pymysql.connect(
+            host=self.__host,
+            user=self.__username,
+            password=self.__password,
+            database=self.__database,
+            cursorclass=pymysql.cursors.DictCursor,
+            # Count the rows an UPDATE matched rather than changed, as SQLite does, so that rewriting a row with its
+            # own values is not mistaken for a missing row
+            client_flag=CLIENT.FOUND_ROWS,
+        )
+
+    def streaming_cursor(self, connection: pymysql.Connection) -> pymysql.cursors.SSDictCursor:
+        return connection.cursor(pymysql.cursors.SSDictCursor)
+
+    def ignore_duplicates(self, column: str) -> str:
+        # Unlike INSERT IGNORE, this still raises on foreign key violations
+        return f"ON DUPLICATE KEY UPDATE {column} = {column}"
+
+    def upsert(self, keys: Sequence[str], columns: Sequence[str]) -> str:
+        return f"ON DUPLICATE KEY UPDATE {', '.join(f'{column} = VALUES({column})' for column in columns)}"
+
+
+def _adapt_parameters(parameters: Union[Sequence[Any], Mapping[str, Any]]) -> Union[Sequence[Any], Mapping[str, Any]]:
+    """Write the datetimes among an SQLite statement's parameters in the format of the schema's timestamps."""
+
+    if isinstance(parameters, Mapping):
+        return {
+            key: value.isoformat(" ", "milliseconds") if isinstance(value, datetime) else value
+            for key, value in parameters.items()
+        }
+    return [value.isoformat(" ", "milliseconds") if isinstance(value, datetime) else value for value in parameters]
+
+
+def _sqlite_row(cursor: sqlite3.Cursor, row: Sequence[Any]) -> Dict[str, Any]:
+    """Build a dictionary from an SQLite row, reading timestamps as datetimes."""
+
+    return {
+        column[0]: (
+            datetime.fromisoformat(value)
+            if column[0] in _SQLITE_TIMESTAMP_COLUMNS and isinstance(value, str)
+            else value
+        )
+        for column, value in zip(cursor.description, row)
+    }
+
+
+class _SQLiteCursor:
+    """Cursor of an SQLite connection that takes PyMySQL-style parameters and returns rows as dictionaries."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self.__cursor = cursor
+
+    def __enter__(self) -> _SQLiteCursor:
+        return self
+
+    def __exit__(self, *_: Any):
+        self.close()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.fetchone, None)
+
+    @property
+    def rowcount(self) -> int:
+        return self.__cursor.rowcount
+
+    @property
+    def lastrowid(self) -> Optional[int]:
+        return self.__cursor.lastrowid
+
+    def execute(self, sql: str, parameters: Union[Sequence[Any], Mapping[str, Any], Any, None] = None):
+        if parameters is None:
+            parameters = ()
+        elif not isinstance(parameters, (Sequence, Mapping)) or isinstance(parameters, str):
+            parameters = (parameters,)
+        self.__cursor.execute(self.__translate(sql), _adapt_parameters(parameters))
+
+    def executemany(self, sql: str, parameters: Sequence[Union[Sequence[Any], Mapping[str, Any]]]):
+        self.__cursor.executemany(self.__translate(sql), map(_adapt_parameters, parameters))
+
+    def fetchone(self) -> Optional[Dict[str, Any]]:
+        return self.__cursor.fetchone()
+
+    def fetchall(self) -> List[Dict[str, Any]]:
+        return self.__cursor.fetchall()
+
+    def close(self):
+        self.__cursor.close()
+
+    @staticmethod
+    def __translate(sql: str) -> str:
+        return _NAMED_PARAMETER.sub(r":\1", sql).replace("%s", "?").replace("%%", "%")
+
+
+class _SQLiteConnection:
+    """SQLite connection with the subset of the PyMySQL connection interface used by Database."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.__connection = connection
+        self.__connection.row_factory = _sqlite_row
+        self.open = True
+
+    def cursor(self) -> _SQLiteCursor:
+        return _SQLiteCursor(self.__connection.cursor())
+
+    def ping(self, reconnect: bool = False):
+        if not self.open:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+
+    def commit(self):
+        self.__connection.commit()
+
+    def rollback(self):
+        self.__connection.rollback()
+
+    def begin_immediate(self):
+        """Start a transaction that holds the database's write lock, unless one is already open."""
+
+        if not self.__connection.in_transaction:
+            self.__connection.execute("BEGIN IMMEDIATE")
+
+    def close(self):
+        self.open = False
+        self.__connection.close()
+
+
+class SQLiteBackend(Backend):
+    """Backend for an embedded SQLite database, in a file or in memory.
+
+    The schema is created when the database is first opened. In-memory databases are shared by every connection of
+    the backend and live as long as it does; since SQLite locks them per table, they allow one connection at a time.
+
+    Timestamps are stored as text with milliseconds, and converted by each connection rather than by adapters
+    registered with the `sqlite3` module, so other users of `sqlite3` in the process are unaffected.
+    """
+
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, path: str = ":memory:", timeout: float = 5.0):
+        """Initializes a new SQLite backend.
+
+        Arguments:
+            path (str): the database file, or ":memory:" for a database that only lives as long as this backend.
+              Defaults to ":memory:".
+            timeout (float): seconds to wait for another connection's write lock. Defaults to 5.
+        """
+
+        self.path = path
+        self.timeout = timeout
+
+        self.__lock = threading.Lock()
+        self.__initialized = False
+        self.__keeper: Optional[sqlite3.Connection] = None
+        self.__uri: Optional[str] = None
+
+        if path == ":memory:":
+            self.__uri = f"file:autospatialqc-{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self.max_connections = 1
+            # The database is dropped when its last connection closes
+            self.__keeper = self.__open()
+
+    def __open(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.__uri or self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            uri=self.__uri is not None,
+        )
+        connection.execute("PRAGMA foreign_keys = ON")
+
+        with self.__lock:
+            if not self.__initialized:
+                if self.__uri is None:
+                    connection.execute("PRAGMA journal_mode = WAL")
+                connection.executescript(_SQLITE_SCHEMA)
+                self.__initialized = True
+
+        return connection
+
+    def connect(self) -> _SQLiteConnection:
+        return _SQLiteConnection(self.__open())
+
+    def streaming_cursor(self, connection: _SQLiteConnection) -> _SQLiteCursor:
+        # SQLite cursors already step through results one row at a time
+        return connection.cursor()
+
+    def ignore_duplicates(self, column: str) -> str:
+        return "ON CONFLICT DO NOTHING"
+
+    def upsert(self, keys: Sequence[str], columns: Sequence[str]) -> str:
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns)
+        return f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {assignments}"
+
+    def lock_for_update(self, connection: _SQLiteConnection) -> str:
+        # SQLite locks the whole database rather than rows. Statements outside of a transaction do not open one, so
+        # a transaction that has not written yet takes the write lock up front. One that has already holds it.
+        connection.begin_immediate()
+        return ""
+
+    def rows_in(self, columns: Sequence[str], count: int) -> str:
+        # SQLite scans the table for row values IN a VALUES list, but searches the index once per OR term
+        row = f"({' AND '.join(f'{column} = %s' for column in columns)})"
+        return f"({' OR '.join([row] * count)})"
+
+    def explain(self, sql: str) -> str:
+        return f"EXPLAIN QUERY PLAN {sql}"
+
+    def close(self):
+        if self.__keeper is not None:
+            self.__keeper.close()
+            self.__keeper = None
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+import pydantic
+
+
+class CacheStatistics(pydantic.BaseModel):
+    """Snapshot of a cache's size and lifetime counters."""
+
+    size: int
+    max_size: Optional[int]
+
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+
+class Cache(ABC):
+    """Interface for the key-value caches that can sit in front of the database.
+
+    Implementations that are shared between processes are responsible for serializing keys and values.
+    """
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Any:
+        """Get a cached value.
+
+        Arguments:
+            key (Hashable): the value's key.
+
+        Returns:
+            The cached value, which may be None.
+
+        Raises:
+            KeyError: if the key is not cached, or has expired.
+        """
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Cache a value.
+
+        Arguments:
+            key (Hashable): the value's key.
+            value (Any): the value to cache.
+            ttl (float | None): seconds until the value expires, or None for the cache's default. Defaults to None.
+        """
+
+    @abstractmethod
+    def delete(self, key: Hashable):
+        """Remove a value from the cache, if it is cached.
+
+        Arguments:
+            key (Hashable): the value's key.
+        """
+
+    @abstractmethod
+    def clear(self):
+        """Remove every value from the cache."""
+
+    @abstractmethod
+    def statistics(self) -> CacheStatistics:
+        """Get a snapshot of this cache's counters."""
+
+
+class LRUCache(Cache):
+    """In-process, thread-safe cache with a size bound, least-recently-used eviction, and per-entry expiry."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 60.0):
+        """Initializes a new cache.
+
+        Arguments:
+            max_size (int): the maximum number of entries. Defaults to 1024.
+            ttl (float | None): default seconds until an entry expires, or None to never expire entries. Defaults to
+              60.
+        """
+
+        if max_size < 1:
+            raise ValueError("`max_size` must be at least 1.")
+
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.__lock = threading.Lock()
+        self.__entries: OrderedDict[Hashable, Tuple[Any, Optional[float]]] = OrderedDict()
+
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__expirations = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self.__lock:
+            try:
+                value, expires_at = self.__entries[key]
+            except KeyError:
+                self.__misses += 1
+                raise
+
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.__entries[key]
+                self.__expirations += 1
+                self.__misses += 1
+                raise KeyError(key)
+
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+
+        with self.__lock:
+            self.__entries[key] = (value, expires_at)
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                self.__evictions += 1
+
+    def delete(self, key: Hashable):
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def statistics(self) -> CacheStatistics:
+        with self.__lock:
+            return CacheStatistics(
+                size=len(self.__entries),
+                max_size=self.max_size,
+                hits=self.__hits,
+                misses=self.__misses,
+                evictions=self.__evictions,
+                expirations=self.__expirations,
+            )
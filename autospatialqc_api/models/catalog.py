@@ -0,0 +1,123 @@
+import threading
+import time
+from functools import reduce
+from operator import or_ as bit_or
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from autospatialqc_api.models.errors import UnknownPermission
+from autospatialqc_api.models.user import Permissions
+
+
+class PermissionCatalog:
+    """In-memory copy of the permissions table, mapping its ids and names to Permissions flags.
+
+    The catalog is loaded on first use, and reloaded on demand with `refresh` or when an unknown id or name is seen.
+    Unknown ids and names cause at most one reload per `refresh_interval`, so that requests naming permissions that do
+    not exist cannot make every lookup read the table.
+    """
+
+    def __init__(self, load: Callable[[], Iterable[Tuple[int, str]]], refresh_interval: Optional[float] = 60.0):
+        """Initializes a new, unloaded permission catalog.
+
+        Arguments:
+            load (Callable[[], Iterable[Tuple[int, str]]]): function that reads every (id, name) pair of the
+              permissions table.
+            refresh_interval (float | None): the minimum number of seconds between reloads caused by unknown ids or
+              names, or None to never reload on them once loaded. Defaults to 60.
+        """
+
+        self.__load = load
+        self.refresh_interval = refresh_interval
+        self.__lock = threading.Lock()
+        self.__refresh_lock = threading.Lock()
+        self.__ids: Optional[Dict[str, int]] = None
+        self.__flags: Dict[int, Permissions] = {}
+        self.__loaded_at: Optional[float] = None
+
+    def refresh(self):
+        """Reload the catalog from the permissions table."""
+
+        self.update(self.__load())
+
+    def update(self, rows: Iterable[Tuple[int, str]]):
+        """Replace the catalog's contents.
+
+        Arguments:
+            rows (Iterable[Tuple[int, str]]): every (id, name) pair of the permissions table.
+        """
+
+        rows = list(rows)
+        with self.__lock:
+            self.__ids = {name: permission_id for permission_id, name in rows}
+            self.__flags = {permission_id: Permissions.from_str(name) for permission_id, name in rows}
+            self.__loaded_at = time.monotonic()
+
+    def knows(self, names: Iterable[str] = (), ids: Iterable[int] = ()) -> bool:
+        """Check whether the catalog is loaded and has some permissions.
+
+        Arguments:
+            names (Iterable[str]): permission names to look up. Defaults to none.
+            ids (Iterable[int]): permission ids to look up. Defaults to none.
+
+        Returns:
+            Whether every name and id is in the catalog.
+        """
+
+        known = self.__ids
+        return (
+            known is not None
+            and all(name in known for name in names)
+            and all(permission_id in self.__flags for permission_id in ids)
+        )
+
+    def ids(self, names: Iterable[str]) -> List[int]:
+        """Get the ids of permissions from their names.
+
+        Arguments:
+            names (Iterable[str]): the permissions' names.
+
+        Returns:
+            The id of each permission, in order.
+
+        Raises:
+            UnknownPermission: if any name is not in the catalog, even after any refresh it is due.
+        """
+
+        names = list(names)
+        if not self.knows(names=names):
+            self.__refresh_unknown(lambda: self.knows(names=names))
+
+        ids = self.__ids or {}
+        if unknown := [name for name in names if name not in ids]:
+            raise UnknownPermission(*unknown)
+
+        return [ids[name] for name in names]
+
+    def flags(self, ids: Iterable[int]) -> Permissions:
+        """Get the combined Permissions flag of permissions from their ids.
+
+        Arguments:
+            ids (Iterable[int]): the permissions' ids. Ids that are not in the catalog, even after any refresh it is
+              due, are ignored.
+
+        Returns:
+            The union of the permissions' flags.
+        """
+
+        ids = list(ids)
+        if not self.knows(ids=ids):
+            self.__refresh_unknown(lambda: self.knows(ids=ids))
+
+        flags = self.__flags
+        return reduce(bit_or, (flags.get(permission_id, Permissions.NONE) for permission_id in ids), Permissions.NONE)
+
+    def __refresh_unknown(self, known: Callable[[], bool]):
+        # Concurrent lookups of the same unknown names wait for one reload rather than each starting their own
+        with self.__refresh_lock:
+            if known():
+                return
+            loaded_at = self.__loaded_at
+            if loaded_at is None or (
+                self.refresh_interval is not None and time.monotonic() - loaded_at >= self.refresh_interval
+            ):
+                self.refresh()
@@ -1,46 +1,344 @@
-from typing import List, Optional, Union
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Sequence, Set, Tuple, TypeVar, Union, cast
+
+from autospatialqc_api.models.backends import Backend, MySQLBackend
+from autospatialqc_api.models.cache import Cache, CacheStatistics
+from autospatialqc_api.models.catalog import PermissionCatalog
+from autospatialqc_api.models.errors import (HashingOverloaded, InvalidCredentials, SampleNameCollision, SampleNotFound,
+                                             UserCollision, UserNotFound)
+from autospatialqc_api.models.hashing import HashingStatistics, PasswordHashingPool
+from autospatialqc_api.models.metrics import database_method
+from autospatialqc_api.models.pool import ConnectionPool, PoolStatistics
+from autospatialqc_api.models.profiling import QueryProfiler
+from autospatialqc_api.models.qc import QCResult, QCThresholds, score_new_samples, score_samples
+from autospatialqc_api.models.query import SampleFilter
+from autospatialqc_api.models.sample import SAMPLE_ROWS, Sample, SampleUpdate
+from autospatialqc_api.models.stats import AssaySummary, PercentileRanks, SampleStatistics
+from autospatialqc_api.models.user import Permissions, User
 
-import argon2
-import pymysql.cursors
+T = TypeVar("T")
 
-from autospatialqc_api.models.errors import (InvalidCredentials, SampleNameCollision, SampleNotFound, UserCollision,
-                                             UserNotFound)
-from autospatialqc_api.models.sample import Sample
-from autospatialqc_api.models.user import Permissions, User
+_INSERT_SAMPLE_SQL = """
+    INSERT INTO samples (assay, tissue, area, assigned_transcripts, cell_count, cell_over25_count, complexity,
+        false_discovery_rate, median_counts, median_genes, reference_correlation, sparsity, volume,
+        x_transcript_count, y_transcript_count, transcripts_per_area, transcripts_per_feature, qc_status, qc_flags)
+
+    VALUES (%(assay)s, %(tissue)s, %(area)s, %(assigned_transcripts)s, %(cell_count)s, %(cell_over25_count)s,
+        %(complexity)s, %(false_discovery_rate)s, %(median_counts)s, %(median_genes)s, %(reference_correlation)s,
+        %(sparsity)s, %(volume)s, %(x_transcript_count)s, %(y_transcript_count)s, %(transcripts_per_area)s,
+        %(transcripts_per_feature)s, %(qc_status)s, %(qc_flags)s);
+"""
+
+
+def _qc_parameters(result: QCResult) -> Dict[str, Any]:
+    """Get the values of the QC columns of a sample's row."""
+
+    return {"qc_status": result.status, "qc_flags": json.dumps(result.flags) if result.status is not None else None}
+
+
+def _split_ids(ids: Union[str, bytes, None]) -> List[int]:
+    """Split the result of a GROUP_CONCAT over integer ids."""
+
+    if isinstance(ids, bytes):
+        ids = ids.decode("ascii")
+
+    return [int(permission_id) for permission_id in ids.split(",")] if ids else []
+
+
+def _operation(function: Callable[..., T]) -> Callable[..., T]:
+    """Record a Database method's metrics, and profile it as a named operation when the database has a profiler."""
+
+    name = function.__name__
+    timed = database_method(function)
+
+    if inspect.isgeneratorfunction(function):
+
+        @functools.wraps(function)
+        def generator_wrapper(self: Database, *args: Any, **kwargs: Any) -> Any:
+            if self.profiler is None:
+                return timed(self, *args, **kwargs)
+            return self.profiler.iterate(name, cast(Iterator[Any], timed(self, *args, **kwargs)))
+
+        return generator_wrapper
+
+    @functools.wraps(function)
+    def wrapper(self: Database, *args: Any, **kwargs: Any) -> T:
+        if self.profiler is None:
+            return timed(self, *args, **kwargs)
+        with self.profiler.operation(name):
+            return timed(self, *args, **kwargs)
+
+    return wrapper
 
 
 class Database:
     """Abstraction for the main application database."""
 
-    def __init__(self, host: str, database: str, username: str, password: str):
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        database: Optional[str] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        pool_size: int = 10,
+        pool_min_size: int = 0,
+        pool_timeout: Optional[float] = 30.0,
+        pool_recycle: Optional[float] = 3600.0,
+        pool_pre_ping: bool = True,
+        cache: Optional[Cache] = None,
+        negative_cache_ttl: Optional[float] = 5.0,
+        hashing: Optional[PasswordHashingPool] = None,
+        statistics: Optional[SampleStatistics] = None,
+        statistics_max_age: Optional[float] = 300.0,
+        qc_thresholds: Optional[QCThresholds] = None,
+        backend: Optional[Backend] = None,
+        profiler: Optional[QueryProfiler] = None,
+    ):
         """Initializes a new database object.
 
         Arguments:
-            host (str): the database's host.
-            database (str): the database to use.
-            username (str): the SQL user's username.
-            password (str): the SQL user's password.
+            host (str | None): the MySQL server's host. Required unless `backend` is given.
+            database (str | None): the MySQL database to use. Required unless `backend` is given.
+            username (str | None): the SQL user's username. Required unless `backend` is given.
+            password (str | None): the SQL user's password. Required unless `backend` is given.
+            pool_size (int): the maximum number of connections open at once, further limited by the backend. Defaults
+              to 10.
+            pool_min_size (int): the number of connections kept open while idle, which are opened when the database is
+              first used in each process. Defaults to 0.
+            pool_timeout (float | None): seconds to wait for a free connection before giving up, or None to wait
+              forever. Defaults to 30.
+            pool_recycle (float | None): maximum lifetime of a connection in seconds, or None for no limit. Defaults
+              to 3600.
+            pool_pre_ping (bool): whether to check that a pooled connection is alive before lending it out. Defaults
+              to True.
+            cache (Cache | None): cache for `get_sample` lookups, or None to always read from the server. Defaults to
+              None.
+            negative_cache_ttl (float | None): seconds to remember that a sample does not exist, or None to not cache
+              missing samples. Defaults to 5.
+            hashing (PasswordHashingPool | None): the pool that hashes and verifies passwords. Defaults to a pool with
+              default parameters.
+            statistics (SampleStatistics | None): the in-memory statistics of the samples table. Defaults to new, empty
+              statistics.
+            statistics_max_age (float | None): seconds after which the sample statistics are rebuilt from the table in
+              the background, to pick up changes made by other processes, or None to only maintain them incrementally.
+              Other processes' changes are missing from the statistics for up to this long, plus the length of a
+              rebuild. Defaults to 300.
+            qc_thresholds (QCThresholds | None): the thresholds at which new samples are flagged as outliers in their
+              assay. Defaults to the default QCThresholds.
+            backend (Backend | None): the engine that stores the data. Defaults to a MySQLBackend for `host`,
+              `database`, `username` and `password`.
+            profiler (QueryProfiler | None): times every method call by phase and passes the profiles to its hooks,
+              such as a slow query log, or None to not profile. May be changed at any time. Defaults to None.
+
+        Raises:
+            ValueError: if neither `backend` nor every MySQL connection parameter is given.
+        """
+
+        if backend is None:
+            if host is None or database is None or username is None or password is None:
+                raise ValueError("Either a backend or the host, database, username and password must be given.")
+            backend = MySQLBackend(host, database, username, password)
+
+        if backend.max_connections is not None:
+            pool_size = min(pool_size, backend.max_connections)
+            pool_min_size = min(pool_min_size, pool_size)
+
+        self.__backend = backend
+        self.profiler = profiler
+        self.__local = threading.local()
+        self.__pool = ConnectionPool(
+            self.__connect,
+            max_size=pool_size,
+            min_size=pool_min_size,
+            timeout=pool_timeout,
+            recycle=pool_recycle,
+            pre_ping=pool_pre_ping,
+            error=backend.Error,
+        )
+
+        self.__permissions = PermissionCatalog(self.__load_permissions)
+        self.__hashing = hashing or PasswordHashingPool()
+
+        self.__cache = cache
+        self.__negative_cache_ttl = negative_cache_ttl
+        self.__cache_generation = 0
+
+        self.__statistics = statistics or SampleStatistics()
+        self.__statistics_pid = os.getpid()
+        self.__statistics_lock = threading.Lock()
+        self.__statistics_max_age = statistics_max_age
+        self.__statistics_thread: Optional[threading.Thread] = None
+        self.__statistics_thread_lock = threading.Lock()
+        self.__qc_thresholds = qc_thresholds or QCThresholds()
+
+    def __connect(self) -> Any:
+        if self.profiler is None or (profile := self.profiler.current()[0]) is None:
+            return self.__backend.connect()
+
+        started = time.perf_counter()
+        try:
+            return self.__backend.connect()
+        finally:
+            profile.connect_seconds += time.perf_counter() - started
+
+    @contextmanager
+    def __checkout(self) -> Iterator[Any]:
+        if (profiler := self.profiler) is None:
+            with self.__pool.connection() as connection:
+                yield connection
+            return
+
+        started = time.perf_counter()
+        with self.__pool.connection() as connection:
+            if (profile := profiler.current()[0]) is not None:
+                profile.checkout_seconds += time.perf_counter() - started
+            yield profiler.connection(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a connection to the database.
+
+        Inside a `session`, this is the session's connection. Otherwise, a connection is borrowed from this database's
+        connection pool and returned to it when the `with` block exits.
+
+        Yields:
+            A connection made by this database's backend, such as a `pymysql.Connection`.
+        """
+
+        if (connection := getattr(self.__local, "connection", None)) is not None:
+            yield connection
+            return
+
+        with self.__checkout() as connection:
+            yield connection
+
+    @contextmanager
+    def session(self) -> Iterator[Database]:
+        """Run several database calls on one connection and in one transaction.
+
+        Every method of this object called by the current thread inside the `with` block shares the session's
+        connection. Their changes are committed together when the block exits, or rolled back together if it raises.
+        In-memory state derived from the table, such as the sample statistics, is only updated once the changes are
+        committed. Nested sessions join the outermost one.
+
+        Yields:
+            This database object.
+        """
+
+        if getattr(self.__local, "connection", None) is not None:
+            yield self
+            return
+
+        with self.__checkout() as connection:
+            self.__local.connection = connection
+            self.__local.invalidated = set()
+            self.__local.committed = []
+            try:
+                yield self
+                connection.commit()
+                committed = self.__local.committed
+            except BaseException:
+                try:
+                    connection.rollback()
+                except self.__backend.Error:
+                    pass
+                raise
+            finally:
+                self.__local.connection = None
+
+                # Drop anything cached by other threads while this session's changes were uncommitted
+                if self.__cache is not None:
+                    for key in self.__local.invalidated:
+                        self.__cache.delete(key)
+                self.__local.invalidated = None
+                self.__local.committed = None
+
+        for callback in committed:
+            callback()
+
+    def __commit(self, connection: Any):
+        if getattr(self.__local, "connection", None) is None:
+            connection.commit()
+
+    def __after_commit(self, callback: Callable[[], None]):
+        self.__check_fork()
+        if (committed := getattr(self.__local, "committed", None)) is not None:
+            committed.append(callback)
+        else:
+            callback()
+
+    def __invalidate(self, *keys: Tuple[str, str]):
+        if self.__cache is None:
+            return
+
+        self.__cache_generation += 1
+        for key in keys:
+            self.__cache.delete(key)
+
+        if (invalidated := getattr(self.__local, "invalidated", None)) is not None:
+            invalidated.update(keys)
+
+    def pool_statistics(self) -> PoolStatistics:
+        """Get a snapshot of this database's connection pool.
+
+        Returns:
+            A PoolStatistics object with the pool's current sizes and lifetime counters.
         """
+        return self.__pool.statistics()
+
+    def cache_statistics(self) -> Optional[CacheStatistics]:
+        """Get a snapshot of this database's sample cache.
 
-        self.__host = host
-        self.__database = database
-        self.__username = username
-        self.__password = password
+        Returns:
+            A CacheStatistics object with the cache's hit, miss and eviction counters, or None if there is no cache.
+        """
+        return None if self.__cache is None else self.__cache.statistics()
 
-    def connection(self) -> pymysql.Connection:
-        """Make a connection to the server.
+    def hashing_statistics(self) -> HashingStatistics:
+        """Get a snapshot of this database's password hashing pool.
 
         Returns:
-            A `pymysql.Connection` object that connects to this database.
+            A HashingStatistics object with the pool's load, queue wait and hash time counters.
         """
-        return pymysql.connect(
-            host=self.__host,
-            user=self.__username,
-            password=self.__password,
-            database=self.__database,
-            cursorclass=pymysql.cursors.DictCursor,
-        )
+        return self.__hashing.statistics()
+
+    def close(self):
+        """Close every pooled connection to the database and stop the password hashing pool."""
+        self.__pool.close()
+        self.__backend.close()
+        self.__hashing.shutdown()
+
+    def explain(self, sql: str, parameters: Any = None) -> Optional[List[Dict[str, Any]]]:
+        """Read the engine's query plan for a statement, without running it.
+
+        Arguments:
+            sql (str): the statement, with `%s` or `%(name)s` placeholders.
+            parameters (Any): the statement's parameters. Defaults to None.
 
+        Returns:
+            The rows of the engine's plan, or None if the engine cannot explain the statement.
+        """
+
+        try:
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(self.__backend.explain(sql), parameters)
+                    return list(cursor.fetchall())
+        except self.__backend.Error:
+            return None
+
+    @_operation
     def get_user(self, email: str, password: Optional[str] = None) -> User:
         """Finds a User from the database.
 
@@ -53,6 +351,7 @@ class Database:
             A User object containing this user's data.
 
         Raises:
+            HashingOverloaded: if the user is to be authenticated, but the password hashing pool is full.
             InvalidCredentials: if the user is to be authenticated, but their password is incorrect.
             UserNotFound: if this email is not in the database.
         """
@@ -60,25 +359,40 @@ class Database:
         with self.connection() as connection:
             with connection.cursor() as cursor:
                 sql = f"""
-                    SELECT internal_id, first_name, last_name {", password_hash" if password is not None else ""}
-                    FROM users u WHERE email = %s
+                    SELECT internal_id, first_name, last_name {", password_hash" if password is not None else ""},
+                        GROUP_CONCAT(up.permission_id) AS permission_ids
+                    FROM users u LEFT JOIN user_permissions up ON u.internal_id = up.user_id
+                    WHERE email = %s GROUP BY u.internal_id
                 """
-                cursor.execute(sql, (email))
+                cursor.execute(sql, (email,))
 
                 if (results := cursor.fetchone()) is None:
                     raise UserNotFound(email)
 
-        if password is not None and not argon2.PasswordHasher().verify(results["password_hash"], password):
-            raise InvalidCredentials()
+        if password is not None:
+            if not self.__hashing.verify(results["password_hash"], password):
+                raise InvalidCredentials()
+
+            # Upgrade hashes made with outdated parameters while the plain password is at hand
+            if self.__hashing.needs_rehash(results["password_hash"]):
+                try:
+                    self.__set_password_hash(results["internal_id"], self.__hashing.hash(password))
+                except HashingOverloaded:
+                    pass
+
+            del results["password_hash"]
+
+        permission_ids = _split_ids(results.pop("permission_ids"))
 
         return User(
             **results,
             id=results["internal_id"],
             email=email,
-            permissions=self.get_permissions(email),
+            permissions=self.__permissions.flags(permission_ids),
             authenticated=password is not None,
         )
 
+    @_operation
     def get_permissions(self, email: str) -> Permissions:
         """Gets the permissions for a user.
 
@@ -92,26 +406,41 @@ class Database:
         with self.connection() as connection:
             with connection.cursor() as cursor:
                 sql = """
-                    SELECT permission_name FROM users u
-                    LEFT JOIN user_permissions up ON u.internal_id = up.user_id
-                    LEFT JOIN permissions p ON p.id = up.permission_id
+                    SELECT permission_id FROM users u
+                    JOIN user_permissions up ON u.internal_id = up.user_id
                     WHERE email = %s;
                 """
-                cursor.execute(sql, (email))
-                return Permissions.from_str(*(dictionary["permission_name"] for dictionary in cursor.fetchall()))
+                cursor.execute(sql, (email,))
+                return self.__permissions.flags(row["permission_id"] for row in cursor.fetchall())
+
+    def refresh_permissions(self):
+        """Reload the in-memory catalog of the permissions table."""
 
+        self.__permissions.refresh()
+
+    def __load_permissions(self) -> List[Tuple[int, str]]:
+        with self.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT id, permission_name FROM permissions")
+                return [(row["id"], row["permission_name"]) for row in cursor.fetchall()]
+
+    @_operation
     def change_password(self, email: str, new_password: Union[str, bytes]):
         """Change a user's password.
 
         Arguments:
             email (str): the email of the user whose password is to be changed.
             new_password (bytes): the password to add to the database. This password will be hashed before storage.
+
+        Raises:
+            HashingOverloaded: if the password hashing pool is full.
+            UserNotFound: if this email is not in the database.
         """
 
-        if isinstance(new_password, str):
-            new_password = new_password.encode("utf-8")
+        if isinstance(new_password, bytes):
+            new_password = new_password.decode("utf-8")
 
-        new_hash = argon2.hash_password(new_password)
+        new_hash = self.__hashing.hash(new_password)
 
         with self.connection() as connection:
             with connection.cursor() as cursor:
@@ -120,47 +449,195 @@ class Database:
                     (new_hash, email),
                 )
 
-            connection.commit()
+                if cursor.rowcount == 0:
+                    raise UserNotFound(email)
 
-    def add_sample(self, sample: Sample):
+            self.__commit(connection)
+
+    def __set_password_hash(self, user_id: int, password_hash: str):
+        with self.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("UPDATE users SET password_hash = %s WHERE internal_id = %s", (password_hash, user_id))
+
+            self.__commit(connection)
+
+    @_operation
+    def add_sample(self, sample: Sample, upsert: bool = False):
         """Post a sample to the database.
 
         Arguments:
             sample (Sample): object containing this sample's information
+            upsert (bool): whether to overwrite the sample with the same assay and tissue, if there is one, rather than
+              raise. Defaults to False.
 
         Raises:
-            SampleNameCollision: if `sample.sample_name` is already in the database.
+            SampleNameCollision: if `upsert` is False and a sample with the same assay and tissue is already in the
+              database.
         """
 
-        # Verify that the sample is not already in the database
-        # NOTE: this might be possible using the database itself, since it may be possible to throw an error on
-        # non-unique entries
-        try:
-            self.get_sample(sample.assay, sample.tissue)
-            raise SampleNameCollision()
-        except SampleNotFound:
-            pass
+        parameters = {**dict(sample), **_qc_parameters(self.__score([sample])[0])}
+
+        # The unique (assay, tissue) key detects collisions, so concurrent inserts of one sample cannot both succeed
+        sql = _INSERT_SAMPLE_SQL
+        if upsert:
+            clause = self.__backend.upsert(("assay", "tissue"), [*Sample.metric_fields(), "qc_status", "qc_flags"])
+            sql = f"{_INSERT_SAMPLE_SQL.rstrip().rstrip(';')} {clause}, version = version + 1"
+
+        with self.connection() as connection:
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute(sql, parameters)
+                except self.__backend.IntegrityError:
+                    raise SampleNameCollision()
+
+            self.__commit(connection)
+
+        self.__invalidate((sample.assay, sample.tissue))
+        self.__after_commit(lambda: self.__statistics.add(sample))
+
+    @_operation
+    def update_sample(self, assay: str, tissue: str, update: SampleUpdate):
+        """Change some metrics of a sample with one UPDATE statement.
+
+        The sample's QC verdict is cleared, since it no longer describes the sample, until it is re-scored.
+
+        Arguments:
+            assay (str): the assay of the sample to update.
+            tissue (str): the tissue of the sample to update.
+            update (SampleUpdate): the new values of the changed metrics.
+
+        Raises:
+            SampleNotFound: if no sample has `assay` and `tissue`.
+            ValueError: if `update` changes no fields.
+        """
+
+        if not (changes := update.changes()):
+            raise ValueError("A sample update must change at least one field.")
 
         with self.connection() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(
-                    """
-                        INSERT INTO samples (assay, tissue, area, assigned_transcripts, cell_count, cell_over25_count,
-                            complexity, false_discovery_rate, median_counts, median_genes, reference_correlation,
-                            sparsity, volume, x_transcript_count, y_transcript_count, transcripts_per_area,
-                            transcripts_per_feature)
-
-                        VALUES (%(assay)s, %(tissue)s, %(area)s, %(assigned_transcripts)s, %(cell_count)s,
-                            %(cell_over25_count)s, %(complexity)s, %(false_discovery_rate)s, %(median_counts)s,
-                            %(median_genes)s, %(reference_correlation)s, %(sparsity)s, %(volume)s,
-                            %(x_transcript_count)s, %(y_transcript_count)s, %(transcripts_per_area)s,
-                            %(transcripts_per_feature)s);
+                    f"""
+                    UPDATE samples SET {', '.join(f'{field} = %({field})s' for field in changes)},
+                        qc_status = NULL, qc_flags = NULL, version = version + 1
+                    WHERE assay = %(assay)s AND tissue = %(tissue)s
                     """,
-                    dict(sample),
+                    {**changes, "assay": assay, "tissue": tissue},
                 )
 
-            connection.commit()
+                if cursor.rowcount == 0:
+                    raise SampleNotFound(assay, tissue)
 
+            self.__commit(connection)
+
+        self.__invalidate((assay, tissue))
+        self.__after_commit(lambda: self.__statistics.update(assay, tissue, changes))
+
+    @_operation
+    def add_samples(self, samples: Sequence[Sample], chunk_size: int = 500, atomic: bool = False) -> List[int]:
+        """Post many samples to the database in one transaction.
+
+        Samples are inserted with multi-row INSERT statements of at most `chunk_size` rows each. A sample collides if
+        its (assay, tissue) pair is already in the database or appears earlier in `samples`. Every sample is scored
+        against the samples already in its assay, with one vectorized pass per assay.
+
+        Arguments:
+            samples (Sequence[Sample]): the samples to insert.
+            chunk_size (int): the maximum number of samples per statement. Defaults to 500.
+            atomic (bool): whether a single collision should prevent every sample from being inserted. Defaults to
+              False.
+
+        Returns:
+            The indices in `samples` of the samples that collided. If `atomic` is True and this list is not empty,
+              nothing was inserted.
+
+        Raises:
+            SampleNameCollision: if `atomic` is True and a colliding sample was inserted by another client while this
+              batch was being written. Nothing is inserted in that case.
+        """
+
+        chunks = [
+            list(range(start, min(start + chunk_size, len(samples)))) for start in range(0, len(samples), chunk_size)
+        ]
+        collisions: List[int] = []
+        seen: Set[Tuple[str, str]] = set()
+        results = self.__score(samples)
+
+        with self.session():
+            with self.connection() as connection:
+                for chunk in chunks:
+                    existing = self.__existing_sample_keys(
+                        connection, [(samples[i].assay, samples[i].tissue) for i in chunk]
+                    )
+                    for index in chunk:
+                        if (key := (samples[index].assay, samples[index].tissue)) in existing or key in seen:
+                            collisions.append(index)
+                        seen.add(key)
+
+                if atomic and collisions:
+                    return collisions
+
+                skipped = set(collisions)
+                for chunk in chunks:
+                    rows = [
+                        (index, {**dict(samples[index]), **_qc_parameters(results[index])})
+                        for index in chunk
+                        if index not in skipped
+                    ]
+                    collisions.extend(self.__insert_samples(connection, rows, atomic))
+
+                self.__commit(connection)
+
+            self.__invalidate(*((sample.assay, sample.tissue) for sample in samples))
+
+            collided = set(collisions)
+            inserted = [sample for index, sample in enumerate(samples) if index not in collided]
+            self.__after_commit(lambda: self.__statistics.add(*inserted))
+
+        return sorted(collisions)
+
+    def __existing_sample_keys(self, connection: Any, keys: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        if not keys:
+            return set()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT assay, tissue FROM samples WHERE {self.__backend.rows_in(('assay', 'tissue'), len(keys))}",
+                [value for key in keys for value in key],
+            )
+            return {(row["assay"], row["tissue"]) for row in cursor.fetchall()}
+
+    def __insert_samples(self, connection: Any, rows: List[Tuple[int, Dict[str, Any]]], atomic: bool) -> List[int]:
+        if not rows:
+            return []
+
+        with connection.cursor() as cursor:
+            # A failed batch only says that some row collided, and may have kept the rows before it: PyMySQL splits
+            # long multi-row INSERTs into several statements, and SQLite inserts one row at a time. The batch is rolled
+            # back to a savepoint before it is retried row by row. Savepoints are released by the commit, since
+            # releasing one that started an SQLite transaction would commit it.
+            cursor.execute("SAVEPOINT insert_samples")
+            try:
+                cursor.executemany(_INSERT_SAMPLE_SQL, [parameters for _, parameters in rows])
+                return []
+            except self.__backend.IntegrityError:
+                # Another writer inserted one of these keys since they were checked
+                if atomic:
+                    raise SampleNameCollision()
+                cursor.execute("ROLLBACK TO SAVEPOINT insert_samples")
+
+            collisions = []
+            for index, parameters in rows:
+                try:
+                    cursor.execute(_INSERT_SAMPLE_SQL, parameters)
+                except self.__backend.IntegrityError:
+                    if atomic:
+                        raise SampleNameCollision()
+                    collisions.append(index)
+
+            return collisions
+
+    @_operation
     def delete_sample(self, assay: str, tissue: str):
         """Delete a sample from the database.
 
@@ -178,9 +655,92 @@ class Database:
                     "DELETE FROM samples WHERE assay = %s AND tissue = %s",
                     (assay, tissue),
                 )
+                deleted = cursor.rowcount
 
-            connection.commit()
+            self.__commit(connection)
+
+        if not deleted:
+            raise SampleNotFound(assay, tissue)
+
+        self.__invalidate((assay, tissue))
+        self.__after_commit(lambda: self.__statistics.remove(assay, tissue))
+
+    @_operation
+    def delete_samples(
+        self,
+        keys: Optional[Sequence[Tuple[str, str]]] = None,
+        sample_filter: Optional[SampleFilter] = None,
+        chunk_size: int = 500,
+        dry_run: bool = False,
+    ) -> Tuple[int, List[Tuple[str, str]]]:
+        """Delete many samples from the database in one transaction.
+
+        Matching samples are found and locked first, then deleted by id with one statement per `chunk_size` samples.
+        The locks keep other clients from deleting them in between, so every sample listed was deleted by this call.
+
+        Arguments:
+            keys (Sequence[Tuple[str, str]] | None): the (assay, tissue) pairs of the samples to delete. Keys that match
+              no sample are ignored. Defaults to no restriction.
+            sample_filter (SampleFilter | None): the filter samples must match to be deleted. Defaults to no
+              restriction.
+            chunk_size (int): the maximum number of keys or ids per statement. Defaults to 500.
+            dry_run (bool): whether to only find the matching samples, without deleting them. Defaults to False.
+
+        Returns:
+            A (count, keys) tuple with the number of samples deleted, or that would be deleted in a dry run, and their
+              (assay, tissue) pairs in (assay, tissue) order. Samples deleted by another client first are in neither.
+
+        Raises:
+            ValueError: if neither `keys` nor `sample_filter` is given.
+        """
+
+        if keys is None and sample_filter is None:
+            raise ValueError("Deleting samples requires keys or a filter.")
 
+        where, parameters = (sample_filter or SampleFilter()).where()
+        matched: Dict[int, Tuple[str, str]] = {}
+
+        with self.session():
+            with self.connection() as connection:
+                lock = "" if dry_run else self.__backend.lock_for_update(connection)
+
+                with connection.cursor() as cursor:
+                    if keys is None:
+                        cursor.execute(f"SELECT id, assay, tissue FROM samples WHERE {where} {lock}", parameters)
+                        matched.update((row["id"], (row["assay"], row["tissue"])) for row in cursor.fetchall())
+
+                    remaining = iter(dict.fromkeys((assay, tissue) for assay, tissue in keys or ()))
+                    while chunk := list(islice(remaining, chunk_size)):
+                        cursor.execute(
+                            f"SELECT id, assay, tissue FROM samples WHERE {where} AND "
+                            f"{self.__backend.rows_in(('assay', 'tissue'), len(chunk))} {lock}",
+                            [*parameters, *(value for key in chunk for value in key)],
+                        )
+                        matched.update((row["id"], (row["assay"], row["tissue"])) for row in cursor.fetchall())
+
+                    deleted_keys = sorted(matched.values())
+                    if dry_run:
+                        return len(deleted_keys), deleted_keys
+
+                    count = 0
+                    ids = iter(matched)
+                    while chunk_ids := list(islice(ids, chunk_size)):
+                        cursor.execute(
+                            f"DELETE FROM samples WHERE id IN ({', '.join(['%s'] * len(chunk_ids))})", chunk_ids
+                        )
+                        count += cursor.rowcount
+
+            self.__invalidate(*deleted_keys)
+
+            def remove_statistics():
+                for assay, tissue in deleted_keys:
+                    self.__statistics.remove(assay, tissue)
+
+            self.__after_commit(remove_statistics)
+
+        return count, deleted_keys
+
+    @_operation
     def get_sample(self, assay: str, tissue: str) -> Sample:
         """Gets a sample from the database.
 
@@ -195,45 +755,412 @@ class Database:
             SampleNotFound: if no sample has `assay` and `tissue`.
         """
 
+        # Sessions may hold uncommitted changes, so they neither read nor fill the cache
+        cache = self.__cache if getattr(self.__local, "connection", None) is None else None
+
+        if cache is not None:
+            try:
+                sample = cache.get((assay, tissue))
+            except KeyError:
+                pass
+            else:
+                if sample is None:
+                    raise SampleNotFound(assay, tissue)
+                return sample
+
+        generation = self.__cache_generation
+
         with self.connection() as connection:
             with connection.cursor() as cursor:
                 cursor.execute(
                     "SELECT * FROM samples WHERE assay = %s and tissue = %s",
                     (assay, tissue),
                 )
+                results = cursor.fetchone()
+
+        sample = None if results is None else Sample.model_validate(results)
+
+        # Skip filling the cache if a write may have happened while reading
+        if cache is not None and generation == self.__cache_generation:
+            if sample is not None:
+                cache.set((assay, tissue), sample)
+            elif self.__negative_cache_ttl is not None:
+                cache.set((assay, tissue), None, ttl=self.__negative_cache_ttl)
+
+        if sample is None:
+            raise SampleNotFound(assay, tissue)
+
+        return sample
+
+    @_operation
+    def get_samples(
+        self, keys: Sequence[Tuple[str, str]], chunk_size: int = 500
+    ) -> Dict[Tuple[str, str], Optional[Sample]]:
+        """Gets many samples from the database by their (assay, tissue) pairs.
+
+        Cached samples are returned from the cache, and the rest are read with one indexed query per `chunk_size` keys.
+
+        Arguments:
+            keys (Sequence[Tuple[str, str]]): the (assay, tissue) pairs to search for. Duplicates are read once.
+            chunk_size (int): the maximum number of keys per query. Defaults to 500.
+
+        Returns:
+            A dictionary from every key in `keys` to its sample, or to None if no sample has that key.
+        """
+
+        samples: Dict[Tuple[str, str], Optional[Sample]] = {}
+        cache = self.__cache if getattr(self.__local, "connection", None) is None else None
+
+        missing: List[Tuple[str, str]] = []
+        for key in dict.fromkeys((assay, tissue) for assay, tissue in keys):
+            if cache is not None:
+                try:
+                    samples[key] = cache.get(key)
+                    continue
+                except KeyError:
+                    pass
+            missing.append(key)
+
+        if not missing:
+            return samples
+
+        generation = self.__cache_generation
+        found: Dict[Tuple[str, str], Sample] = {}
+
+        with self.connection() as connection:
+            with connection.cursor() as cursor:
+                remaining = iter(missing)
+                while chunk := list(islice(remaining, chunk_size)):
+                    cursor.execute(
+                        f"SELECT * FROM samples WHERE {self.__backend.rows_in(('assay', 'tissue'), len(chunk))}",
+                        [value for key in chunk for value in key],
+                    )
+                    for sample in SAMPLE_ROWS.validate_python(cursor.fetchall()):
+                        found[(sample.assay, sample.tissue)] = sample
+
+        for key in missing:
+            samples[key] = found.get(key)
+
+        # Skip filling the cache if a write may have happened while reading
+        if cache is not None and generation == self.__cache_generation:
+            for key in missing:
+                if (cached := samples[key]) is not None:
+                    cache.set(key, cached)
+                elif self.__negative_cache_ttl is not None:
+                    cache.set(key, None, ttl=self.__negative_cache_ttl)
+
+        return samples
+
+    @_operation
+    def get_sample_version(self, assay: str, tissue: str) -> Tuple[int, int, datetime]:
+        """Gets the identity, write count and last modification time of a sample, without reading its data.
+
+        Arguments:
+            assay (str): the assay to search for.
+            tissue (str): the tissue to search for.
+
+        Returns:
+            An (id, version, updated_at) tuple for the unique sample with assay `assay` and tissue `tissue`.
+
+        Raises:
+            SampleNotFound: if no sample has `assay` and `tissue`.
+        """
+
+        if self.__cache is not None and getattr(self.__local, "connection", None) is None:
+            try:
+                sample = self.__cache.get((assay, tissue))
+            except KeyError:
+                pass
+            else:
+                if sample is None:
+                    raise SampleNotFound(assay, tissue)
+                if sample.id is not None and sample.version is not None and sample.updated_at is not None:
+                    return sample.id, sample.version, sample.updated_at
+
+        with self.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, version, updated_at FROM samples WHERE assay = %s and tissue = %s",
+                    (assay, tissue),
+                )
 
                 if (results := cursor.fetchone()) is None:
                     raise SampleNotFound(assay, tissue)
 
-        return Sample.model_validate(results)
+        return results["id"], results["version"], results["updated_at"]
 
-    def add_permissions(self, user: User, permissions: List[str]):
-        """Add permissions to a user.
+    @_operation
+    def list_samples(
+        self,
+        sample_filter: Optional[SampleFilter] = None,
+        limit: int = 100,
+        after: Optional[Sequence[Any]] = None,
+        order_by: str = "key",
+    ) -> List[Sample]:
+        """Lists samples from the database, one page at a time.
+
+        Pages are found with keyset pagination: each page starts strictly after the sort key of the last sample of the
+        previous page, so deep pages are as cheap as the first one.
 
         Arguments:
-            user (User): the user data for the user for whom the permissions are being applied.
-            permissions (list[str]): a list of string identifiers for the permissions that need to be applied.
+            sample_filter (SampleFilter | None): the filter samples must match. Defaults to no filter.
+            limit (int): the maximum number of samples to return. Defaults to 100.
+            after (Sequence[Any] | None): the sort key of the last sample of the previous page, or None for the first
+              page. Defaults to None.
+            order_by (str): "key" to sort by (assay, tissue), or "id" to sort by id. Defaults to "key".
+
+        Returns:
+            Up to `limit` samples matching `sample_filter`, in sort order.
 
         Raises:
-            UserNotFound: if the user is not in the database.
+            ValueError: if `order_by` is unknown, or `after` does not match it.
         """
 
-        # TODO: make an exception for non-existant permission strings
+        where, parameters = (sample_filter or SampleFilter()).where()
+
+        if order_by == "key":
+            if after is not None:
+                assay, tissue = after
+                where += " AND (assay > %s OR (assay = %s AND tissue > %s))"
+                parameters += [assay, assay, tissue]
+            order = "assay, tissue"
+        elif order_by == "id":
+            if after is not None:
+                (last_id,) = after
+                where += " AND id > %s"
+                parameters.append(int(last_id))
+            order = "id"
+        else:
+            raise ValueError(f"Unknown sample order '{order_by}'.")
 
         with self.connection() as connection:
             with connection.cursor() as cursor:
+                cursor.execute(f"SELECT * FROM samples WHERE {where} ORDER BY {order} LIMIT %s", (*parameters, limit))
+                return SAMPLE_ROWS.validate_python(cursor.fetchall())
+
+    @_operation
+    def iter_samples(
+        self, sample_filter: Optional[SampleFilter] = None, columns: Optional[Sequence[str]] = None
+    ) -> Generator[Dict[str, Any], None, None]:
+        """Streams samples from the database with an unbuffered cursor.
+
+        Rows are read from the database as they are consumed, so memory use does not depend on the number of samples.
+        The connection is held until the iterator is exhausted or closed; closing it early drops the connection
+        rather than reading the rest of the result.
+
+        Arguments:
+            sample_filter (SampleFilter | None): the filter samples must match. Defaults to no filter.
+            columns (Sequence[str] | None): the columns to read, out of the `id`, data fields, QC columns,
+              `version` and timestamps. Defaults to the `id` and data fields.
 
+        Yields:
+            The columns of every matching sample, as a dictionary, in (assay, tissue) order.
+
+        Raises:
+            ValueError: if a column is not a column of the samples table.
+        """
+
+        where, parameters = (sample_filter or SampleFilter()).where()
+
+        columns = ["id", *Sample.data_fields()] if columns is None else list(columns)
+        known = {"id", *Sample.data_fields(), "qc_status", "qc_flags", "version", "created_at", "updated_at"}
+        if unknown := set(columns) - known:
+            raise ValueError(f"Unknown sample columns {sorted(unknown)}.")
+
+        with self.connection() as connection:
+            cursor = self.__backend.streaming_cursor(connection)
+            try:
                 cursor.execute(
-                    f"""
-                        INSERT INTO user_permissions (user_id, permission_id)
-                        SELECT users.internal_id, permissions.id FROM users, permissions WHERE users.email = %s
-                        AND permissions.permission_name IN ({str(permissions)[1:-1]});
-                    """,
-                    (user.email),
+                    f"SELECT {', '.join(columns)} FROM samples WHERE {where} ORDER BY assay, tissue", parameters
                 )
+                yield from cursor
+                cursor.close()
+            except GeneratorExit:
+                # Closing an unbuffered cursor reads every remaining row, so drop the connection instead
+                connection.close()
+                raise
 
-            connection.commit()
+    @_operation
+    def sample_statistics(self, assay: Optional[str] = None) -> List[AssaySummary]:
+        """Summarize the samples of every assay, or of one.
+
+        Summaries are read from in-memory statistics, which are built from the table by `start_sample_statistics`, or
+        on first use, and then kept up to date as samples are added and deleted.
+
+        Arguments:
+            assay (str | None): the assay to summarize, or None for every assay. Defaults to None.
+
+        Returns:
+            An AssaySummary for each assay with samples, in assay order.
+        """
+
+        return self.__current_statistics().summaries(assay)
+
+    @_operation
+    def percentile_ranks(self, assay: str, tissue: str) -> PercentileRanks:
+        """Rank a sample's metrics among the samples of its assay.
+
+        Arguments:
+            assay (str): the assay of the sample to rank.
+            tissue (str): the tissue of the sample to rank.
+
+        Returns:
+            The percentile rank of each of the sample's metrics.
+
+        Raises:
+            SampleNotFound: if no sample has `assay` and `tissue`.
+        """
+
+        return self.__current_statistics().percentile_ranks(assay, tissue)
 
+    @_operation
+    def rebuild_sample_statistics(self):
+        """Rebuild the sample statistics from a full scan of the samples table."""
+
+        self.__check_fork()
+        with self.__statistics_lock:
+            self.__statistics.rebuild(self.iter_samples())
+
+    def start_sample_statistics(self) -> threading.Thread:
+        """Rebuild the sample statistics in a background thread, unless a background rebuild is already running.
+
+        Readers keep using the previous statistics until the rebuild is done. Errors are logged rather than raised.
+
+        Returns:
+            The thread running the rebuild.
+        """
+
+        self.__check_fork()
+        with self.__statistics_thread_lock:
+            if self.__statistics_thread is None or not self.__statistics_thread.is_alive():
+                self.__statistics_thread = threading.Thread(
+                    target=self.__rebuild_statistics_in_background, name="sample-statistics", daemon=True
+                )
+                self.__statistics_thread.start()
+            return self.__statistics_thread
+
+    def prepare_sample_statistics(self):
+        """Start building the sample statistics in the background, once per process, unless they are already built.
+
+        Call this when the process starts serving, such as before each request, so that the first write does not wait
+        for a full scan. Processes forked after this was called start their own build.
+        """
+
+        self.__check_fork()
+        if self.__statistics.built_at is None and self.__statistics_thread is None:
+            self.start_sample_statistics()
+
+    def __check_fork(self):
+        if self.__statistics_pid == os.getpid():
+            return
+
+        # The parent's background build does not run in this process, and its locks may have been held at the fork
+        self.__statistics_pid = os.getpid()
+        self.__statistics_lock = threading.Lock()
+        self.__statistics_thread_lock = threading.Lock()
+        self.__statistics_thread = None
+        self.__statistics.after_fork()
+
+    def __rebuild_statistics_in_background(self):
+        try:
+            self.rebuild_sample_statistics()
+        except Exception:
+            logging.getLogger(__name__).exception("Rebuilding the sample statistics failed.")
+
+    @_operation
+    def rescore_samples(self, thresholds: Optional[QCThresholds] = None) -> int:
+        """Re-score every sample against the current distribution of its assay.
+
+        The statistics are rebuilt first, and each assay's flags are rewritten in their own transaction.
+
+        Arguments:
+            thresholds (QCThresholds | None): new thresholds, used for this and every later scoring, or None to keep
+              the current ones. Defaults to None.
+
+        Returns:
+            The number of samples scored.
+        """
+
+        if thresholds is not None:
+            self.__qc_thresholds = thresholds
+
+        self.rebuild_sample_statistics()
+        statistics = self.__statistics
+        scored = 0
+
+        for assay in statistics.assays():
+            tissues, values = statistics.assay_values(assay)
+            results = score_samples(values, statistics.reference(assay), statistics.fields, self.__qc_thresholds)
+
+            with self.session():
+                with self.connection() as connection:
+                    with connection.cursor() as cursor:
+                        cursor.executemany(
+                            "UPDATE samples SET qc_status = %s, qc_flags = %s, version = version + 1 "
+                            "WHERE assay = %s AND tissue = %s",
+                            [
+                                (*_qc_parameters(result).values(), assay, tissue)
+                                for tissue, result in zip(tissues, results)
+                            ],
+                        )
+
+                self.__invalidate(*((assay, tissue) for tissue in tissues))
+
+            scored += len(tissues)
+
+        return scored
+
+    def __score(self, samples: Sequence[Sample]) -> List[QCResult]:
+        return score_new_samples(samples, self.__current_statistics(), self.__qc_thresholds)
+
+    def __current_statistics(self) -> SampleStatistics:
+        self.__check_fork()
+        built_at = self.__statistics.built_at
+
+        if built_at is None:
+            # There is nothing to read yet, so wait for the first build. Sessions hold a connection that the background
+            # thread may be waiting for, so they build on their own connection instead.
+            if getattr(self.__local, "connection", None) is None:
+                self.start_sample_statistics().join()
+            if self.__statistics.built_at is None:
+                self.rebuild_sample_statistics()
+        elif self.__statistics_max_age is not None and time.monotonic() - built_at > self.__statistics_max_age:
+            # Stale statistics keep being read while they are rebuilt, so writes never wait for a full scan
+            self.start_sample_statistics()
+
+        return self.__statistics
+
+    @_operation
+    def add_permissions(self, user: User, permissions: List[str]):
+        """Add permissions to a user.
+
+        Arguments:
+            user (User): the user data for the user for whom the permissions are being applied.
+            permissions (list[str]): a list of string identifiers for the permissions that need to be applied.
+
+        Raises:
+            UnknownPermission: if any permission name is not in the database.
+            UserNotFound: if the user is not in the database.
+        """
+
+        permission_ids = self.__permissions.ids(permissions)
+
+        try:
+            with self.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        f"""
+                            INSERT INTO user_permissions (user_id, permission_id) VALUES (%s, %s)
+                            {self.__backend.ignore_duplicates("permission_id")};
+                        """,
+                        [(user.id, permission_id) for permission_id in permission_ids],
+                    )
+
+                self.__commit(connection)
+        except self.__backend.IntegrityError:
+            raise UserNotFound(user.email)
+
+    @_operation
     def delete_permissions(self, user: User, permissions: List[str]):
         """Remove permissions from a user.
 
@@ -242,56 +1169,65 @@ class Database:
             permissions (list[str]): a list of string identifiers for the permissions that need to be removed.
 
         Raises:
-            UserNotFound: if the user is not in the database.
+            UnknownPermission: if any permission name is not in the database.
         """
 
+        if not (permission_ids := self.__permissions.ids(permissions)):
+            return
+
         with self.connection() as connection:
             with connection.cursor() as cursor:
-
                 cursor.execute(
                     f"""
-                        DELETE FROM user_permissions WHERE user_id = (SELECT internal_id FROM users WHERE email = %s)
-                        AND permission_id IN ({str(permissions)[1:-1]});
+                        DELETE FROM user_permissions WHERE user_id = %s
+                        AND permission_id IN ({", ".join(["%s"] * len(permission_ids))});
                     """,
-                    (user.email),
+                    (user.id, *permission_ids),
                 )
 
-            connection.commit()
+            self.__commit(connection)
 
+    @_operation
     def add_user(self, email: str, password: str, permissions: List[str], first_name: str, last_name: str):
         """Adds a new user to the database.
 
         Arguments:
             email (str): the new user's email. Cannot already exist in the database.
             password (str): the new user's password. This will be hashed prior to storage.
-            permissions (list[str]): a list of string names for the permissions. Invalid names will fail silently.
+            permissions (list[str]): a list of string names for the permissions.
             first_name (str): the new user's first name.
             last_name (str): the new user's last name.
 
         Raises:
+            HashingOverloaded: if the password hashing pool is full.
+            UnknownPermission: if any permission name is not in the database. The user is not added in that case.
             UserCollision: if the new user's unique identifers are already in use for another user.
         """
 
-        # TODO: should invalid permission names fail silently or cause an error?
-
-        password_hash = argon2.PasswordHasher().hash(password)
-
-        try:
-            with self.connection() as connection:
-                with connection.cursor() as cursor:
-                    cursor.execute(
-                        """
-                            INSERT INTO users (email, password_hash, first_name, last_name)
-                            VALUES (%s, %s, %s, %s);
-                        """,
-                        (email, password_hash, first_name, last_name),
-                    )
-
-                connection.commit()
-        except pymysql.IntegrityError:
-            raise UserCollision(email)
-
-        user = self.get_user(email)
-
-        if permissions:
-            self.add_permissions(user, permissions)
+        # Reject unknown permission names before doing any work
+        self.__permissions.ids(permissions)
+
+        password_hash = self.__hashing.hash(password)
+
+        with self.session():
+            try:
+                with self.connection() as connection:
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            """
+                                INSERT INTO users (email, password_hash, first_name, last_name)
+                                VALUES (%s, %s, %s, %s);
+                            """,
+                            (email, password_hash, first_name, last_name),
+                        )
+                        user_id = cursor.lastrowid
+
+                    self.__commit(connection)
+            except self.__backend.IntegrityError:
+                raise UserCollision(email)
+
+            if permissions:
+                user = User(
+                    id=user_id, email=email, permissions=Permissions.NONE, first_name=first_name, last_name=last_name
+                )
+                self.add_permissions(user, permissions)
@@ -20,6 +20,14 @@ class UserNotFound(Exception):
         super().__init__(f"User with email '{email}' not found.")
 
 
+class UnknownPermission(Exception):
+    """Raised when a permission name is not in the permissions table."""
+
+    def __init__(self, *names: str):
+        super().__init__(f"Unknown permissions {', '.join(repr(name) for name in names)}.")
+        self.names = names
+
+
 class InvalidCredentials(Exception):
     """Raised when a user's password is invalid."""
 
@@ -45,6 +53,21 @@ class UserCollision(Exception):
         super().__init__(f"User '{identifier}' already exists.")
 
 
+class PoolTimeout(Exception):
+    """Raised when no database connection becomes available before the pool's checkout timeout."""
+
+    def __init__(self, timeout: float):
+        super().__init__(f"No database connection became available within {timeout} seconds.")
+
+
+class HashingOverloaded(Exception):
+    """Raised when too many password hashes are already queued to accept another one."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Too many password hashes are queued.")
+        self.retry_after = retry_after
+
+
 class ResponseError(Exception):
     """Raised when a Flask response should be returned prematurely.
 
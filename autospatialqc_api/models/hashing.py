@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+import argon2
+import pydantic
+
+from autospatialqc_api.models.errors import HashingOverloaded
+from autospatialqc_api.models.metrics import REGISTRY, HistogramChild
+
+T = TypeVar("T")
+
+_HASHING_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_HASHING_SECONDS = REGISTRY.histogram(
+    "password_hashing_duration_seconds",
+    "Duration of Argon2 hashes and verifications, excluding the wait for a worker.",
+    ["operation"],
+    _HASHING_BUCKETS,
+)
+_HASH_SECONDS = _HASHING_SECONDS.labels("hash")
+_VERIFY_SECONDS = _HASHING_SECONDS.labels("verify")
+_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "password_hashing_queue_wait_seconds",
+    "Time Argon2 hashes and verifications wait for a worker.",
+    (),
+    _HASHING_BUCKETS,
+).labels()
+
+
+class HashingStatistics(pydantic.BaseModel):
+    """Snapshot of a password hashing pool's state and lifetime counters."""
+
+    workers: int
+    queue_limit: int
+    in_flight: int
+
+    hashes: int
+    verifications: int
+    rejections: int
+
+    # Cumulative seconds spent waiting for a worker, and hashing or verifying
+    queue_wait_seconds: float
+    hash_seconds: float
+
+
+class PasswordHashingPool:
+    """Size-bounded executor for Argon2 password hashing and verification.
+
+    Argon2 is deliberately expensive, so running it on request threads lets a burst of logins starve every other
+    request. This pool caps the number of concurrent hashes at `workers`, queues at most `queue_limit` more, and
+    rejects anything beyond that with `HashingOverloaded` instead of letting it pile up. A pool created before a fork
+    starts its own workers in each child.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_limit: int = 32,
+        time_cost: int = argon2.DEFAULT_TIME_COST,
+        memory_cost: int = argon2.DEFAULT_MEMORY_COST,
+        parallelism: int = argon2.DEFAULT_PARALLELISM,
+        retry_after: int = 1,
+    ):
+        """Initializes a new hashing pool.
+
+        Arguments:
+            workers (int): the number of hashes computed at once. Defaults to 2.
+            queue_limit (int): the number of hashes that may wait for a worker before new ones are rejected. Defaults
+              to 32.
+            time_cost (int): Argon2 time cost of new hashes. Defaults to argon2-cffi's default.
+            memory_cost (int): Argon2 memory cost of new hashes, in kibibytes. Defaults to argon2-cffi's default.
+            parallelism (int): Argon2 parallelism of new hashes. Defaults to argon2-cffi's default.
+            retry_after (int): seconds clients are told to wait when the pool is full. Defaults to 1.
+        """
+
+        self.hasher = argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.retry_after = retry_after
+
+        self.__pid = os.getpid()
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+        self.__slots = threading.BoundedSemaphore(workers + queue_limit)
+        self.__lock = threading.Lock()
+
+        self.__in_flight = 0
+        self.__hashes = 0
+        self.__verifications = 0
+        self.__rejections = 0
+        self.__queue_wait_seconds = 0.0
+        self.__hash_seconds = 0.0
+
+    def hash(self, password: str) -> str:
+        """Hash a password with this pool's parameters.
+
+        Arguments:
+            password (str): the password to hash.
+
+        Returns:
+            The encoded Argon2 hash.
+
+        Raises:
+            HashingOverloaded: if the pool's queue is full.
+        """
+
+        result = self.__run(lambda: self.hasher.hash(password), _HASH_SECONDS)
+        with self.__lock:
+            self.__hashes += 1
+        return result
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Verify a password against a hash.
+
+        Arguments:
+            password_hash (str): the encoded Argon2 hash.
+            password (str): the password to check.
+
+        Returns:
+            Whether the password matches the hash.
+
+        Raises:
+            HashingOverloaded: if the pool's queue is full.
+        """
+
+        def verify() -> bool:
+            try:
+                return self.hasher.verify(password_hash, password)
+            except (argon2.exceptions.VerifyMismatchError, argon2.exceptions.InvalidHashError):
+                return False
+
+        result = self.__run(verify, _VERIFY_SECONDS)
+        with self.__lock:
+            self.__verifications += 1
+        return result
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Check whether a hash was made with parameters other than this pool's.
+
+        Arguments:
+            password_hash (str): the encoded Argon2 hash.
+
+        Returns:
+            Whether the hash should be recomputed with this pool's parameters.
+        """
+
+        return self.hasher.check_needs_rehash(password_hash)
+
+    def statistics(self) -> HashingStatistics:
+        """Get a snapshot of this pool's state.
+
+        Returns:
+            A HashingStatistics object with the pool's current load and lifetime counters.
+        """
+
+        self.__check_fork()
+        with self.__lock:
+            return HashingStatistics(
+                workers=self.workers,
+                queue_limit=self.queue_limit,
+                in_flight=self.__in_flight,
+                hashes=self.__hashes,
+                verifications=self.__verifications,
+                rejections=self.__rejections,
+                queue_wait_seconds=self.__queue_wait_seconds,
+                hash_seconds=self.__hash_seconds,
+            )
+
+    def shutdown(self):
+        """Stop this pool's workers once the queued hashes are done."""
+
+        self.__check_fork()
+        self.__executor.shutdown(wait=True)
+
+    def __check_fork(self):
+        if self.__pid == os.getpid():
+            return
+
+        # The parent's workers do not run in this process, and its lock and slots may have been held at the fork
+        self.__pid = os.getpid()
+        self.__executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="argon2")
+        self.__slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+        self.__lock = threading.Lock()
+        self.__in_flight = 0
+
+    def __run(self, function: Callable[[], T], duration: HistogramChild) -> T:
+        self.__check_fork()
+        if not self.__slots.acquire(blocking=False):
+            with self.__lock:
+                self.__rejections += 1
+            raise HashingOverloaded(self.retry_after)
+
+        submitted = time.perf_counter()
+        timings: Dict[str, float] = {}
+
+        def timed() -> T:
+            started = time.perf_counter()
+            timings["wait"] = started - submitted
+            try:
+                return function()
+            finally:
+                timings["run"] = time.perf_counter() - started
+
+        with self.__lock:
+            self.__in_flight += 1
+
+        try:
+            return self.__executor.submit(timed).result()
+        finally:
+            self.__slots.release()
+            with self.__lock:
+                self.__in_flight -= 1
+                self.__queue_wait_seconds += timings.get("wait", 0.0)
+                self.__hash_seconds += timings.get("run", 0.0)
+
+            if "run" in timings:
+                _QUEUE_WAIT_SECONDS.observe(timings["wait"])
+                duration.observe(timings["run"])
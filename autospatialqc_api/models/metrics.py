@@ -0,0 +1,342 @@
+from __future__ import annotations
+
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import pydantic
+
+T = TypeVar("T")
+C = TypeVar("C", bound="_Child")
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-second exports
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return ",".join(f'{name}="{escape(str(value))}"' for name, value in zip(names, values))
+
+
+class _Child(ABC):
+    """One labelled time series of a metric family."""
+
+    def __init__(self, labels: str):
+        self.labels = labels
+        self.lock = threading.Lock()
+
+    @abstractmethod
+    def lines(self, name: str) -> List[str]:
+        """Render the series in the Prometheus text format, under the family's name."""
+
+    def series(self, name: str, value: float, labels: Optional[str] = None, suffix: str = "") -> str:
+        labels = self.labels if labels is None else labels
+        return (
+            f"{name}{suffix}{{{labels}}} {_format_value(value)}" if labels else f"{name}{suffix} {_format_value(value)}"
+        )
+
+
+class CounterChild(_Child):
+    """Monotonically increasing count."""
+
+    def __init__(self, labels: str):
+        super().__init__(labels)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def lines(self, name: str) -> List[str]:
+        return [self.series(name, self.value)]
+
+
+class GaugeChild(_Child):
+    """Value that goes up and down."""
+
+    def __init__(self, labels: str):
+        super().__init__(labels)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def lines(self, name: str) -> List[str]:
+        return [self.series(name, self.value)]
+
+
+class HistogramChild(_Child):
+    """Distribution of observed values over fixed buckets."""
+
+    def __init__(self, labels: str, buckets: Tuple[float, ...]):
+        super().__init__(labels)
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def lines(self, name: str) -> List[str]:
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(self.series(name, cumulative, f"{self.labels},{le}" if self.labels else le, "_bucket"))
+        lines.append(self.series(name, total, suffix="_sum"))
+        lines.append(self.series(name, cumulative, suffix="_count"))
+        return lines
+
+
+class MetricFamily(Generic[C]):
+    """A named metric and its time series, one per combination of label values.
+
+    Recording is meant to go through children bound once with `labels` and kept, so that the hot path costs a lock
+    and an addition, without building label mappings.
+    """
+
+    def __init__(self, name: str, description: str, kind: str, label_names: Sequence[str], factory: Callable[[str], C]):
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self.label_names = tuple(label_names)
+
+        self.__factory = factory
+        self.__children: Dict[Tuple[str, ...], C] = {}
+        self.__lock = threading.Lock()
+
+    def labels(self, *values: str) -> C:
+        """Get the time series for some label values, creating it on first use.
+
+        Arguments:
+            values (str): one value for each of the family's label names, in order.
+
+        Returns:
+            The time series, which is the same object for every call with the same values.
+
+        Raises:
+            ValueError: if the number of values does not match the family's label names.
+        """
+
+        if (child := self.__children.get(values)) is not None:
+            return child
+
+        if len(values) != len(self.label_names):
+            raise ValueError(f"Metric '{self.name}' takes labels {self.label_names}, got {values}.")
+
+        with self.__lock:
+            if (child := self.__children.get(values)) is None:
+                child = self.__children[values] = self.__factory(_format_labels(self.label_names, values))
+        return child
+
+    def lines(self) -> List[str]:
+        with self.__lock:
+            children = list(self.__children.values())
+
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for child in children:
+            lines.extend(child.lines(self.name))
+        return lines
+
+
+class MetricsRegistry:
+    """Set of metrics exposed together in the Prometheus text format.
+
+    Metrics are either recorded as events happen, through counters, gauges and histograms, or read at scrape time
+    from statistics snapshots, such as those of the connection pool, which then cost nothing to maintain.
+    """
+
+    def __init__(self, prefix: str = ""):
+        """Initializes a new, empty registry.
+
+        Arguments:
+            prefix (str): prepended to the name of every metric. Defaults to "".
+        """
+
+        self.prefix = prefix
+        self.__families: Dict[str, MetricFamily[Any]] = {}
+        self.__collectors: Dict[str, Callable[[], List[str]]] = {}
+        self.__lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> MetricFamily[CounterChild]:
+        """Get or create a counter. Counter names should end in `_total`."""
+
+        return self.__register(name, description, "counter", labels, CounterChild)
+
+    def gauge(self, name: str, description: str, labels: Sequence[str] = ()) -> MetricFamily[GaugeChild]:
+        """Get or create a gauge."""
+
+        return self.__register(name, description, "gauge", labels, GaugeChild)
+
+    def histogram(
+        self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> MetricFamily[HistogramChild]:
+        """Get or create a histogram, with the upper bounds of its buckets in increasing order."""
+
+        bounds = tuple(sorted(buckets))
+        return self.__register(name, description, "histogram", labels, lambda labels: HistogramChild(labels, bounds))
+
+    def collect_statistics(
+        self,
+        name: str,
+        description: str,
+        statistics: Callable[[], Optional[pydantic.BaseModel]],
+        counters: Sequence[str] = (),
+    ):
+        """Expose every numeric field of a statistics snapshot as a metric, read at scrape time.
+
+        Arguments:
+            name (str): the common prefix of the metrics' names; each field's name is appended to it.
+            description (str): what the statistics describe.
+            statistics (Callable[[], pydantic.BaseModel | None]): returns the current snapshot, or None to expose
+              nothing.
+            counters (Sequence[str]): the fields that are lifetime counters rather than current values, whose metrics
+              end in `_total`. Defaults to none.
+        """
+
+        name = self.prefix + name
+
+        def collect() -> List[str]:
+            if (snapshot := statistics()) is None:
+                return []
+
+            lines = []
+            for field, value in snapshot.model_dump().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                kind = "counter" if field in counters else "gauge"
+                metric = f"{name}_{field}_total" if field in counters else f"{name}_{field}"
+                lines += [
+                    f"# HELP {metric} {description} ({field.replace('_', ' ')}).",
+                    f"# TYPE {metric} {kind}",
+                    f"{metric} {_format_value(value)}",
+                ]
+            return lines
+
+        with self.__lock:
+            # Replaces the collector of an earlier app with the same name
+            self.__collectors[name] = collect
+
+    def exposition(self) -> str:
+        """Render every metric in the Prometheus text exposition format, version 0.0.4."""
+
+        with self.__lock:
+            families = list(self.__families.values())
+            collectors = list(self.__collectors.values())
+
+        lines: List[str] = []
+        for family in families:
+            lines.extend(family.lines())
+        for collect in collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+    def __register(
+        self, name: str, description: str, kind: str, labels: Sequence[str], factory: Callable[[str], C]
+    ) -> MetricFamily[C]:
+        name = self.prefix + name
+        with self.__lock:
+            if (family := self.__families.get(name)) is not None:
+                if family.kind != kind or family.label_names != tuple(labels):
+                    raise ValueError(f"Metric '{name}' is already registered as a different {family.kind}.")
+                return family
+
+            family = self.__families[name] = MetricFamily(name, description, kind, labels, factory)
+            return family
+
+
+# The process's metrics, as scraped from `/metrics`
+REGISTRY = MetricsRegistry(prefix="autospatialqc_")
+
+DATABASE_CALL_SECONDS = REGISTRY.histogram(
+    "database_call_duration_seconds", "Duration of Database method calls.", ["method"]
+)
+DATABASE_ERRORS = REGISTRY.counter(
+    "database_errors_total", "Database method calls that raised, by exception type.", ["method", "error"]
+)
+
+
+def timed(method: str, histogram: MetricFamily[HistogramChild], errors: MetricFamily[CounterChild]):
+    """Decorate a function to record its duration, and its exceptions by type.
+
+    Generator functions are timed until their generator is exhausted or closed.
+
+    Arguments:
+        method (str): the value of the `method` label.
+        histogram (MetricFamily[HistogramChild]): the histogram of durations, labelled by method.
+        errors (MetricFamily[CounterChild]): the counter of exceptions, labelled by method and exception type.
+    """
+
+    duration = histogram.labels(method)
+
+    def decorator(function: Callable[..., T]) -> Callable[..., T]:
+        if inspect.isgeneratorfunction(function):
+
+            @functools.wraps(function)
+            def generator_wrapper(*args: Any, **kwargs: Any) -> Any:
+                started = time.perf_counter()
+                try:
+                    yield from function(*args, **kwargs)
+                except GeneratorExit:
+                    raise
+                except BaseException as e:
+                    errors.labels(method, type(e).__name__).inc()
+                    raise
+                finally:
+                    duration.observe(time.perf_counter() - started)
+
+            return generator_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except BaseException as e:
+                errors.labels(method, type(e).__name__).inc()
+                raise
+            finally:
+                duration.observe(time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def database_method(function: Callable[..., T]) -> Callable[..., T]:
+    """Record the calls, duration and exceptions of a Database method under its name."""
+
+    return timed(function.__name__, DATABASE_CALL_SECONDS, DATABASE_ERRORS)(function)
@@ -0,0 +1,319 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, Type
+
+import pydantic
+import pymysql
+
+from autospatialqc_api.models.errors import PoolTimeout
+
+
+class PoolStatistics(pydantic.BaseModel):
+    """Snapshot of a connection pool's state and lifetime counters."""
+
+    max_size: int
+    min_size: int
+    open: int
+    idle: int
+    in_use: int
+    waiting: int
+
+    checkouts: int
+    connections_created: int
+    connections_recycled: int
+    failed_pings: int
+    timeouts: int
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections.
+
+    Connections are created lazily up to `max_size`, handed out by `connection()`, and returned to the pool when the
+    caller is done with them. The first checkout in each process opens `min_size` connections up front. Returned
+    connections have any open transaction rolled back so that the next borrower starts from a clean state. Idle
+    connections above `min_size` are closed once they have been unused for `max_idle` seconds.
+
+    A pool inherited by a forked process forgets the connections it had in the parent, without closing them, so that
+    the parent's sockets are never shared.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], pymysql.Connection],
+        max_size: int = 10,
+        min_size: int = 0,
+        timeout: Optional[float] = 30.0,
+        recycle: Optional[float] = 3600.0,
+        max_idle: Optional[float] = 600.0,
+        pre_ping: bool = True,
+        error: Type[Exception] = pymysql.Error,
+    ):
+        """Initializes a new connection pool.
+
+        Arguments:
+            connect (Callable[[], pymysql.Connection]): factory that opens a new connection.
+            max_size (int): the maximum number of connections open at once. Defaults to 10.
+            min_size (int): the number of connections kept open while idle, and opened by `fill` on the first checkout
+              in each process. Defaults to 0.
+            timeout (float | None): seconds to wait for a connection when the pool is exhausted, or None to wait
+              forever. Defaults to 30.
+            recycle (float | None): seconds after which a connection is closed and replaced, or None to keep
+              connections indefinitely. Defaults to 3600.
+            max_idle (float | None): seconds after which an unused connection above `min_size` is closed, or None to
+              keep idle connections open. Defaults to 600.
+            pre_ping (bool): whether to check that idle connections are alive before lending them out. Defaults to
+              True.
+            error (Type[Exception]): base class of the errors raised by the connections. Defaults to `pymysql.Error`.
+        """
+
+        if max_size < 1:
+            raise ValueError("`max_size` must be at least 1.")
+        if not 0 <= min_size <= max_size:
+            raise ValueError("`min_size` must be between 0 and `max_size`.")
+
+        self.__connect = connect
+        self.max_size = max_size
+        self.min_size = min_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.max_idle = max_idle
+        self.pre_ping = pre_ping
+        self.__error = error
+
+        self.__pid = os.getpid()
+        self.__condition = threading.Condition()
+        self.__idle: Deque[Tuple[pymysql.Connection, float, float]] = deque()
+        self.__created_at: Dict[int, float] = {}
+        self.__open = 0
+        self.__waiting = 0
+        self.__closed = False
+        self.__filled = False
+
+        self.__checkouts = 0
+        self.__connections_created = 0
+        self.__connections_recycled = 0
+        self.__failed_pings = 0
+        self.__timeouts = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[pymysql.Connection]:
+        """Borrow a connection from the pool for the duration of a `with` block.
+
+        Yields:
+            A live connection. It is returned to the pool when the block exits.
+
+        Raises:
+            PoolTimeout: if no connection becomes available within `timeout` seconds.
+        """
+
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def acquire(self) -> pymysql.Connection:
+        """Take a connection out of the pool, opening a new one if there is room.
+
+        Returns:
+            A live connection, which must be handed back with `release`.
+
+        Raises:
+            PoolTimeout: if no connection becomes available within `timeout` seconds.
+        """
+
+        self.__check_fork()
+        if not self.__filled:
+            # Filled on first use rather than when created, so that a pool created before a fork fills in each child
+            self.fill()
+            self.__filled = True
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        while True:
+            with self.__condition:
+                if self.__closed:
+                    raise pymysql.err.InterfaceError("The connection pool is closed.")
+
+                while not self.__idle and self.__open >= self.max_size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.__timeouts += 1
+                        raise PoolTimeout(self.timeout)  # type: ignore[arg-type]
+
+                    self.__waiting += 1
+                    try:
+                        self.__condition.wait(remaining)
+                    finally:
+                        self.__waiting -= 1
+
+                if self.__idle:
+                    connection, created_at, _ = self.__idle.pop()
+                else:
+                    connection, created_at = None, 0.0
+                    self.__open += 1
+
+            if connection is None:
+                connection = self.__create()
+                with self.__condition:
+                    self.__checkouts += 1
+                return connection
+
+            if self.__expired(created_at):
+                self.__discard(connection, recycled=True)
+                continue
+
+            if self.pre_ping and not self.__ping(connection):
+                self.__discard(connection)
+                continue
+
+            with self.__condition:
+                self.__checkouts += 1
+            return connection
+
+    def release(self, connection: pymysql.Connection):
+        """Hand a connection back to the pool.
+
+        Arguments:
+            connection (pymysql.Connection): a connection previously returned by `acquire`.
+        """
+
+        if self.__pid != os.getpid():
+            return
+
+        created_at = self.__created_at.get(id(connection), 0.0)
+
+        if self.__closed or not connection.open or self.__expired(created_at):
+            self.__discard(connection, recycled=connection.open and self.__expired(created_at))
+            return
+
+        try:
+            connection.rollback()
+        except self.__error:
+            self.__discard(connection)
+            return
+
+        with self.__condition:
+            self.__idle.append((connection, created_at, time.monotonic()))
+            self.__condition.notify()
+            stale = self.__take_stale()
+
+        for connection, _, _ in stale:
+            self.__discard(connection)
+
+    def fill(self):
+        """Open connections until at least `min_size` are open."""
+
+        self.__check_fork()
+        while True:
+            with self.__condition:
+                if self.__open >= self.min_size:
+                    return
+                self.__open += 1
+
+            self.release(self.__create())
+
+    def close(self):
+        """Close the pool.
+
+        Idle connections are closed immediately, and connections currently lent out are closed when they are released.
+        """
+
+        self.__check_fork()
+        with self.__condition:
+            self.__closed = True
+            idle = list(self.__idle)
+            self.__idle.clear()
+
+        for connection, _, _ in idle:
+            self.__discard(connection)
+
+    def statistics(self) -> PoolStatistics:
+        """Get a snapshot of this pool's state.
+
+        Returns:
+            A PoolStatistics object with current sizes and lifetime counters.
+        """
+
+        with self.__condition:
+            return PoolStatistics(
+                max_size=self.max_size,
+                min_size=self.min_size,
+                open=self.__open,
+                idle=len(self.__idle),
+                in_use=self.__open - len(self.__idle),
+                waiting=self.__waiting,
+                checkouts=self.__checkouts,
+                connections_created=self.__connections_created,
+                connections_recycled=self.__connections_recycled,
+                failed_pings=self.__failed_pings,
+                timeouts=self.__timeouts,
+            )
+
+    def __check_fork(self):
+        if self.__pid == os.getpid():
+            return
+
+        # The parent's lock may have been held at the time of the fork, so it cannot be used here
+        self.__pid = os.getpid()
+        self.__condition = threading.Condition()
+        self.__idle = deque()
+        self.__created_at = {}
+        self.__open = 0
+        self.__waiting = 0
+        self.__filled = False
+
+    def __create(self) -> pymysql.Connection:
+        try:
+            connection = self.__connect()
+        except BaseException:
+            with self.__condition:
+                self.__open -= 1
+                self.__condition.notify()
+            raise
+
+        with self.__condition:
+            self.__created_at[id(connection)] = time.monotonic()
+            self.__connections_created += 1
+
+        return connection
+
+    def __discard(self, connection: pymysql.Connection, recycled: bool = False):
+        with self.__condition:
+            self.__created_at.pop(id(connection), None)
+            self.__open -= 1
+            if recycled:
+                self.__connections_recycled += 1
+            self.__condition.notify()
+
+        if connection.open:
+            try:
+                connection.close()
+            except self.__error:
+                pass
+
+    def __take_stale(self) -> List[Tuple[pymysql.Connection, float, float]]:
+        stale: List[Tuple[pymysql.Connection, float, float]] = []
+        if self.max_idle is None:
+            return stale
+
+        now = time.monotonic()
+        while self.__idle and self.__open - len(stale) > self.min_size and now - self.__idle[0][2] > self.max_idle:
+            stale.append(self.__idle.popleft())
+
+        return stale
+
+    def __expired(self, created_at: float) -> bool:
+        return self.recycle is not None and time.monotonic() - created_at > self.recycle
+
+    def __ping(self, connection: pymysql.Connection) -> bool:
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except self.__error:
+            with self.__condition:
+                self.__failed_pings += 1
+            return False
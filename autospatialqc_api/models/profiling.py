@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, TypeVar
+
+import pydantic
+
+if TYPE_CHECKING:
+    from autospatialqc_api.models.database import Database
+
+T = TypeVar("T")
+
+_WHITESPACE = re.compile(r"\s+")
+_END = object()
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Describe query parameters by their types, without their values.
+
+    Arguments:
+        parameters (Any): the parameters of a statement, as passed to `cursor.execute`.
+
+    Returns:
+        The parameters with every value replaced by the name of its type, such as `{"assay": "str"}` or
+          `["str", "int"]`. Long sequences are summarized by their length and the types they contain.
+    """
+
+    if parameters is None:
+        return None
+    if isinstance(parameters, Mapping):
+        return {str(key): _type_name(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if len(parameters) > 16:
+            return {"length": len(parameters), "types": sorted({_type_name(value) for value in parameters})}
+        return [_type_name(value) for value in parameters]
+    return _type_name(parameters)
+
+
+def _type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (datetime, date)):
+        return "datetime"
+    return type(value).__name__
+
+
+class StatementProfile(pydantic.BaseModel):
+    """Timings of one statement run by a Database operation."""
+
+    # The innermost Database method that ran the statement
+    operation: str
+
+    sql: str
+    executemany: bool = False
+
+    # The statement's parameter values, for hooks; never serialized
+    parameters: Any = pydantic.Field(default=None, exclude=True)
+
+    execute_seconds: float = 0.0
+    fetch_seconds: float = 0.0
+    rows: int = 0
+
+    # The engine's query plan, if a hook captured it
+    plan: Optional[List[Dict[str, Any]]] = None
+
+    @pydantic.computed_field  # type: ignore[misc]
+    @property
+    def parameter_shape(self) -> Any:
+        if self.executemany:
+            rows = list(self.parameters or [])
+            return {"rows": len(rows), "row": parameter_shape(rows[0]) if rows else None}
+        return parameter_shape(self.parameters)
+
+
+class OperationProfile(pydantic.BaseModel):
+    """Timings of a Database method call, including every method it called, by phase.
+
+    `checkout_seconds` is the time spent waiting for pooled connections, including `connect_seconds` spent opening new
+    ones.
+    """
+
+    operation: str
+    started_at: datetime
+
+    total_seconds: float = 0.0
+    connect_seconds: float = 0.0
+    checkout_seconds: float = 0.0
+    execute_seconds: float = 0.0
+    fetch_seconds: float = 0.0
+    commit_seconds: float = 0.0
+
+    statements: List[StatementProfile] = []
+
+    # The name of the exception the operation raised, if any
+    error: Optional[str] = None
+
+
+class QueryHook:
+    """Receives the profiles of Database operations. Every method does nothing unless overridden.
+
+    Hooks run on the thread of the operation, so they should be cheap or only act on slow operations. Exceptions they
+    raise are logged and otherwise ignored.
+    """
+
+    def start_operation(self, profile: OperationProfile):
+        """Called when an outermost Database method starts."""
+
+    def statement_executed(self, profile: OperationProfile, statement: StatementProfile):
+        """Called when a statement has been executed, before its rows are fetched."""
+
+    def finish_operation(self, profile: OperationProfile):
+        """Called when an outermost Database method has returned or raised, after its connections are released."""
+
+
+class SlowQueryLog(QueryHook):
+    """Logs operations slower than a threshold as one JSON object each, with parameter types but no values."""
+
+    def __init__(self, threshold: float, logger: Optional[logging.Logger] = None):
+        """Initializes a new slow query log.
+
+        Arguments:
+            threshold (float): seconds after which an operation is logged.
+            logger (logging.Logger | None): the logger to write to, at the WARNING level. Defaults to the
+              "autospatialqc_api.slow_queries" logger.
+        """
+
+        self.threshold = threshold
+        self.logger = logger or logging.getLogger("autospatialqc_api.slow_queries")
+
+    def finish_operation(self, profile: OperationProfile):
+        if profile.total_seconds < self.threshold:
+            return
+
+        record = profile.model_dump(mode="json")
+        for statement in record["statements"]:
+            statement["sql"] = _WHITESPACE.sub(" ", statement["sql"]).strip()
+
+        self.logger.warning(
+            "Slow database operation %s took %.3fs.",
+            profile.operation,
+            profile.total_seconds,
+            extra={"event": "slow_query", "query_profile": record},
+        )
+
+
+class ExplainCapture(QueryHook):
+    """Attaches the engine's query plan to the SELECT statements of operations slower than a threshold.
+
+    Plans are read after the operation, on a connection of the same database, so they describe the statement as it
+    would run now. Add this hook before any hook that reports the plans.
+    """
+
+    def __init__(self, database: Database, threshold: float):
+        """Initializes a new EXPLAIN capture.
+
+        Arguments:
+            database (Database): the database whose operations are profiled.
+            threshold (float): seconds after which an operation's statements are explained.
+        """
+
+        self.database = database
+        self.threshold = threshold
+
+    def finish_operation(self, profile: OperationProfile):
+        if profile.total_seconds < self.threshold:
+            return
+
+        for statement in profile.statements:
+            if not statement.executemany and statement.sql.lstrip().upper().startswith("SELECT"):
+                statement.plan = self.database.explain(statement.sql, statement.parameters)
+
+
+class _ProfiledCursor:
+    """Cursor that records the timings of its statements into the current operation."""
+
+    def __init__(self, cursor: Any, profiler: QueryProfiler):
+        self.__cursor = cursor
+        self.__profiler = profiler
+        self.__statement: Optional[StatementProfile] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__cursor, name)
+
+    def __enter__(self) -> _ProfiledCursor:
+        self.__cursor.__enter__()
+        return self
+
+    def __exit__(self, *args: Any) -> Any:
+        return self.__cursor.__exit__(*args)
+
+    def execute(self, sql: str, parameters: Any = None) -> Any:
+        return self.__execute(self.__cursor.execute, sql, parameters, False)
+
+    def executemany(self, sql: str, parameters: Any) -> Any:
+        return self.__execute(self.__cursor.executemany, sql, parameters, True)
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = self.__cursor.fetchone()
+        self.__fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size: Optional[int] = None) -> Any:
+        started = time.perf_counter()
+        rows = self.__cursor.fetchmany() if size is None else self.__cursor.fetchmany(size)
+        self.__fetched(started, len(rows))
+        return rows
+
+    def fetchall(self) -> Any:
+        started = time.perf_counter()
+        rows = self.__cursor.fetchall()
+        self.__fetched(started, len(rows))
+        return rows
+
+    def __iter__(self) -> Iterator[Any]:
+        rows = iter(self.__cursor)
+        while True:
+            started = time.perf_counter()
+            row = next(rows, None)
+            if row is None:
+                self.__fetched(started, 0)
+                return
+            self.__fetched(started, 1)
+            yield row
+
+    def __execute(self, execute: Any, sql: str, parameters: Any, many: bool) -> Any:
+        profile, operation = self.__profiler.current()
+        if profile is None or operation is None:
+            self.__statement = None
+            return execute(sql, parameters)
+
+        statement = StatementProfile(operation=operation, sql=sql, parameters=parameters, executemany=many)
+        started = time.perf_counter()
+        try:
+            return execute(sql, parameters)
+        finally:
+            statement.execute_seconds = time.perf_counter() - started
+            profile.execute_seconds += statement.execute_seconds
+            profile.statements.append(statement)
+            self.__statement = statement
+            self.__profiler.notify("statement_executed", profile, statement)
+
+    def __fetched(self, started: float, rows: int):
+        elapsed = time.perf_counter() - started
+        if (statement := self.__statement) is None or (profile := self.__profiler.current()[0]) is None:
+            return
+
+        statement.fetch_seconds += elapsed
+        statement.rows += rows
+        profile.fetch_seconds += elapsed
+
+
+class _ProfiledConnection:
+    """Connection whose cursors and commits are recorded into the current operation."""
+
+    def __init__(self, connection: Any, profiler: QueryProfiler):
+        self.__connection = connection
+        self.__profiler = profiler
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.__connection, name)
+
+    def cursor(self, *args: Any) -> _ProfiledCursor:
+        return _ProfiledCursor(self.__connection.cursor(*args), self.__profiler)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            self.__connection.commit()
+        finally:
+            if (profile := self.__profiler.current()[0]) is not None:
+                profile.commit_seconds += time.perf_counter() - started
+
+
+class QueryProfiler:
+    """Times Database operations by phase and hands their profiles to hooks.
+
+    An operation is a call to a public Database method. Methods called by other methods, such as the `get_sample`
+    inside `add_sample`, are part of the outermost operation, but their statements keep their own names.
+    """
+
+    def __init__(self, hooks: Sequence[QueryHook] = ()):
+        """Initializes a new profiler.
+
+        Arguments:
+            hooks (Sequence[QueryHook]): the hooks that receive profiles, called in order. Defaults to none.
+        """
+
+        self.hooks = list(hooks)
+        self.__local = threading.local()
+
+    def current(self) -> Tuple[Optional[OperationProfile], Optional[str]]:
+        """Get the current thread's operation.
+
+        Returns:
+            A (profile, name) tuple with the outermost operation's profile and the innermost operation's name, or
+              (None, None) outside of any operation.
+        """
+
+        names = getattr(self.__local, "names", None)
+        return (self.__local.profile, names[-1]) if names else (None, None)
+
+    @contextmanager
+    def operation(self, name: str) -> Iterator[OperationProfile]:
+        """Profile the calls made in a `with` block as one operation, or as part of the current one.
+
+        Arguments:
+            name (str): the operation's name.
+
+        Yields:
+            The profile of the outermost operation.
+        """
+
+        names = getattr(self.__local, "names", None)
+        if names:
+            names.append(name)
+            try:
+                yield self.__local.profile
+            finally:
+                names.pop()
+            return
+
+        profile = OperationProfile(operation=name, started_at=datetime.now())
+        self.__local.names = [name]
+        self.__local.profile = profile
+        self.notify("start_operation", profile)
+
+        started = time.perf_counter()
+        try:
+            yield profile
+        except BaseException as e:
+            profile.error = type(e).__name__
+            raise
+        finally:
+            profile.total_seconds = time.perf_counter() - started
+            self.__local.names = None
+            self.__local.profile = None
+            self.notify("finish_operation", profile)
+
+    def iterate(self, name: str, items: Iterator[T]) -> Iterator[T]:
+        """Profile the production of an iterator's items as one operation, or as part of the current one.
+
+        The operation is only current while the iterator is producing an item, so that whatever its consumer does in
+        between, including abandoning it, is not attributed to it. Its total is the time spent producing items.
+
+        Arguments:
+            name (str): the operation's name.
+            items (Iterator[T]): the iterator, such as a generator returned by a Database method.
+
+        Yields:
+            The iterator's items.
+        """
+
+        profile: Optional[OperationProfile] = None
+        elapsed = 0.0
+
+        try:
+            while True:
+                if names := getattr(self.__local, "names", None):
+                    # Consumed by another operation, which the items are part of
+                    names.append(name)
+                    try:
+                        item = next(items, _END)
+                    finally:
+                        names.pop()
+                else:
+                    if profile is None:
+                        profile = OperationProfile(operation=name, started_at=datetime.now())
+                        self.notify("start_operation", profile)
+
+                    self.__local.names = [name]
+                    self.__local.profile = profile
+                    started = time.perf_counter()
+                    try:
+                        item = next(items, _END)
+                    finally:
+                        elapsed += time.perf_counter() - started
+                        self.__local.names = None
+                        self.__local.profile = None
+
+                if item is _END:
+                    return
+                yield item  # type: ignore[misc]
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            if profile is not None:
+                profile.error = type(e).__name__
+            raise
+        finally:
+            if (close := getattr(items, "close", None)) is not None:
+                close()
+            if profile is not None:
+                profile.total_seconds = elapsed
+                self.notify("finish_operation", profile)
+
+    def connection(self, connection: Any) -> Any:
+        """Wrap a connection so that its statements are recorded into the current operation."""
+
+        return _ProfiledConnection(connection, self)
+
+    def notify(self, event: str, *args: Any):
+        """Call a method of every hook, logging rather than raising their exceptions."""
+
+        for hook in self.hooks:
+            try:
+                getattr(hook, event)(*args)
+            except Exception:
+                logging.getLogger(__name__).exception("Query hook %s failed on %s.", type(hook).__name__, event)
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pydantic
+
+from autospatialqc_api.models.sample import Sample
+from autospatialqc_api.models.stats import AssayReference, SampleStatistics
+
+# QC verdicts, from best to worst; a sample's status is the worst verdict of its metrics
+QC_LEVELS = ("pass", "warn", "fail")
+
+# Scale factors that make the median and mean absolute deviations consistent with the standard deviation of a normal
+# distribution
+_MEDIAN_DEVIATION_SCALE = 1.4826
+_MEAN_DEVIATION_SCALE = 1.2533
+
+
+class QCThresholds(pydantic.BaseModel):
+    """Robust z-score thresholds at which a sample's metrics are flagged."""
+
+    warn: float = 3.5
+    fail: float = 5.0
+
+    # (warn, fail) thresholds of individual metrics, overriding the defaults above
+    metrics: Dict[str, Tuple[float, float]] = {}
+
+    # Assays with fewer samples than this are not scored
+    min_reference: int = 5
+
+    @pydantic.field_validator("metrics")
+    @classmethod
+    def _validate_metrics(cls, metrics: Dict[str, Tuple[float, float]]):
+        if unknown := set(metrics) - set(Sample.metric_fields()):
+            raise ValueError(f"Cannot set thresholds of unknown fields {sorted(unknown)}.")
+        return metrics
+
+    def limits(self, fields: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the warn and fail thresholds of some fields as arrays, in order."""
+
+        limits = np.array([self.metrics.get(field, (self.warn, self.fail)) for field in fields], dtype=float)
+        return limits[:, 0], limits[:, 1]
+
+
+class QCResult(pydantic.BaseModel):
+    """QC verdict of a sample."""
+
+    # The worst verdict of the sample's metrics, or None if its assay is too small to score against
+    status: Optional[str] = None
+
+    # Verdict of every metric
+    flags: Dict[str, str] = {}
+
+
+def robust_z_scores(values: np.ndarray, reference: AssayReference) -> np.ndarray:
+    """Score samples' metrics by their distance from the median of a reference distribution.
+
+    Distances are scaled by the median absolute deviation, or by the mean absolute deviation for metrics where more
+    than half of the reference is identical. Metrics without any spread score 0 at the median and infinity elsewhere.
+
+    Arguments:
+        values (np.ndarray): a (samples, fields) array of metrics.
+        reference (AssayReference): the distribution to score against, with the same fields.
+
+    Returns:
+        A (samples, fields) array of absolute robust z-scores.
+    """
+
+    scale = np.where(
+        reference.median_deviation > 0,
+        reference.median_deviation * _MEDIAN_DEVIATION_SCALE,
+        reference.mean_deviation * _MEAN_DEVIATION_SCALE,
+    )
+    distance = np.abs(values - reference.median)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(distance == 0, 0.0, distance / scale)
+
+
+def score_samples(
+    values: np.ndarray, reference: Optional[AssayReference], fields: Sequence[str], thresholds: QCThresholds
+) -> List[QCResult]:
+    """Flag samples whose metrics are outliers in their assay.
+
+    Arguments:
+        values (np.ndarray): a (samples, fields) array of metrics.
+        reference (AssayReference | None): the distribution of the assay's metrics, or None if it has no samples.
+        fields (Sequence[str]): the names of the metric fields, in order.
+        thresholds (QCThresholds): the thresholds at which metrics are flagged.
+
+    Returns:
+        The QC verdict of each sample, in order.
+    """
+
+    if reference is None or reference.n_samples < thresholds.min_reference:
+        return [QCResult() for _ in range(len(values))]
+
+    scores = robust_z_scores(values, reference)
+    warn, fail = thresholds.limits(fields)
+    levels = (scores >= warn).astype(int) + (scores >= fail)
+
+    return [
+        QCResult(
+            status=QC_LEVELS[row.max(initial=0)],
+            flags={field: QC_LEVELS[level] for field, level in zip(fields, row.tolist())},
+        )
+        for row in levels
+    ]
+
+
+def score_new_samples(
+    samples: Sequence[Sample], statistics: SampleStatistics, thresholds: QCThresholds
+) -> List[QCResult]:
+    """Flag samples that are outliers among the samples already in their assays.
+
+    Arguments:
+        samples (Sequence[Sample]): the samples to score.
+        statistics (SampleStatistics): statistics of the samples already in the database.
+        thresholds (QCThresholds): the thresholds at which metrics are flagged.
+
+    Returns:
+        The QC verdict of each sample, in order. Samples are scored with one vectorized pass per assay.
+    """
+
+    assays: Dict[str, List[int]] = {}
+    for index, sample in enumerate(samples):
+        assays.setdefault(sample.assay, []).append(index)
+
+    results: List[QCResult] = [QCResult()] * len(samples)
+    for assay, indices in assays.items():
+        values = statistics.values([dict(samples[index]) for index in indices])
+        scored = score_samples(values, statistics.reference(assay), statistics.fields, thresholds)
+        for index, result in zip(indices, scored):
+            results[index] = result
+
+    return results
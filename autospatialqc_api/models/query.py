@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pydantic
+
+from autospatialqc_api.models.sample import Sample
+
+
+def _escape_like(value: str) -> str:
+    # MySQL escapes with a backslash by default and SQLite has no default, so the escape character is always explicit
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+class SampleFilter(pydantic.BaseModel):
+    """Represents a filter over the samples table."""
+
+    assay: Optional[str] = None
+    tissue: Optional[str] = None
+
+    # Whether `assay` and `tissue` are prefixes rather than exact values
+    assay_prefix: bool = False
+    tissue_prefix: bool = False
+
+    # Inclusive (minimum, maximum) bounds on numeric fields, either of which may be None
+    ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+
+    # Only match samples with these ids
+    ids: Optional[List[int]] = None
+
+    # Only match samples changed at or after this time
+    updated_since: Optional[datetime] = None
+
+    # Only match samples created at or after, and before, these times
+    created_since: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+    @pydantic.field_validator("ranges")
+    @classmethod
+    def _validate_ranges(cls, ranges: Dict[str, Tuple[Optional[float], Optional[float]]]):
+        if unknown := set(ranges) - set(Sample.metric_fields()):
+            raise ValueError(f"Cannot filter on unknown fields {sorted(unknown)}.")
+        return ranges
+
+    def where(self) -> Tuple[str, List[Any]]:
+        """Build the SQL condition for this filter.
+
+        Returns:
+            A (condition, parameters) tuple, where the condition is suitable for a WHERE clause and always valid, even
+              when this filter is empty.
+        """
+
+        conditions = ["TRUE"]
+        parameters: List[Any] = []
+
+        for column, value, prefix in (
+            ("assay", self.assay, self.assay_prefix),
+            ("tissue", self.tissue, self.tissue_prefix),
+        ):
+            if value is None:
+                continue
+            if prefix:
+                conditions.append(f"{column} LIKE %s ESCAPE '!'")
+                parameters.append(_escape_like(value) + "%")
+            else:
+                conditions.append(f"{column} = %s")
+                parameters.append(value)
+
+        for field, (minimum, maximum) in self.ranges.items():
+            if minimum is not None:
+                conditions.append(f"{field} >= %s")
+                parameters.append(minimum)
+            if maximum is not None:
+                conditions.append(f"{field} <= %s")
+                parameters.append(maximum)
+
+        if self.ids is not None:
+            conditions.append(f"id IN ({', '.join(['%s'] * len(self.ids))})" if self.ids else "FALSE")
+            parameters.extend(self.ids)
+
+        if self.updated_since is not None:
+            conditions.append("updated_at >= %s")
+            parameters.append(self.updated_since)
+
+        if self.created_since is not None:
+            conditions.append("created_at >= %s")
+            parameters.append(self.created_since)
+        if self.created_before is not None:
+            conditions.append("created_at < %s")
+            parameters.append(self.created_before)
+
+        return " AND ".join(conditions), parameters
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor token."""
+
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token: str) -> List[Any]:
+    """Decode a cursor token made by `encode_cursor`.
+
+    Raises:
+        ValueError: if the token is malformed.
+    """
+
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except (UnicodeError, ValueError) as e:
+        raise ValueError(f"Malformed cursor '{token}'.") from e
+
+    if not isinstance(values, list):
+        raise ValueError(f"Malformed cursor '{token}'.")
+
+    return values
@@ -1,4 +1,8 @@
-from typing import List, Optional
+from __future__ import annotations
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 import pydantic
 
@@ -29,6 +33,21 @@ class Sample(pydantic.BaseModel):
     transcripts_per_area: float
     transcripts_per_feature: float
 
+    # Ingest-time QC verdict against the other samples of the assay, None until scored; not part of the sample's data
+    qc_status: Optional[str] = None
+    qc_flags: Optional[Dict[str, str]] = None
+
+    # How many times the database row was written, and when it was last changed, if the sample was read from the
+    # database; not part of the sample's data, so never serialized
+    version: Optional[int] = pydantic.Field(default=None, exclude=True)
+    updated_at: Optional[datetime] = pydantic.Field(default=None, exclude=True)
+
+    @pydantic.field_validator("qc_flags", mode="before")
+    @classmethod
+    def _parse_qc_flags(cls, qc_flags: Any) -> Any:
+        # JSON columns are read as strings
+        return json.loads(qc_flags) if isinstance(qc_flags, (str, bytes)) else qc_flags
+
     @classmethod
     def data_fields(cls) -> List[str]:
         """Gets the list of the names of the most important data fields of a Sample."""
@@ -52,3 +71,47 @@ class Sample(pydantic.BaseModel):
             "transcripts_per_area",
             "transcripts_per_feature",
         ]
+
+    @classmethod
+    def metric_fields(cls) -> List[str]:
+        """Gets the list of the names of the numeric QC metric fields of a Sample."""
+
+        return [field for field in cls.data_fields() if field not in ("assay", "tissue")]
+
+
+# Validates the rows of a query in one call, rather than one `model_validate` call per row
+SAMPLE_ROWS: pydantic.TypeAdapter[List[Sample]] = pydantic.TypeAdapter(List[Sample])
+
+
+class SampleUpdate(pydantic.BaseModel):
+    """Represents new values for some metrics of a sample. Fields that are not set are left unchanged."""
+
+    model_config = pydantic.ConfigDict(extra="forbid")
+
+    area: Optional[float] = None
+    assigned_transcripts: Optional[float] = None
+    cell_count: Optional[int] = None
+    cell_over25_count: Optional[int] = None
+    complexity: Optional[float] = None
+    false_discovery_rate: Optional[float] = None
+    median_counts: Optional[float] = None
+    median_genes: Optional[float] = None
+    reference_correlation: Optional[float] = None
+    sparsity: Optional[float] = None
+    volume: Optional[float] = None
+    x_transcript_count: Optional[int] = None
+    y_transcript_count: Optional[int] = None
+    transcripts_per_area: Optional[float] = None
+    transcripts_per_feature: Optional[float] = None
+
+    @pydantic.model_validator(mode="after")
+    def _forbid_nulls(self) -> SampleUpdate:
+        # Every metric column is required, so a field can be left out but not cleared
+        if nulls := sorted(field for field in self.model_fields_set if getattr(self, field) is None):
+            raise ValueError(f"Fields {nulls} cannot be null.")
+        return self
+
+    def changes(self) -> Dict[str, Any]:
+        """Gets the fields that were set, with their new values."""
+
+        return self.model_dump(exclude_unset=True)
@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Mapping, Optional, Sequence
+
+import numpy as np
+import pydantic
+
+from autospatialqc_api.models.database import Database
+from autospatialqc_api.models.query import SampleFilter
+from autospatialqc_api.models.sample import Sample
+
+if sys.platform != "win32":
+    import fcntl
+
+SNAPSHOT_VERSION = 2
+
+
+def _column_dtypes() -> Dict[str, str]:
+    """Get the NumPy type of every snapshot column, in order."""
+
+    numeric: Dict[Any, str] = {int: "int64", float: "float64"}
+    return {
+        "id": "int64",
+        **{field: numeric.get(Sample.model_fields[field].annotation, "str") for field in Sample.data_fields()},
+        "qc_status": "str",
+        "updated_at": "datetime64[us]",
+    }
+
+
+class SnapshotColumn(pydantic.BaseModel):
+    """A column of a snapshot segment."""
+
+    # NumPy type of the column's array, such as "float64" or "<U32"
+    dtype: str
+
+    # Name of the column's `.npy` file, relative to the snapshot's directory
+    file: str
+
+
+class SnapshotSegment(pydantic.BaseModel):
+    """Rows written by one refresh of a snapshot, sorted by id."""
+
+    # The refresh that wrote the segment; part of its file names, so that files are never modified once written
+    generation: int
+
+    rows: int
+    columns: Dict[str, SnapshotColumn]
+
+    # Ids of rows of earlier segments that were deleted, if any
+    deleted: Optional[SnapshotColumn] = None
+
+
+class SnapshotManifest(pydantic.BaseModel):
+    """Description of a snapshot of the samples table."""
+
+    version: int = SNAPSHOT_VERSION
+
+    # Incremented by every refresh that writes a segment
+    generation: int
+
+    # Number of rows once the segments are merged
+    rows: int
+    created_at: datetime
+
+    # Latest `updated_at` of the snapshot's rows, from which the next refresh reads changes
+    watermark: Optional[datetime] = None
+
+    columns: List[str]
+
+    # A base segment with every row, followed by the changes of later refreshes, oldest first. Rows of a segment
+    # replace the rows of earlier segments with the same id.
+    segments: List[SnapshotSegment]
+
+
+class SampleSnapshot:
+    """Columnar copy of the samples table, stored as segments of `.npy` files, one per column, and a `manifest.json`.
+
+    Rows are sorted by id within each segment. Strings are stored as fixed-width unicode arrays, so that every column
+    can be opened with `np.load(path, mmap_mode="r")` without copying or unpickling anything.
+
+    A full refresh writes a base segment with every row. Later refreshes read the rows changed since shortly before the
+    manifest's watermark, any ids the snapshot is missing, such as rows committed after a later row was read, and the
+    ids of every row to find deleted ones. They write the rows that differ, and the deleted ids, as a new segment; a
+    refresh that finds no differences writes nothing. Once the segments' changed rows add up to `compact_ratio` of the
+    snapshot's rows, or there would be more than `max_segments` segments, they are merged into a new base. Files of
+    the previous manifest are kept for readers that are still using it; older ones are removed. Refreshes are meant to
+    run outside of requests, such as from `scripts/snapshot-samples.py`.
+    """
+
+    def __init__(self, directory: str, max_segments: int = 8, compact_ratio: float = 0.25):
+        """Initializes a snapshot stored in a directory, which is created by the first refresh.
+
+        Arguments:
+            directory (str): the snapshot's directory.
+            max_segments (int): the most segments, including the base, a snapshot may have. Defaults to 8.
+            compact_ratio (float): the number of changed rows, as a fraction of the snapshot's rows, at which the
+              segments are merged. Defaults to 0.25.
+        """
+
+        self.directory = directory
+        self.max_segments = max_segments
+        self.compact_ratio = compact_ratio
+        self.__lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> str:
+        """The path of the snapshot's manifest."""
+
+        return os.path.join(self.directory, "manifest.json")
+
+    def manifest(self) -> Optional[SnapshotManifest]:
+        """Read the snapshot's manifest.
+
+        Returns:
+            The manifest, or None if the snapshot was never written, or was written by an incompatible version.
+        """
+
+        try:
+            with open(self.manifest_path) as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            return SnapshotManifest.model_validate_json(data)
+        except pydantic.ValidationError:
+            return None
+
+    def path(self, column: SnapshotColumn) -> str:
+        """Get the path of a segment's column file.
+
+        Arguments:
+            column (SnapshotColumn): the column, from a segment of a manifest.
+
+        Returns:
+            The path of the column's `.npy` file.
+        """
+
+        return os.path.join(self.directory, column.file)
+
+    def load(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        mmap_mode: Optional[Literal["r+", "r", "w+", "c"]] = "r",
+        manifest: Optional[SnapshotManifest] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Open columns of the snapshot, merging its segments.
+
+        A snapshot with a single segment is opened as it is stored, so memory maps are kept. Otherwise, the merged
+        columns are read into memory.
+
+        Arguments:
+            columns (Sequence[str] | None): the columns to open, or None for every column. Defaults to None.
+            mmap_mode (str | None): passed to `np.load`; None reads the columns into memory. Defaults to "r".
+            manifest (SnapshotManifest | None): the manifest to read, or None for the current one. Defaults to None.
+
+        Returns:
+            A column -> array mapping, sorted by id, or an empty mapping if the snapshot was never written.
+
+        Raises:
+            KeyError: if the snapshot has no such column.
+        """
+
+        if manifest is None and (manifest := self.manifest()) is None:
+            return {}
+
+        columns = list(manifest.columns) if columns is None else list(columns)
+        if unknown := set(columns) - set(manifest.columns):
+            raise KeyError(f"The snapshot has no columns {sorted(unknown)}.")
+        read = ["id", *(column for column in columns if column != "id")]
+
+        merged: Dict[str, np.ndarray] = {}
+        for segment in manifest.segments:
+            values = {column: np.load(self.path(segment.columns[column]), mmap_mode=mmap_mode) for column in read}
+            if not merged:
+                merged = values
+                continue
+
+            keep = ~np.isin(merged["id"], values["id"])
+            if segment.deleted is not None:
+                keep &= ~np.isin(merged["id"], np.load(self.path(segment.deleted)))
+            merged = {column: np.concatenate([merged[column][keep], values[column]]) for column in read}
+
+        if len(manifest.segments) > 1:
+            order = np.argsort(merged["id"], kind="stable")
+            merged = {column: values[order] for column, values in merged.items()}
+
+        return {column: merged[column] for column in columns}
+
+    def refresh(
+        self, database: Database, full: bool = False, chunk_size: int = 10000, lookback: float = 60.0
+    ) -> SnapshotManifest:
+        """Bring the snapshot up to date with the samples table.
+
+        Arguments:
+            database (Database): the database to read from.
+            full (bool): whether to rewrite the snapshot from a full read of the table, rather than from the rows
+              changed since the watermark. Defaults to False.
+            chunk_size (int): the number of rows converted to arrays, or of missing ids read, at once. Defaults to
+              10000.
+            lookback (float): seconds before the watermark from which changes are read again, to pick up updates
+              committed after later ones were read. Defaults to 60.
+
+        Returns:
+            The manifest of the new generation, or the current manifest if nothing changed.
+        """
+
+        dtypes = _column_dtypes()
+
+        with self.__locked():
+            manifest = self.manifest()
+            if manifest is not None and manifest.columns != list(dtypes):
+                full = True
+
+            if full or manifest is None:
+                columns = self.__sorted(self.__read(database.iter_samples(columns=list(dtypes)), dtypes, chunk_size))
+                updated_at = columns["updated_at"]
+                return self.__publish(
+                    manifest,
+                    columns,
+                    None,
+                    rows=len(columns["id"]),
+                    watermark=updated_at.max().astype(datetime) if len(updated_at) else None,
+                )
+
+            previous = self.load(manifest=manifest)
+            since = None if manifest.watermark is None else manifest.watermark - timedelta(seconds=lookback)
+            changed = self.__read(
+                database.iter_samples(SampleFilter(updated_since=since), columns=list(dtypes)), dtypes, chunk_size
+            )
+            live = np.sort(np.fromiter((row["id"] for row in database.iter_samples(columns=["id"])), dtype="int64"))
+
+            # Rows committed after rows with later modification times were read are behind the watermark, so the rows
+            # the snapshot is missing are read by id
+            missing = np.setdiff1d(live, np.union1d(previous["id"], changed["id"]))
+            for ids in np.split(missing, range(chunk_size, len(missing), chunk_size)) if len(missing) else []:
+                late = self.__read(
+                    database.iter_samples(SampleFilter(ids=ids.tolist()), columns=list(dtypes)), dtypes, chunk_size
+                )
+                changed = {column: np.concatenate([changed[column], late[column]]) for column in changed}
+
+            changed = self.__sorted(self.__differences(previous, changed, live))
+            deleted = np.setdiff1d(previous["id"], live)
+            if not len(changed["id"]) and not len(deleted):
+                return manifest
+
+            rows = len(previous["id"]) - len(deleted) + int(np.isin(changed["id"], previous["id"], invert=True).sum())
+            watermark = manifest.watermark
+            if len(changed["id"]):
+                latest = changed["updated_at"].max().astype(datetime)
+                watermark = latest if watermark is None else max(watermark, latest)
+
+            changes = sum(segment.rows for segment in manifest.segments[1:]) + len(changed["id"])
+            if len(manifest.segments) < self.max_segments and changes <= self.compact_ratio * max(rows, 1):
+                return self.__publish(manifest, changed, deleted, rows=rows, watermark=watermark)
+
+            # Merge the segments into a new base
+            keep = np.isin(previous["id"], live) & np.isin(previous["id"], changed["id"], invert=True)
+            merged = {column: np.concatenate([previous[column][keep], changed[column]]) for column in changed}
+            return self.__publish(manifest, self.__sorted(merged), None, rows=rows, watermark=watermark)
+
+    @contextmanager
+    def __locked(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Refreshes may run in several processes at once, such as overlapping runs of the CLI. Windows has no flock, so
+        # there they are only serialized within the process.
+        with self.__lock, open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            if sys.platform != "win32":
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if sys.platform != "win32":
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __next_generation(self, manifest: Optional[SnapshotManifest]) -> int:
+        if manifest is not None:
+            return manifest.generation + 1
+
+        # Generations are never reused, even across versions, since clients may cache files by generation
+        try:
+            with open(self.manifest_path) as file:
+                return int(json.load(file)["generation"]) + 1
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            return 0
+
+    @staticmethod
+    def __read(rows: Iterable[Mapping[str, Any]], dtypes: Dict[str, str], chunk_size: int) -> Dict[str, np.ndarray]:
+        chunks: Dict[str, List[np.ndarray]] = {column: [np.empty(0, dtype=dtype)] for column, dtype in dtypes.items()}
+
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            for column, dtype in dtypes.items():
+                values = [row[column] for row in chunk]
+                if column == "qc_status":
+                    values = [value or "" for value in values]
+                chunks[column].append(np.array(values, dtype=dtype))
+
+        # Concatenation widens string columns to their longest value
+        return {column: np.concatenate(arrays) for column, arrays in chunks.items()}
+
+    @staticmethod
+    def __sorted(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        order = np.argsort(columns["id"], kind="stable")
+        return {column: values[order] for column, values in columns.items()}
+
+    @staticmethod
+    def __differences(
+        previous: Dict[str, np.ndarray], changed: Dict[str, np.ndarray], live: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        # Rows read again because of the lookback only count if they differ from the snapshot, and rows deleted since
+        # they were read don't count at all
+        differs = np.isin(changed["id"], live)
+        if len(previous["id"]):
+            # The merged snapshot is sorted by id
+            positions = np.minimum(np.searchsorted(previous["id"], changed["id"]), len(previous["id"]) - 1)
+            same = previous["id"][positions] == changed["id"]
+            for column, values in changed.items():
+                same &= previous[column][positions] == values
+            differs &= ~same
+
+        return {column: values[differs] for column, values in changed.items()}
+
+    def __publish(
+        self,
+        manifest: Optional[SnapshotManifest],
+        columns: Dict[str, np.ndarray],
+        deleted: Optional[np.ndarray],
+        rows: int,
+        watermark: Optional[datetime],
+    ) -> SnapshotManifest:
+        # Without deleted ids, the segment is a new base; with them, even if there are none, it is added to the others
+        generation = self.__next_generation(manifest)
+
+        files: Dict[str, SnapshotColumn] = {}
+        for column, values in columns.items():
+            files[column] = self.__save(f"{column}.{generation}.npy", values)
+
+        segment = SnapshotSegment(generation=generation, rows=len(columns["id"]), columns=files)
+        if deleted is not None and len(deleted):
+            segment.deleted = self.__save(f"deleted.{generation}.npy", deleted)
+
+        new_manifest = SnapshotManifest(
+            generation=generation,
+            rows=rows,
+            created_at=datetime.now(),
+            watermark=watermark,
+            columns=list(columns),
+            segments=[segment] if deleted is None or manifest is None else [*manifest.segments, segment],
+        )
+
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, "w") as manifest_file:
+            manifest_file.write(new_manifest.model_dump_json(indent=2))
+        os.replace(temporary_path, self.manifest_path)
+
+        # Keep the files of the previous manifest for its readers
+        current = {file for current_manifest in (manifest, new_manifest) for file in _files(current_manifest)}
+        for file in os.listdir(self.directory):
+            if file.endswith(".npy") and file not in current:
+                os.remove(os.path.join(self.directory, file))
+
+        return new_manifest
+
+    def __save(self, file: str, values: np.ndarray) -> SnapshotColumn:
+        np.save(os.path.join(self.directory, file), values, allow_pickle=False)
+        return SnapshotColumn(dtype=values.dtype.str, file=file)
+
+
+def _files(manifest: Optional[SnapshotManifest]) -> Iterator[str]:
+    """Iterate over the names of the files of a manifest's segments."""
+
+    for segment in [] if manifest is None else manifest.segments:
+        yield from (column.file for column in segment.columns.values())
+        if segment.deleted is not None:
+            yield segment.deleted.file
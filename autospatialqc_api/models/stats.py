@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pydantic
+
+from autospatialqc_api.models.errors import SampleNotFound
+from autospatialqc_api.models.sample import Sample
+
+# Quantiles kept for every metric, in the order of the summary's fields
+_QUANTILES = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+
+
+class MetricSummary(pydantic.BaseModel):
+    """Summary of one metric over the samples of an assay."""
+
+    mean: float
+    std: float
+    minimum: float
+    q1: float
+    median: float
+    q3: float
+    iqr: float
+    maximum: float
+
+
+class AssaySummary(pydantic.BaseModel):
+    """Summary of every metric over the samples of an assay."""
+
+    assay: str
+    count: int
+    metrics: Dict[str, MetricSummary]
+
+
+class PercentileRanks(pydantic.BaseModel):
+    """Percentile ranks of a sample's metrics within its assay."""
+
+    assay: str
+    tissue: str
+    count: int
+
+    # Percentage of the assay's samples below the sample's value, counting ties as half below
+    ranks: Dict[str, float]
+
+
+class AssayReference(NamedTuple):
+    """Location and spread of every metric over the samples of an assay, in the order of the statistics' fields."""
+
+    n_samples: int
+    median: np.ndarray
+    median_deviation: np.ndarray
+    mean_deviation: np.ndarray
+
+
+class _AssayColumns:
+    """Every metric of every sample of one assay, with each metric's values kept sorted."""
+
+    def __init__(self, fields: int):
+        self.sorted = np.empty((fields, 0))
+        self.samples: Dict[str, np.ndarray] = {}
+        self.sums = np.zeros(fields)
+        self.squares = np.zeros(fields)
+        self.deviations: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def build(cls, samples: Dict[str, np.ndarray], fields: int) -> _AssayColumns:
+        columns = cls(fields)
+        columns.samples = samples
+        values = np.array(list(samples.values())).reshape(-1, fields).T
+        columns.sorted = np.sort(values, axis=1)
+        columns.sums = values.sum(axis=1)
+        columns.squares = np.square(values).sum(axis=1)
+        return columns
+
+    def add(self, tissue: str, values: np.ndarray):
+        self.remove(tissue)
+
+        # Insert each metric's value at its own sorted position, all metrics at once
+        fields, count = self.sorted.shape
+        positions = np.array([np.searchsorted(row, value) for row, value in zip(self.sorted, values)])
+        columns = np.arange(count + 1)
+        sources = np.minimum(columns - (columns > positions[:, None]), max(count - 1, 0))
+
+        inserted = np.take_along_axis(self.sorted, sources, axis=1) if count else np.empty((fields, 1))
+        inserted[np.arange(fields), positions] = values
+
+        self.sorted = inserted
+        self.samples[tissue] = values
+        self.sums += values
+        self.squares += np.square(values)
+        self.deviations = None
+
+    def remove(self, tissue: str):
+        if (values := self.samples.pop(tissue, None)) is None:
+            return
+
+        fields, count = self.sorted.shape
+        positions = np.array([np.searchsorted(row, value) for row, value in zip(self.sorted, values)])
+        keep = np.arange(count) != positions[:, None]
+
+        self.sorted = self.sorted[keep].reshape(fields, count - 1)
+        self.sums -= values
+        self.squares -= np.square(values)
+        self.deviations = None
+
+    def quantiles(self) -> np.ndarray:
+        # Linear interpolation between the closest ranks, like `np.quantile`, without re-sorting
+        count = self.sorted.shape[1]
+        positions = _QUANTILES * (count - 1)
+        lower = np.floor(positions).astype(int)
+        upper = np.ceil(positions).astype(int)
+        fractions = positions - lower
+        return self.sorted[:, lower] * (1 - fractions) + self.sorted[:, upper] * fractions
+
+    def reference(self) -> AssayReference:
+        median = self.quantiles()[:, 2]
+
+        # Deviations take a pass over every value, so they are kept until the assay changes
+        if self.deviations is None:
+            self.deviations = (
+                np.median(np.abs(self.sorted - median[:, None]), axis=1),
+                np.mean(np.abs(self.sorted - (self.sums / self.sorted.shape[1])[:, None]), axis=1),
+            )
+
+        return AssayReference(self.sorted.shape[1], median, *self.deviations)
+
+    def ranks(self, values: np.ndarray) -> np.ndarray:
+        count = self.sorted.shape[1]
+        below = np.array([np.searchsorted(row, value, "left") for row, value in zip(self.sorted, values)])
+        not_above = np.array([np.searchsorted(row, value, "right") for row, value in zip(self.sorted, values)])
+        return (below + not_above) / (2 * count) * 100
+
+
+class SampleStatistics:
+    """In-memory, incrementally maintained summaries of the samples table, grouped by assay.
+
+    Every metric of every assay is kept as a sorted NumPy array, so that adding or removing a sample costs one
+    vectorized insertion or deletion, and summaries and percentile ranks are read from the arrays without scanning the
+    table. `rebuild` replaces everything from a full scan of the table, and changes made before the first rebuild are
+    ignored, since that rebuild sees them.
+
+    Statistics are kept per process and only see that process's changes incrementally; changes made by other processes
+    appear at the next rebuild.
+    """
+
+    def __init__(self, fields: Optional[Sequence[str]] = None):
+        """Initializes new, empty statistics.
+
+        Arguments:
+            fields (Sequence[str] | None): the metric fields to summarize. Defaults to every metric field of Sample.
+        """
+
+        self.fields = list(fields or Sample.metric_fields())
+
+        self.__lock = threading.Lock()
+        self.__assays: Dict[str, _AssayColumns] = {}
+        self.__built_at: Optional[float] = None
+
+    def after_fork(self):
+        """Replace the lock of statistics inherited by a forked process, which a thread of the parent may have held."""
+
+        self.__lock = threading.Lock()
+
+    @property
+    def built_at(self) -> Optional[float]:
+        """The `time.monotonic()` time of the last rebuild, or None if these statistics were never built."""
+
+        return self.__built_at
+
+    def rebuild(self, rows: Iterable[Mapping[str, Any]]):
+        """Replace these statistics with summaries of some rows.
+
+        Arguments:
+            rows (Iterable[Mapping[str, Any]]): every row of the samples table, with at least the assay, tissue and
+              metric fields.
+        """
+
+        grouped: Dict[str, Dict[str, np.ndarray]] = {}
+        for row in rows:
+            grouped.setdefault(row["assay"], {})[row["tissue"]] = self.values([row])[0]
+
+        assays = {assay: _AssayColumns.build(samples, len(self.fields)) for assay, samples in grouped.items()}
+
+        with self.__lock:
+            self.__assays = assays
+            self.__built_at = time.monotonic()
+
+    def add(self, *samples: Sample):
+        """Add samples, replacing any samples with the same assay and tissue.
+
+        Arguments:
+            samples (Sample): the samples to add.
+        """
+
+        values = self.values([dict(sample) for sample in samples])
+        with self.__lock:
+            if self.__built_at is None:
+                return
+            for sample, sample_values in zip(samples, values):
+                columns = self.__assays.setdefault(sample.assay, _AssayColumns(len(self.fields)))
+                columns.add(sample.tissue, sample_values)
+
+    def update(self, assay: str, tissue: str, values: Mapping[str, Any]):
+        """Change some metrics of a sample, if it is summarized.
+
+        Arguments:
+            assay (str): the sample's assay.
+            tissue (str): the sample's tissue.
+            values (Mapping[str, Any]): the new values of the changed metrics. Other fields are ignored.
+        """
+
+        with self.__lock:
+            if self.__built_at is None or (columns := self.__assays.get(assay)) is None:
+                return
+            if (previous := columns.samples.get(tissue)) is None:
+                return
+
+            updated = previous.copy()
+            for index, field in enumerate(self.fields):
+                if field in values:
+                    updated[index] = values[field]
+            columns.add(tissue, updated)
+
+    def remove(self, assay: str, tissue: str):
+        """Remove a sample, if it is summarized.
+
+        Arguments:
+            assay (str): the sample's assay.
+            tissue (str): the sample's tissue.
+        """
+
+        with self.__lock:
+            if self.__built_at is None or (columns := self.__assays.get(assay)) is None:
+                return
+
+            columns.remove(tissue)
+            if not columns.samples:
+                del self.__assays[assay]
+
+    def assays(self) -> List[str]:
+        """Get the assays with samples, in order."""
+
+        with self.__lock:
+            return sorted(self.__assays)
+
+    def values(self, samples: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        """Get the metrics of samples as a matrix.
+
+        Arguments:
+            samples (Sequence[Mapping[str, Any]]): the samples, or rows with at least the metric fields.
+
+        Returns:
+            A (samples, fields) array with one row of metrics per sample, in the order of `fields`.
+        """
+
+        return np.array([[sample[field] for field in self.fields] for sample in samples], dtype=float).reshape(
+            len(samples), len(self.fields)
+        )
+
+    def assay_values(self, assay: str) -> Tuple[List[str], np.ndarray]:
+        """Get the metrics of every sample of an assay.
+
+        Arguments:
+            assay (str): the assay.
+
+        Returns:
+            The tissues of the assay's samples, and a (samples, fields) array with their metrics in the same order.
+        """
+
+        with self.__lock:
+            samples = dict(self.__assays[assay].samples) if assay in self.__assays else {}
+
+        return list(samples), np.array(list(samples.values())).reshape(len(samples), len(self.fields))
+
+    def reference(self, assay: str) -> Optional[AssayReference]:
+        """Get the reference distribution of an assay's metrics.
+
+        Arguments:
+            assay (str): the assay.
+
+        Returns:
+            The median, median absolute deviation and mean absolute deviation of every metric over the assay's
+              samples, or None if the assay has no samples.
+        """
+
+        with self.__lock:
+            return None if (columns := self.__assays.get(assay)) is None else columns.reference()
+
+    def summaries(self, assay: Optional[str] = None) -> List[AssaySummary]:
+        """Summarize the metrics of every assay, or of one.
+
+        Arguments:
+            assay (str | None): the assay to summarize, or None for every assay. Defaults to None.
+
+        Returns:
+            An AssaySummary for each assay with samples, in assay order.
+        """
+
+        with self.__lock:
+            assays = sorted(self.__assays.items()) if assay is None else [(assay, self.__assays.get(assay))]
+            return [self.__summarize(name, columns) for name, columns in assays if columns is not None]
+
+    def percentile_ranks(self, assay: str, tissue: str) -> PercentileRanks:
+        """Rank a sample's metrics among the samples of its assay.
+
+        Arguments:
+            assay (str): the sample's assay.
+            tissue (str): the sample's tissue.
+
+        Returns:
+            The percentile rank of each of the sample's metrics.
+
+        Raises:
+            SampleNotFound: if no such sample is summarized.
+        """
+
+        with self.__lock:
+            if (columns := self.__assays.get(assay)) is None or (values := columns.samples.get(tissue)) is None:
+                raise SampleNotFound(assay, tissue)
+
+            ranks = columns.ranks(values)
+            return PercentileRanks(
+                assay=assay,
+                tissue=tissue,
+                count=len(columns.samples),
+                ranks=dict(zip(self.fields, ranks.tolist())),
+            )
+
+    def __summarize(self, assay: str, columns: _AssayColumns) -> AssaySummary:
+        count = len(columns.samples)
+        means = columns.sums / count
+        stds = np.sqrt(np.maximum(columns.squares / count - np.square(means), 0.0))
+        minimums, q1s, medians, q3s, maximums = columns.quantiles().T.tolist()
+        means, stds = means.tolist(), stds.tolist()
+
+        return AssaySummary(
+            assay=assay,
+            count=count,
+            metrics={
+                field: MetricSummary(
+                    mean=means[i],
+                    std=stds[i],
+                    minimum=minimums[i],
+                    q1=q1s[i],
+                    median=medians[i],
+                    q3=q3s[i],
+                    iqr=q3s[i] - q1s[i],
+                    maximum=maximums[i],
+                )
+                for i, field in enumerate(self.fields)
+            },
+        )
@@ -3,7 +3,7 @@ from __future__ import annotations
 from enum import IntFlag, auto
 from functools import reduce
 from operator import or_ as bit_or
-from typing import Optional
+from typing import Any, ClassVar, Dict, Mapping, Optional
 
 import pydantic
 
@@ -55,6 +55,9 @@ class Permissions(IntFlag):
 class User(pydantic.BaseModel):
     "Represents an API user."
 
+    # Version of the compact JWT claim format produced by `claims`
+    CLAIMS_VERSION: ClassVar[int] = 2
+
     id: int
     email: str
     permissions: Permissions
@@ -62,3 +65,45 @@ class User(pydantic.BaseModel):
     authenticated: bool = False
     first_name: Optional[str] = None
     last_name: Optional[str] = None
+
+    def claims(self) -> Dict[str, Any]:
+        """Get the compact JWT claims that identify this user, other than the identity claim itself (the user's id).
+
+        Returns:
+            A mapping with the claim format version, the user's email and the user's permissions as a bitmask.
+        """
+
+        return {"ver": self.CLAIMS_VERSION, "eml": self.email, "prm": int(self.permissions)}
+
+    @classmethod
+    def from_claims(cls, identity: Any, claims: Mapping[str, Any]) -> User:
+        """Rebuild an authenticated user from the claims of a JWT.
+
+        Tokens in the original format, whose identity is the whole user as a dictionary, are also accepted.
+
+        Arguments:
+            identity (Any): the token's identity claim.
+            claims (Mapping[str, Any]): every claim of the token.
+
+        Returns:
+            The user the token was issued to.
+
+        Raises:
+            ValueError: if the claims are malformed.
+        """
+
+        if claims.get("ver") == cls.CLAIMS_VERSION:
+            try:
+                return cls.model_construct(
+                    id=int(identity),
+                    email=str(claims["eml"]),
+                    permissions=Permissions(claims["prm"]),
+                    authenticated=True,
+                )
+            except (KeyError, TypeError) as e:
+                raise ValueError("Malformed user claims.") from e
+
+        if isinstance(identity, dict):
+            return cls(**identity)
+
+        raise ValueError("Malformed user claims.")
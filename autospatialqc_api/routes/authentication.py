@@ -2,11 +2,13 @@ from http import HTTPStatus
 
 import flask
 from flask import Blueprint, jsonify, make_response, request
-from flask_jwt_extended import create_access_token, get_jwt_identity, jwt_required
+from flask_jwt_extended import create_access_token
 
-from autospatialqc_api.models import Database, Permissions, User
-from autospatialqc_api.models.errors import InvalidCredentials, ResponseError, UserCollision, UserNotFound
-from autospatialqc_api.routes.route_utils import require_data, require_data_item, require_permission
+from autospatialqc_api.models import Database, Permissions
+from autospatialqc_api.models.errors import (InvalidCredentials, ResponseError, UnknownPermission, UserCollision,
+                                             UserNotFound)
+from autospatialqc_api.routes.route_utils import (jwt_required, require_data, require_data_item, require_permission,
+                                                  require_user)
 
 blueprint = Blueprint("authentication", __name__)
 
@@ -23,7 +25,7 @@ def login():
     except (UserNotFound, InvalidCredentials) as e:
         raise ResponseError.make_response("Invalid credentials", HTTPStatus.UNAUTHORIZED, str(e))
 
-    access_token = create_access_token(identity=dict(user))
+    access_token = create_access_token(identity=str(user.id), additional_claims=user.claims())
 
     return jsonify(access_token=access_token), HTTPStatus.OK
 
@@ -32,7 +34,7 @@ def login():
 @jwt_required()
 def change_password():
 
-    user = User(**get_jwt_identity())
+    user = require_user()
     database: Database = flask.g.database  # type: ignore[annotation-unchecked]
 
     new_password = require_data_item(request, "new-password")
@@ -51,7 +53,7 @@ def change_password():
 def create_user():
     """Route to create a new user."""
 
-    user = User(**get_jwt_identity())
+    user = require_user()
     database: Database = flask.g.database  # type: ignore[annotation-unchecked]
 
     require_permission(user, Permissions.CREATE_USER)
@@ -62,5 +64,7 @@ def create_user():
         database.add_user(**data)
     except UserCollision as e:
         raise ResponseError.make_response(f"User '{data['email']}' already exists.", HTTPStatus.CONFLICT, str(e))
+    except UnknownPermission as e:
+        raise ResponseError.make_response(str(e), HTTPStatus.BAD_REQUEST, str(e))
 
     return make_response("User created successfully.", HTTPStatus.OK)
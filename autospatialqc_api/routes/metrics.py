@@ -0,0 +1,104 @@
+import hmac
+import time
+from http import HTTPStatus
+from typing import Any
+
+import flask
+from flask import Blueprint, Response, request
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.errors import ResponseError
+from autospatialqc_api.models.metrics import REGISTRY
+
+blueprint = Blueprint("metrics", __name__)
+
+_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests, by endpoint, method and status code.", ["endpoint", "method", "status"]
+)
+_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests, by endpoint and method.", ["endpoint", "method"]
+)
+_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests being handled, by endpoint.", ["endpoint"]
+)
+JWT_DECODE_SECONDS = REGISTRY.histogram(
+    "jwt_decode_duration_seconds",
+    "Duration of decoding and verifying access tokens.",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+).labels()
+
+UNHANDLED_DATABASE_ERRORS = REGISTRY.counter(
+    "database_unhandled_errors_total", "Database errors that were answered with a 500 response, by type.", ["error"]
+)
+
+# Requests that match no route, or use any other method than these, share one label value, so that scanners cannot
+# create unbounded time series
+_UNMATCHED_ENDPOINT = "<unmatched>"
+_METHODS = frozenset({"DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT"})
+_OTHER_METHOD = "<other>"
+
+
+def _method() -> str:
+    return request.method if request.method in _METHODS else _OTHER_METHOD
+
+
+def collect_database_statistics(database: Database):
+    """Expose the statistics of a database's connection pool, sample cache and password hashing pool as metrics.
+
+    Arguments:
+        database (Database): the app's database.
+    """
+
+    REGISTRY.collect_statistics(
+        "database_pool",
+        "Database connection pool",
+        database.pool_statistics,
+        counters=["checkouts", "connections_created", "connections_recycled", "failed_pings", "timeouts"],
+    )
+    REGISTRY.collect_statistics(
+        "sample_cache",
+        "Sample cache",
+        database.cache_statistics,
+        counters=["hits", "misses", "evictions", "expirations"],
+    )
+    REGISTRY.collect_statistics(
+        "password_hashing_pool",
+        "Password hashing pool",
+        database.hashing_statistics,
+        counters=["hashes", "verifications", "rejections", "queue_wait_seconds", "hash_seconds"],
+    )
+
+
+@blueprint.before_app_request
+def _():
+    flask.g.metrics_started = time.perf_counter()
+    _REQUESTS_IN_FLIGHT.labels(request.endpoint or _UNMATCHED_ENDPOINT).inc()
+
+
+@blueprint.after_app_request
+def _(response: Response) -> Response:
+    if (started := flask.g.get("metrics_started")) is not None:
+        endpoint = request.endpoint or _UNMATCHED_ENDPOINT
+        _REQUEST_SECONDS.labels(endpoint, _method()).observe(time.perf_counter() - started)
+        _REQUESTS.labels(endpoint, _method(), str(response.status_code)).inc()
+    return response
+
+
+@blueprint.teardown_app_request
+def _(_: Any):
+    if flask.g.pop("metrics_started", None) is not None:
+        _REQUESTS_IN_FLIGHT.labels(request.endpoint or _UNMATCHED_ENDPOINT).dec()
+
+
+@blueprint.route("/metrics", methods=["GET"])
+def metrics() -> Response:
+    """Route to read the process's metrics in the Prometheus text format.
+
+    If the app's `METRICS_TOKEN` is set, scrapers must send it as a bearer token.
+    """
+
+    if (token := flask.current_app.config.get("METRICS_TOKEN")) is not None:
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            raise ResponseError.make_response("A valid metrics token is required.", HTTPStatus.UNAUTHORIZED)
+
+    return Response(REGISTRY.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
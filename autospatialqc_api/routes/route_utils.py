@@ -1,11 +1,96 @@
+import functools
+import json
+import time
+from datetime import datetime, timezone
 from http import HTTPStatus
 from logging import Logger
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 
-from flask import Request, make_response
+import pydantic_core
+from flask import Request, Response, current_app, make_response
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
 
+from autospatialqc_api.models.cache import LRUCache
 from autospatialqc_api.models.errors import ResponseError
 from autospatialqc_api.models.user import Permissions, User
+from autospatialqc_api.routes.metrics import JWT_DECODE_SECONDS
+
+T = TypeVar("T")
+
+
+def json_response(payload: Any, status: HTTPStatus = HTTPStatus.OK) -> Response:
+    """Serialize a payload straight to a JSON response.
+
+    Payloads are serialized by pydantic's Rust serializer in one call, models included, rather than converted to
+    dictionaries and passed to Flask's encoder. Keys keep their order, and datetimes are written in ISO 8601.
+
+    Arguments:
+        payload (Any): the payload, made of JSON values, datetimes and pydantic models.
+        status (HTTPStatus): the response's status. Defaults to 200 OK.
+
+    Returns:
+        The response.
+    """
+
+    return Response(pydantic_core.to_json(payload), status, mimetype="application/json")
+
+
+def jwt_required(**options: Any) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Protect a route with a JWT, like `flask_jwt_extended.jwt_required`, and time the token's verification.
+
+    Arguments:
+        **options (Any): passed to `verify_jwt_in_request`, such as `optional` or `fresh`.
+
+    Returns:
+        The decorator of the route.
+    """
+
+    def decorator(route: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(route)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            started = time.perf_counter()
+            try:
+                verify_jwt_in_request(**options)
+            finally:
+                JWT_DECODE_SECONDS.observe(time.perf_counter() - started)
+            return current_app.ensure_sync(route)(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# Users decoded from JWTs, by token id. Entries can only be reached with a valid token, so they never need to expire.
+_token_users = LRUCache(max_size=4096, ttl=None)
+
+
+def require_user() -> User:
+    """Require the user identified by the current request's JWT.
+
+    Decoded users are memoized per token, so repeated requests with the same token skip decoding and validation. Must
+    be called from a route protected by `jwt_required`.
+
+    Returns:
+        The authenticated user.
+
+    Raises:
+        ResponseError: if the token's claims do not describe a user.
+    """
+
+    claims = get_jwt()
+
+    try:
+        return _token_users.get(claims["jti"])
+    except KeyError:
+        pass
+
+    try:
+        user = User.from_claims(get_jwt_identity(), claims)
+    except ValueError as e:
+        raise ResponseError(make_response("The JWT does not identify a user.", HTTPStatus.UNAUTHORIZED), str(e))
+
+    _token_users.set(claims["jti"], user)
+    return user
 
 
 def require_permission(user: User, permission: Permissions, logger: Optional[Logger] = None):
@@ -23,7 +108,7 @@ def require_permission(user: User, permission: Permissions, logger: Optional[Log
     if not user.authenticated:
 
         if logger is not None:
-            logger.info(f"User '{user.email}' attempted to access a route without being authenticated.")
+            logger.info("User '%s' attempted to access a route without being authenticated.", user.email)
 
         raise ResponseError(
             make_response(
@@ -35,7 +120,7 @@ def require_permission(user: User, permission: Permissions, logger: Optional[Log
     if permission not in user.permissions:
 
         if logger is not None:
-            logger.info(f"User '{user.email}' not authorized to use this route.")
+            logger.info("User '%s' not authorized to use this route.", user.email)
 
         raise ResponseError(
             make_response(
@@ -72,7 +157,7 @@ def require_data_item(request: Request, key: str, logger: Optional[Logger] = Non
     if (value := json.get(key, None)) is None:
 
         if logger is not None:
-            logger.info(f"Missing JSON key '{key}' in request.", HTTPStatus.BAD_REQUEST)
+            logger.info("Missing JSON key '%s' in request.", key)
 
         raise ResponseError(make_response(f"Missing JSON key '{key}' in request.", HTTPStatus.BAD_REQUEST))
 
@@ -115,3 +200,73 @@ def require_arg(request: Request, key: str) -> str:
     if (value := request.args.get(key, None)) is None:
         raise ResponseError(make_response(f"Missing argument '{key}' from URL.", HTTPStatus.BAD_REQUEST))
     return value
+
+
+def require_records(request: Request) -> List[Any]:
+    """Require a list of records in the request body.
+
+    The body is either a JSON array, or newline-delimited JSON (one record per line) if the request's content type is
+    "application/x-ndjson". Blank NDJSON lines are ignored, and NDJSON lines that are not valid JSON are returned as
+    `json.JSONDecodeError` objects so that the caller can report them individually.
+
+    Arguments:
+        request (Request): the Flask request.
+
+    Returns:
+        The list of records in the request body.
+
+    Raises:
+        ResponseError: if the body is not a JSON array or NDJSON.
+    """
+
+    if request.mimetype == "application/x-ndjson":
+        records: List[Any] = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                records.append(e)
+        return records
+
+    if not isinstance(data := request.get_json(silent=True), list):
+        raise ResponseError(
+            make_response("Request body must be a JSON array or newline-delimited JSON.", HTTPStatus.BAD_REQUEST)
+        )
+
+    return data
+
+
+def require_modified(request: Request, etag: str, last_modified: Optional[datetime] = None):
+    """Require that the client's cached copy of a resource, if any, is out of date.
+
+    `If-None-Match` is checked with weak comparison, and `If-Modified-Since` is only checked when `If-None-Match` is
+    absent. HTTP dates have whole seconds, so the modification time is truncated to the second before it is compared
+    with `If-Modified-Since`, as it is when sent in `Last-Modified`. Writes made within the same second as the client's
+    copy are only detected through entity tags.
+
+    Arguments:
+        request (Request): the Flask request.
+        etag (str): the resource's current entity tag, without quotes.
+        last_modified (datetime | None): when the resource was last modified. Naive datetimes are taken as UTC.
+
+    Raises:
+        ResponseError: with a 304 Not Modified response if the client's copy is current.
+    """
+
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since is not None and last_modified is not None:
+        not_modified = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        not_modified = False
+
+    if not_modified:
+        response = Response(status=HTTPStatus.NOT_MODIFIED)
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        raise ResponseError(response)
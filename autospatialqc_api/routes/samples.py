@@ -1,13 +1,26 @@
+import csv
+import io
+import json
+import os
+from contextlib import closing
+from datetime import datetime
 from http import HTTPStatus
+from itertools import islice
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Tuple
 
 import flask
-from flask import Blueprint, Request, Response, current_app, make_response, request
-from flask_jwt_extended import get_jwt_identity, jwt_required
+import numpy as np
+import pydantic_core
+from flask import Blueprint, Request, Response, current_app, jsonify, make_response, request, send_file
 from pydantic import ValidationError
 
 from autospatialqc_api.models import Database, Permissions, Sample, User
 from autospatialqc_api.models.errors import ResponseError, SampleNameCollision, SampleNotFound
-from autospatialqc_api.routes.route_utils import require_arg, require_data, require_permission
+from autospatialqc_api.models.query import SampleFilter, decode_cursor, encode_cursor
+from autospatialqc_api.models.sample import SampleUpdate
+from autospatialqc_api.models.snapshot import SampleSnapshot, SnapshotManifest
+from autospatialqc_api.routes.route_utils import (json_response, jwt_required, require_arg, require_data,
+                                                  require_modified, require_permission, require_records, require_user)
 
 blueprint = Blueprint("samples", __name__)
 
@@ -23,7 +36,9 @@ def delete_sample(request: Request, user: User, database: Database) -> Response:
     except SampleNotFound as e:
         raise ResponseError.make_response("Sample not found.", HTTPStatus.NOT_FOUND, str(e))
 
-    current_app.logger.info(f"Sample '{assay} {tissue}' successfully deleted by user '{user.email}'.")
+    current_app.logger.info(
+        "Sample '%s %s' successfully deleted by user '%s'.", assay, tissue, user.email, extra={"event": "sample_delete"}
+    )
     return make_response("Sample successfully deleted.", HTTPStatus.OK)
 
 
@@ -35,12 +50,27 @@ def get_sample(request: Request, user: User, database: Database) -> Response:
     tissue = require_arg(request, "tissue")
 
     try:
+        # Conditional requests are answered from the row's metadata before reading the whole sample
+        if request.if_none_match or request.if_modified_since is not None:
+            require_modified(request, *sample_validators(*database.get_sample_version(assay, tissue)))
+
         sample = database.get_sample(assay, tissue)
     except SampleNotFound as e:
         raise ResponseError.make_response("Sample not found.", HTTPStatus.NOT_FOUND, str(e))
 
-    current_app.logger.info(f"Sample '{assay} {tissue}' successfully returned.")
-    return make_response(dict(sample), HTTPStatus.OK)
+    current_app.logger.info("Sample '%s %s' successfully returned.", assay, tissue, extra={"event": "sample_read"})
+    response = json_response(sample)
+    if sample.id is not None and sample.version is not None and sample.updated_at is not None:
+        response.set_etag(sample_validators(sample.id, sample.version, sample.updated_at)[0])
+        response.last_modified = sample.updated_at
+    return response
+
+
+def sample_validators(sample_id: int, version: int, updated_at: datetime) -> Tuple[str, datetime]:
+    """Get the cache validators of a sample: an entity tag derived from its id and write count, which changes on every
+    write, and its modification time."""
+
+    return f"{sample_id}-{version}", updated_at
 
 
 def post_sample(request: Request, user: User, database: Database) -> Response:
@@ -48,8 +78,11 @@ def post_sample(request: Request, user: User, database: Database) -> Response:
     require_permission(user, Permissions.POST_SAMPLE)
     data = require_data(request, *Sample.data_fields())
 
+    # With `upsert` set to "true", a sample with the same assay and tissue is overwritten rather than conflicting
+    upsert = request.args.get("upsert", "false").lower() == "true"
+
     try:
-        database.add_sample(Sample.model_validate(data))
+        database.add_sample(Sample.model_validate(data), upsert=upsert)
     except ValidationError as e:
         raise ResponseError.make_response("Sample could not be validated.", HTTPStatus.BAD_REQUEST, str(e))
     except SampleNameCollision as e:
@@ -58,16 +91,40 @@ def post_sample(request: Request, user: User, database: Database) -> Response:
     return make_response("New sample pushed.", HTTPStatus.OK)
 
 
-@blueprint.route("/sample", methods=["GET", "DELETE", "POST"])
+def patch_sample(request: Request, user: User, database: Database) -> Response:
+
+    require_permission(user, Permissions.POST_SAMPLE)
+
+    assay = require_arg(request, "assay")
+    tissue = require_arg(request, "tissue")
+
+    if not isinstance(data := request.get_json(force=True, silent=True), dict) or not data:
+        raise ResponseError.make_response("Sample changes must be a non-empty JSON object.", HTTPStatus.BAD_REQUEST)
+
+    try:
+        database.update_sample(assay, tissue, SampleUpdate.model_validate(data))
+    except ValidationError as e:
+        raise ResponseError.make_response("Sample changes could not be validated.", HTTPStatus.BAD_REQUEST, str(e))
+    except SampleNotFound as e:
+        raise ResponseError.make_response("Sample not found.", HTTPStatus.NOT_FOUND, str(e))
+
+    current_app.logger.info(
+        "Sample '%s %s' updated by user '%s'.", assay, tissue, user.email, extra={"event": "sample_update"}
+    )
+    return make_response("Sample updated.", HTTPStatus.OK)
+
+
+@blueprint.route("/sample", methods=["GET", "DELETE", "PATCH", "POST"])
 @jwt_required()
 def sample() -> Response:
 
-    user = User(**get_jwt_identity())
+    user = require_user()
     database: Database = flask.g.database
 
     methods = {
         "DELETE": delete_sample,
         "GET": get_sample,
+        "PATCH": patch_sample,
         "POST": post_sample,
     }
 
@@ -75,3 +132,486 @@ def sample() -> Response:
         return methods[request.method](request, user, database)
 
     raise ResponseError.make_response("The method is not allowed for the requested URL.", HTTPStatus.METHOD_NOT_ALLOWED)
+
+
+def parse_sample_filter(request: Request) -> SampleFilter:
+    """Parse a sample filter from the request URL.
+
+    The `assay` and `tissue` arguments match exactly, unless `assay_prefix` or `tissue_prefix` is "true". For every
+    numeric sample field, `min_<field>` and `max_<field>` give inclusive bounds.
+
+    Arguments:
+        request (Request): the Flask request.
+
+    Returns:
+        The filter described by the request's arguments.
+
+    Raises:
+        ResponseError: if a bound is not a number.
+    """
+
+    ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+    for field in Sample.metric_fields():
+        bounds = (request.args.get(f"min_{field}"), request.args.get(f"max_{field}"))
+        if bounds == (None, None):
+            continue
+        try:
+            ranges[field] = (
+                None if bounds[0] is None else float(bounds[0]),
+                None if bounds[1] is None else float(bounds[1]),
+            )
+        except ValueError as e:
+            raise ResponseError.make_response(f"Bounds on '{field}' must be numbers.", HTTPStatus.BAD_REQUEST, str(e))
+
+    times: Dict[str, datetime] = {}
+    for argument in ("created_since", "created_before"):
+        if (value := request.args.get(argument)) is None:
+            continue
+        try:
+            times[argument] = datetime.fromisoformat(value)
+        except ValueError as e:
+            raise ResponseError.make_response(
+                f"'{argument}' must be an ISO 8601 date or time.", HTTPStatus.BAD_REQUEST, str(e)
+            )
+
+    return SampleFilter(
+        assay=request.args.get("assay"),
+        tissue=request.args.get("tissue"),
+        assay_prefix=request.args.get("assay_prefix", "false").lower() == "true",
+        tissue_prefix=request.args.get("tissue_prefix", "false").lower() == "true",
+        ranges=ranges,
+        created_since=times.get("created_since"),
+        created_before=times.get("created_before"),
+    )
+
+
+@blueprint.route("/samples", methods=["GET"])
+@jwt_required()
+def list_samples() -> Response:
+    """Route to list the samples matching a filter, one page at a time.
+
+    Besides the filter arguments of `parse_sample_filter`, the route accepts `limit` (at most `SAMPLE_PAGE_MAX_SIZE`),
+    `order` ("key" for (assay, tissue) order, or "id") and `cursor`, the `next_cursor` of the previous page.
+    """
+
+    user = require_user()
+    database: Database = flask.g.database
+
+    require_permission(user, Permissions.GET_SAMPLE)
+
+    sample_filter = parse_sample_filter(request)
+    order = request.args.get("order", "key")
+    if order not in ("key", "id"):
+        raise ResponseError.make_response(f"Unknown sample order '{order}'.", HTTPStatus.BAD_REQUEST)
+
+    try:
+        limit = int(request.args.get("limit", 100))
+        after = None if (cursor := request.args.get("cursor")) is None else decode_cursor(cursor)
+        if not 0 < limit <= current_app.config.get("SAMPLE_PAGE_MAX_SIZE", 1000):
+            raise ValueError(f"Page size {limit} is out of range.")
+        if after is not None and [type(value) for value in after] != ([str, str] if order == "key" else [int]):
+            raise ValueError(f"Cursor '{cursor}' does not match order '{order}'.")
+    except ValueError as e:
+        raise ResponseError.make_response(str(e), HTTPStatus.BAD_REQUEST, str(e))
+
+    # Fetch one extra sample to find out whether there is a next page
+    samples = database.list_samples(sample_filter, limit=limit + 1, after=after, order_by=order)
+
+    next_cursor = None
+    if len(samples) > limit:
+        samples = samples[:limit]
+        last = samples[-1]
+        next_cursor = encode_cursor(last.assay, last.tissue) if order == "key" else encode_cursor(last.id)
+
+    response = json_response({"samples": samples, "next_cursor": next_cursor})
+    response.add_etag()
+    response.make_conditional(request)
+    return response
+
+
+@blueprint.route("/samples", methods=["DELETE"])
+@jwt_required()
+def delete_samples() -> Response:
+    """Route to delete many samples in one transaction.
+
+    Samples are selected either by the keys of a JSON body, in any form accepted by `parse_sample_keys`, or by the
+    filter arguments of `parse_sample_filter`, at least one of which is required, but not both. With `dry_run` set to
+    "true", nothing is deleted. The response has the number of samples deleted and their keys.
+    """
+
+    user = require_user()
+    database: Database = flask.g.database
+
+    require_permission(user, Permissions.DELETE_SAMPLE)
+
+    dry_run = request.args.get("dry_run", "false").lower() == "true"
+
+    keys: Optional[List[Tuple[str, str]]]
+    if request.get_data(cache=True):
+        # A filter would silently narrow the keys, which the client may not expect, so the two cannot be combined
+        if parse_sample_filter(request) != SampleFilter():
+            raise ResponseError.make_response(
+                "Samples are deleted either by keys or by filter arguments, not both.", HTTPStatus.BAD_REQUEST
+            )
+        keys = parse_sample_keys(request)
+        sample_filter = None
+        if len(keys) > (max_size := current_app.config.get("SAMPLE_BATCH_MAX_SIZE", 10_000)):
+            raise ResponseError.make_response(
+                f"Deletion of {len(keys)} samples exceeds the limit of {max_size}.",
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+            )
+    else:
+        keys = None
+        if (sample_filter := parse_sample_filter(request)) == SampleFilter():
+            raise ResponseError.make_response(
+                "Deleting samples requires keys or at least one filter argument.", HTTPStatus.BAD_REQUEST
+            )
+
+    count, deleted = database.delete_samples(
+        keys,
+        sample_filter,
+        chunk_size=current_app.config.get("SAMPLE_BATCH_CHUNK_SIZE", 500),
+        dry_run=dry_run,
+    )
+
+    if not dry_run:
+        current_app.logger.info(
+            "%d samples deleted by user '%s'.", count, user.email, extra={"event": "sample_bulk_delete"}
+        )
+    return make_response(
+        jsonify(
+            deleted=count,
+            dry_run=dry_run,
+            keys=[{"assay": assay, "tissue": tissue} for assay, tissue in deleted],
+        ),
+        HTTPStatus.OK,
+    )
+
+
+@blueprint.route("/samples/stats", methods=["GET"])
+@jwt_required()
+def sample_statistics() -> Response:
+    """Route to summarize the metrics of every assay, or of the assay given by the `assay` argument."""
+
+    user = require_user()
+    database: Database = flask.g.database
+
+    require_permission(user, Permissions.GET_SAMPLE)
+
+    summaries = database.sample_statistics(request.args.get("assay"))
+    return json_response({"assays": summaries})
+
+
+@blueprint.route("/samples/stats/percentiles", methods=["GET"])
+@jwt_required()
+def sample_percentile_ranks() -> Response:
+    """Route to rank the metrics of the sample given by the `assay` and `tissue` arguments within its assay."""
+
+    user = require_user()
+    database: Database = flask.g.database
+
+    require_permission(user, Permissions.GET_SAMPLE)
+
+    assay = require_arg(request, "assay")
+    tissue = require_arg(request, "tissue")
+
+    try:
+        ranks = database.percentile_ranks(assay, tissue)
+    except SampleNotFound as e:
+        raise ResponseError.make_response("Sample not found.", HTTPStatus.NOT_FOUND, str(e))
+
+    return json_response(ranks)
+
+
+def current_snapshot() -> SnapshotManifest:
+    """Get the manifest of the app's sample snapshot, which `scripts/snapshot-samples.py` keeps up to date.
+
+    Raises:
+        ResponseError: if no snapshot was written yet.
+    """
+
+    snapshot: SampleSnapshot = current_app.extensions["sample_snapshot"]
+    if (manifest := snapshot.manifest()) is None:
+        raise ResponseError.make_response("No snapshot of the samples has been written yet.", HTTPStatus.NOT_FOUND)
+
+    return manifest
+
+
+@blueprint.route("/samples/snapshot", methods=["GET"])
+@jwt_required()
+def sample_snapshot() -> Response:
+    """Route to get the manifest of the columnar snapshot of the samples table."""
+
+    user = require_user()
+
+    require_permission(user, Permissions.GET_SAMPLE)
+
+    return make_response(current_snapshot().model_dump(mode="json"), HTTPStatus.OK)
+
+
+@blueprint.route("/samples/snapshot/<column>", methods=["GET"])
+@jwt_required()
+def sample_snapshot_column(column: str) -> Response:
+    """Route to download a column of the samples snapshot as a `.npy` file.
+
+    Without arguments, the column is merged from every segment of the current manifest. The `generation` argument
+    selects the segment written by that generation instead, if it is still available, and makes the response
+    cacheable; the `deleted` column of a segment holds the ids of earlier segments' rows that were deleted.
+    """
+
+    user = require_user()
+
+    require_permission(user, Permissions.GET_SAMPLE)
+
+    snapshot: SampleSnapshot = current_app.extensions["sample_snapshot"]
+    manifest = current_snapshot()
+
+    if column not in manifest.columns and not (column == "deleted" and "generation" in request.args):
+        raise ResponseError.make_response(f"The snapshot has no column '{column}'.", HTTPStatus.NOT_FOUND)
+
+    if "generation" not in request.args:
+        if len(manifest.segments) == 1:
+            path = snapshot.path(manifest.segments[0].columns[column])
+            return send_file(path, mimetype="application/octet-stream", download_name=f"{column}.npy", conditional=True)
+
+        buffer = io.BytesIO()
+        np.save(buffer, snapshot.load([column], manifest=manifest)[column], allow_pickle=False)
+        buffer.seek(0)
+        return send_file(buffer, mimetype="application/octet-stream", download_name=f"{column}.npy")
+
+    generation = request.args["generation"]
+    path = os.path.join(snapshot.directory, f"{column}.{generation}.npy")
+    if not generation.isdigit() or not os.path.exists(path):
+        raise ResponseError.make_response(f"Snapshot segment '{generation}' is not available.", HTTPStatus.GONE)
+
+    # A segment's files never change, so a URL naming its generation can be cached for as long as clients like
+    response = send_file(path, mimetype="application/octet-stream", download_name=f"{column}.npy", conditional=True)
+    response.cache_control.no_cache = None
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+
+    return response
+
+
+def export_ndjson(rows: Generator[Dict[str, Any], None, None], chunk_size: int) -> Iterator[bytes]:
+    """Serialize rows as NDJSON, `chunk_size` rows at a time."""
+
+    with closing(rows):
+        while chunk := list(islice(rows, chunk_size)):
+            yield b"".join(pydantic_core.to_json(row) + b"\n" for row in chunk)
+
+
+def export_csv(rows: Generator[Dict[str, Any], None, None], chunk_size: int) -> Iterator[bytes]:
+    """Serialize rows as UTF-8 CSV with a header line, `chunk_size` rows at a time."""
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["id", *Sample.data_fields()], lineterminator="\n")
+    writer.writeheader()
+
+    with closing(rows):
+        while chunk := list(islice(rows, chunk_size)):
+            writer.writerows(chunk)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+@blueprint.route("/samples/export", methods=["GET"])
+@jwt_required()
+def export_samples() -> Response:
+    """Route to stream every sample matching a filter, as NDJSON or CSV depending on the `Accept` header.
+
+    Accepts the filter arguments of `parse_sample_filter`.
+    """
+
+    user = require_user()
+    database: Database = flask.g.database
+
+    require_permission(user, Permissions.GET_SAMPLE)
+
+    serializers: Dict[str, Callable[[Generator[Dict[str, Any], None, None], int], Iterator[bytes]]] = {
+        "application/x-ndjson": export_ndjson,
+        "text/csv": export_csv,
+    }
+    # A request without an `Accept` header accepts anything, so it gets the first format
+    mimetype = request.accept_mimetypes.best_match(serializers) if request.accept_mimetypes else next(iter(serializers))
+    if mimetype is None:
+        raise ResponseError.make_response(
+            f"Samples can only be exported as {' or '.join(serializers)}.", HTTPStatus.NOT_ACCEPTABLE
+        )
+
+    rows = database.iter_samples(parse_sample_filter(request))
+    chunk_size = current_app.config.get("SAMPLE_EXPORT_CHUNK_SIZE", 500)
+
+    current_app.logger.info(
+        "Sample export as '%s' started by user '%s'.", mimetype, user.email, extra={"event": "sample_export"}
+    )
+    return Response(serializers[mimetype](rows, chunk_size), HTTPStatus.OK, mimetype=mimetype)
+
+
+def parse_sample_keys(request: Request) -> List[Tuple[str, str]]:
+    """Parse the (assay, tissue) pairs of a sample lookup.
+
+    Pairs are read from a JSON body, either an array or an object with a `keys` array, whose items are
+    `{"assay": ..., "tissue": ...}` objects or `[assay, tissue]` arrays. Without a body, they are read from repeated
+    `assay` and `tissue` arguments, paired in order.
+
+    Arguments:
+        request (Request): the Flask request.
+
+    Returns:
+        The pairs, in request order.
+
+    Raises:
+        ResponseError: if the body is not valid JSON, or any pair is malformed.
+    """
+
+    if not request.get_data(cache=True):
+        assays, tissues = request.args.getlist("assay"), request.args.getlist("tissue")
+        if len(assays) != len(tissues):
+            raise ResponseError.make_response(
+                "Every 'assay' argument needs a matching 'tissue' argument.", HTTPStatus.BAD_REQUEST
+            )
+        return list(zip(assays, tissues))
+
+    if (body := request.get_json(force=True, silent=True)) is None:
+        raise ResponseError.make_response("Sample keys must be sent as JSON.", HTTPStatus.BAD_REQUEST)
+    items = body.get("keys") if isinstance(body, dict) else body
+    if not isinstance(items, list):
+        raise ResponseError.make_response("Sample keys must be a JSON array.", HTTPStatus.BAD_REQUEST)
+
+    keys: List[Tuple[str, str]] = []
+    for index, item in enumerate(items):
+        key = (item.get("assay"), item.get("tissue")) if isinstance(item, dict) else item
+        if not (isinstance(key, (list, tuple)) and len(key) == 2 and all(isinstance(value, str) for value in key)):
+            raise ResponseError.make_response(
+                f"Sample key {index} must be an assay and tissue, as strings.", HTTPStatus.BAD_REQUEST
+            )
+        keys.append((key[0], key[1]))
+
+    return keys
+
+
+@blueprint.route("/samples/lookup", methods=["GET", "POST"])
+@jwt_required()
+def lookup_samples() -> Response:
+    """Route to get many samples by their (assay, tissue) pairs in one request.
+
+    The pairs are parsed by `parse_sample_keys`. The response lists a result for every pair, in request order, with
+    `status` "found" and the `sample`, or "not_found".
+    """
+
+    user = require_user()
+    database: Database = flask.g.database
+
+    require_permission(user, Permissions.GET_SAMPLE)
+
+    keys = parse_sample_keys(request)
+    if len(keys) > (max_size := current_app.config.get("SAMPLE_LOOKUP_MAX_SIZE", 5_000)):
+        raise ResponseError.make_response(
+            f"Lookup of {len(keys)} samples exceeds the limit of {max_size}.", HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        )
+
+    samples = database.get_samples(keys, chunk_size=current_app.config.get("SAMPLE_LOOKUP_CHUNK_SIZE", 500))
+
+    results: List[Dict[str, Any]] = []
+    for assay, tissue in keys:
+        if (sample := samples[(assay, tissue)]) is None:
+            results.append({"assay": assay, "tissue": tissue, "status": "not_found"})
+        else:
+            results.append({"assay": assay, "tissue": tissue, "status": "found", "sample": sample})
+
+    current_app.logger.info(
+        "%d of %d looked up samples returned.",
+        sum(sample is not None for sample in samples.values()),
+        len(samples),
+        extra={"event": "sample_lookup"},
+    )
+    return json_response({"results": results})
+
+
+@blueprint.route("/samples/batch", methods=["POST"])
+@jwt_required()
+def post_samples_batch() -> Response:
+    """Route to add many samples at once.
+
+    The body is a JSON array or NDJSON stream of samples. The `mode` argument is either "all-or-nothing" (the default),
+    where any invalid or colliding sample prevents every sample from being added, or "best-effort", where every valid,
+    non-colliding sample is added. The response lists a status for every sample, in request order.
+    """
+
+    user = require_user()
+    database: Database = flask.g.database
+
+    require_permission(user, Permissions.POST_SAMPLE)
+
+    if (mode := request.args.get("mode", "all-or-nothing")) not in ("all-or-nothing", "best-effort"):
+        raise ResponseError.make_response(f"Unknown batch mode '{mode}'.", HTTPStatus.BAD_REQUEST)
+    atomic = mode == "all-or-nothing"
+
+    records = require_records(request)
+    if len(records) > (max_size := current_app.config.get("SAMPLE_BATCH_MAX_SIZE", 10_000)):
+        raise ResponseError.make_response(
+            f"Batch of {len(records)} samples exceeds the limit of {max_size}.", HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+        )
+
+    results: List[Dict[str, Any]] = []
+    samples: List[Sample] = []
+    positions: List[int] = []
+
+    for index, record in enumerate(records):
+        result: Dict[str, Any] = {"index": index}
+        if isinstance(record, dict):
+            result.update(assay=record.get("assay"), tissue=record.get("tissue"))
+        results.append(result)
+
+        if isinstance(record, json.JSONDecodeError):
+            result.update(status="invalid", errors=[{"type": "json_invalid", "loc": [], "msg": str(record)}])
+            continue
+
+        try:
+            samples.append(Sample.model_validate(record))
+            positions.append(index)
+        except ValidationError as e:
+            result.update(
+                status="invalid", errors=e.errors(include_url=False, include_context=False, include_input=False)
+            )
+
+    invalid = len(samples) < len(records)
+    collisions: List[int] = []
+
+    if not (atomic and invalid):
+        try:
+            collisions = database.add_samples(
+                samples, chunk_size=current_app.config.get("SAMPLE_BATCH_CHUNK_SIZE", 500), atomic=atomic
+            )
+        except SampleNameCollision as e:
+            raise ResponseError.make_response(
+                "New samples conflict with samples added concurrently.", HTTPStatus.CONFLICT, str(e)
+            )
+
+    inserted = not (atomic and (invalid or collisions))
+    for position in collisions:
+        results[positions[position]]["status"] = "conflict"
+    for position in positions:
+        results[position].setdefault("status", "created" if inserted else "skipped")
+
+    if not inserted:
+        code = HTTPStatus.BAD_REQUEST if invalid else HTTPStatus.CONFLICT
+    else:
+        code = HTTPStatus.OK
+
+    created = len(samples) - len(collisions) if inserted else 0
+    current_app.logger.info(
+        "%d of %d batched samples added by user '%s'.",
+        created,
+        len(records),
+        user.email,
+        extra={"event": "sample_batch"},
+    )
+    return make_response(jsonify(created=created, results=results), code)
@@ -0,0 +1,225 @@
+"""Module for the app's logging pipeline.
+
+Records are put on a bounded queue by the threads that log them and written by a background thread, so requests never
+wait for formatting or disk writes. Messages are only formatted by that thread, which writes one JSON object per line
+to a rotating file. Each process starts its own thread with its first record, so apps created before worker processes
+are forked log from every worker.
+
+Exported objects include:
+
+    * JSONFormatter: formatter that renders records as JSON objects, with their extra fields.
+    * SamplingFilter: filter that keeps a fraction of the records of high-volume events.
+    * configure_logging: function that sets up the pipeline for an app.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional
+
+import flask
+import flask.logging
+
+from autospatialqc_api.environment import get_env
+from autospatialqc_api.models.metrics import REGISTRY
+
+# Attributes of every LogRecord; anything else on a record was passed through `extra`
+_RECORD_ATTRIBUTES = {*logging.LogRecord("", 0, "", 0, "", (), None).__dict__, "message", "asctime", "taskName"}
+
+# Request ids accepted from clients, so that they cannot inject arbitrary text into the logs
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+_DROPPED_RECORDS = REGISTRY.counter(
+    "log_records_dropped_total", "Log records dropped because the logging queue was full."
+).labels()
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects.
+
+    Every object has the record's time, level, logger and message, and the id of the request that logged it, if any.
+    Fields passed with `extra` are included as they are, and exceptions as their formatted traceback.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update((key, value) for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES)
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the INFO and lower records of some events.
+
+    Records name their event with `extra={"event": ...}`. Kept records of sampled events get a `sample_rate` field, so
+    that counts can be scaled back up.
+    """
+
+    def __init__(self, rates: Mapping[str, float]):
+        """Initializes a new sampling filter.
+
+        Arguments:
+            rates (Mapping[str, float]): the fraction of records to keep for each event, between 0 and 1. Events that
+              are not listed are always kept.
+        """
+
+        super().__init__()
+        self.rates = dict(rates)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        if record.levelno > logging.INFO or not isinstance(event, str) or (rate := self.rates.get(event)) is None:
+            return True
+
+        if rate < 1.0 and random.random() >= rate:
+            return False
+
+        record.sample_rate = rate
+        return True
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """Queue listener that can be stopped more than once, such as by an app and again at exit, and only stops in the
+    process that started it."""
+
+    def start(self):
+        self.pid = os.getpid()
+        super().start()
+
+    def stop(self):
+        if self._thread is not None and getattr(self, "pid", None) == os.getpid():
+            super().stop()
+
+
+class _RequestQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that tags records with the current request id and leaves formatting to the listener.
+
+    The queue and the thread that empties it are created by the first record of each process, since a forked process
+    inherits neither the thread nor a usable queue from its parent.
+    """
+
+    def __init__(self, queue_size: int, *handlers: logging.Handler):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.handlers = handlers
+        self.listener: Optional[_QueueListener] = None
+
+    def start(self):
+        """Start a new queue and listener for this process."""
+
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = _QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def stop(self):
+        """Write the queued records and stop this process's listener, if it has one."""
+
+        if self.listener is not None:
+            self.listener.stop()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The default merges the arguments into the message, which is the formatting this handler defers
+        if flask.has_request_context():
+            record.request_id = flask.g.get("request_id")
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # Records are enqueued under the handler's lock, which the logging module resets in forked processes
+        if self.listener is None or self.listener.pid != os.getpid():
+            self.start()
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DROPPED_RECORDS.inc()
+
+
+def parse_sample_rates(value: Optional[str]) -> Dict[str, float]:
+    """Parse sampling rates written as comma-separated `event=rate` pairs, such as "sample_read=0.01".
+
+    Raises:
+        ValueError: if a pair is malformed or a rate is not between 0 and 1.
+    """
+
+    rates: Dict[str, float] = {}
+    for pair in filter(None, (pair.strip() for pair in (value or "").split(","))):
+        event, _, rate = pair.partition("=")
+        rates[event.strip()] = float(rate)
+        if not 0.0 <= rates[event.strip()] <= 1.0:
+            raise ValueError(f"Sampling rate of '{event.strip()}' must be between 0 and 1.")
+    return rates
+
+
+def configure_logging(app: flask.Flask):
+    """Send the app's logs through a queue to a rotating JSON log file, and give every request an id.
+
+    The pipeline is configured by the following environmental variables, all of which are optional:
+
+        * LOG_FILE: the log file. Defaults to `logs/debug.log` in debug mode, and `logs/app.log` otherwise.
+        * LOG_LEVEL: the app logger's level. Defaults to DEBUG in debug mode, and INFO otherwise.
+        * LOG_MAX_BYTES, LOG_BACKUP_COUNT: the size at which the file is rotated, and the number of old files kept.
+          Default to 10 MiB and 5.
+        * LOG_QUEUE_SIZE: the number of records that may wait to be written before new ones are dropped. Defaults to
+          10000.
+        * LOG_SAMPLE_RATES: comma-separated `event=rate` pairs, such as "sample_read=0.01".
+
+    Request ids are taken from the `X-Request-ID` header when it is a valid id, generated otherwise, and returned in
+    the response's `X-Request-ID` header.
+
+    Arguments:
+        app (flask.Flask): the app.
+    """
+
+    path = get_env("LOG_FILE") or ("logs/debug.log" if app.debug else "logs/app.log")
+    if directory := os.path.dirname(path):
+        os.makedirs(directory, exist_ok=True)
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=int(get_env("LOG_MAX_BYTES") or 10 * 1024 * 1024),
+        backupCount=int(get_env("LOG_BACKUP_COUNT") or 5),
+    )
+    file_handler.setFormatter(JSONFormatter())
+
+    queue_handler = _RequestQueueHandler(int(get_env("LOG_QUEUE_SIZE") or 10000), file_handler)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(get_env("LOG_SAMPLE_RATES"))))
+
+    # Replace the pipeline of an earlier app in this process, since apps share their logger
+    for handler in list(app.logger.handlers):
+        if isinstance(handler, _RequestQueueHandler):
+            app.logger.removeHandler(handler)
+            handler.stop()
+
+    # Flask's own handler would write every record to stderr on the logging thread
+    app.logger.removeHandler(flask.logging.default_handler)
+    app.logger.addHandler(queue_handler)
+    app.logger.setLevel(get_env("LOG_LEVEL") or ("DEBUG" if app.debug else "INFO"))
+
+    @app.before_request
+    def _():
+        request_id = flask.request.headers.get("X-Request-ID", "")
+        flask.g.request_id = request_id if _REQUEST_ID.fullmatch(request_id) else uuid.uuid4().hex
+
+    @app.after_request
+    def _(response: flask.Response) -> flask.Response:
+        if (request_id := flask.g.get("request_id")) is not None:
+            response.headers["X-Request-ID"] = request_id
+        return response
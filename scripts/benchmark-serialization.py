@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import timeit
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import flask
+import pydantic_core
+
+from autospatialqc_api import Sample
+from autospatialqc_api.models.sample import SAMPLE_ROWS
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Time building and serializing sample responses, old path vs new.")
+    parser.add_argument("--rows", type=int, default=1000, help="samples per response")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each step, of which the fastest is kept")
+    return parser.parse_args()
+
+
+def make_rows(count: int) -> List[Dict[str, Any]]:
+    """Make rows shaped like those read from the samples table."""
+
+    return [
+        {
+            "id": index,
+            "assay": "cosmx",
+            "tissue": f"tissue_{index}",
+            **{field: float(index % 97) + 0.5 for field in Sample.metric_fields()},
+            "cell_count": index,
+            "cell_over25_count": index // 2,
+            "x_transcript_count": index * 3,
+            "y_transcript_count": index * 5,
+            "qc_status": "pass",
+            "qc_flags": json.dumps({"sparsity": "warn"}),
+            "version": 1,
+            "created_at": datetime(2024, 1, 1),
+            "updated_at": datetime(2024, 1, 2),
+        }
+        for index in range(count)
+    ]
+
+
+def best(function: Callable[[], Any], repeat: int) -> float:
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main():
+
+    arguments = parse_arguments()
+
+    rows = make_rows(arguments.rows)
+    samples = SAMPLE_ROWS.validate_python(rows)
+    app = flask.Flask(__name__)
+
+    def validate_rows() -> List[Sample]:
+        return [Sample.model_validate(row) for row in rows]
+
+    def validate_row_list() -> List[Sample]:
+        return SAMPLE_ROWS.validate_python(rows)
+
+    def encode_with_flask() -> str:
+        return app.json.dumps({"samples": [sample.model_dump() for sample in samples], "next_cursor": None})
+
+    def encode_with_pydantic() -> bytes:
+        return pydantic_core.to_json({"samples": samples, "next_cursor": None})
+
+    assert json.loads(encode_with_flask()) == json.loads(encode_with_pydantic())
+
+    steps = [
+        ("build from rows", validate_rows, validate_row_list),
+        ("serialize", encode_with_flask, encode_with_pydantic),
+        ("both", lambda: (validate_rows(), encode_with_flask()), lambda: (validate_row_list(), encode_with_pydantic())),
+    ]
+
+    print(f"{arguments.rows} samples, best of {arguments.repeat} runs")
+    print(f"{'step':<16} {'before (ms)':>12} {'after (ms)':>12} {'speedup':>8}")
+    for name, before, after in steps:
+        old, new = best(before, arguments.repeat), best(after, arguments.repeat)
+        print(f"{name:<16} {old * 1000:>12.2f} {new * 1000:>12.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
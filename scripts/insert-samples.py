@@ -1,31 +1,227 @@
 #!/usr/bin/env python
 
+import argparse
 import json
-from sys import argv
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
 
-from autospatialqc_api import Database, Sample
-from autospatialqc_api.environment import require_envs
+from pydantic import ValidationError
+
+from autospatialqc_api import Database, Sample, create_backend
+
+
+def iter_ndjson(file: TextIO) -> Iterator[Any]:
+    """Iterate over the records of a newline-delimited JSON file, yielding decoding errors for malformed lines."""
+
+    for line in file:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield e
+
+
+def iter_json_array(file: TextIO, block_size: int = 1 << 16) -> Iterator[Any]:
+    """Iterate over the elements of a JSON array without reading the whole file into memory."""
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # Skip whitespace and separators between elements, where only the first "[" opens the array
+        while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+            if buffer[position] == "[":
+                if started:
+                    break
+                started = True
+            elif buffer[position] == "]":
+                return
+            position += 1
+
+        if position < len(buffer) and not started:
+            raise ValueError("Input is not a JSON array.")
+
+        if position < len(buffer):
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A value ending with the buffer may be a number cut short by the block boundary
+                if end < len(buffer) or eof:
+                    position = end
+                    yield value
+                    continue
+
+        if eof:
+            raise ValueError("Unexpected end of input inside JSON array.")
+
+        block = file.read(block_size)
+        eof = not block
+        buffer = buffer[position:] + block
+        position = 0
+
+
+def open_records(path: str, input_format: str) -> Iterator[Any]:
+    """Open an input file and iterate over its records."""
+
+    file = sys.stdin if path == "-" else open(path)
+
+    if input_format == "auto":
+        input_format = "ndjson" if path.endswith((".ndjson", ".jsonl")) else "json"
+
+    with file:
+        yield from iter_ndjson(file) if input_format == "ndjson" else iter_json_array(file)
+
+
+def read_checkpoint(path: str) -> int:
+    """Read the number of records already processed by a previous run, or 0 if there was none."""
+
+    try:
+        with open(path) as file:
+            return int(json.load(file)["records"])
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path: str, records: int):
+    """Atomically record that the first `records` records have been processed."""
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as file:
+        json.dump({"records": records}, file)
+    os.replace(temporary_path, path)
+
+
+class Progress:
+    """Thread-safe counters and checkpointing for an ingest run."""
+
+    def __init__(self, checkpoint_path: Optional[str], resumed_from: int):
+        self.lock = threading.Lock()
+        self.checkpoint_path = checkpoint_path
+        self.watermark = resumed_from
+        self.finished: Dict[int, int] = {}
+
+        self.inserted = 0
+        self.conflicts = 0
+        self.failures = 0
+
+    def finish_chunk(self, start: int, size: int, inserted: int, conflicts: int, failures: int):
+        """Count a finished chunk, and advance the checkpoint past every contiguous finished chunk."""
+
+        with self.lock:
+            self.inserted += inserted
+            self.conflicts += conflicts
+            self.failures += failures
+
+            self.finished[start] = size
+            while self.watermark in self.finished:
+                self.watermark += self.finished.pop(self.watermark)
+
+            if self.checkpoint_path is not None:
+                write_checkpoint(self.checkpoint_path, self.watermark)
+
+
+def insert_chunk(db: Database, progress: Progress, start: int, records: List[Any]):
+    """Validate and insert one chunk of records."""
+
+    samples: List[Sample] = []
+    failures = 0
+
+    for index, record in enumerate(records, start):
+        if isinstance(record, json.JSONDecodeError):
+            failures += 1
+            print(f"Record {index} is not valid JSON: {record}.", file=sys.stderr)
+            continue
+
+        try:
+            samples.append(Sample.model_validate(record))
+        except ValidationError as e:
+            failures += 1
+            print(f"Record {index} is not a valid sample: {e.error_count()} validation error(s).", file=sys.stderr)
+
+    conflicts = len(db.add_samples(samples, chunk_size=len(records) or 1))
+    progress.finish_chunk(start, len(records), len(samples) - conflicts, conflicts, failures)
+
+
+def chunked(records: Iterator[Any], size: int, start: int) -> Iterator[Tuple[int, List[Any]]]:
+    """Group records into numbered chunks of at most `size` records."""
+
+    while chunk := list(islice(records, size)):
+        yield start, chunk
+        start += len(chunk)
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Insert samples from a JSON array or NDJSON file into the database.")
+    parser.add_argument("path", help="input file, or '-' for standard input")
+    parser.add_argument("--format", choices=["auto", "json", "ndjson"], default="auto", dest="input_format")
+    parser.add_argument("--chunk-size", type=int, default=500, help="samples per transaction (default: 500)")
+    parser.add_argument("--workers", type=int, default=1, help="parallel database connections (default: 1)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: '<path>.checkpoint')")
+    parser.add_argument("--restart", action="store_true", help="ignore any existing checkpoint")
+    return parser.parse_args()
 
 
 def main():
 
+    arguments = parse_arguments()
+
     db = Database(
-        **require_envs(
-            host="DB_HOST",
-            database="DB_NAME",
-            username="DB_USERNAME",
-            password="DB_PASSWORD",
-        )
+        backend=create_backend(),
+        pool_size=arguments.workers,
     )
 
-    path = argv[1]
-    with open(path) as file:
-        data = json.load(file)
+    checkpoint_path = arguments.checkpoint
+    if checkpoint_path is None and arguments.path != "-":
+        checkpoint_path = f"{arguments.path}.checkpoint"
+
+    resumed_from = 0 if arguments.restart or checkpoint_path is None else read_checkpoint(checkpoint_path)
+    if resumed_from:
+        print(f"Resuming after record {resumed_from}.", file=sys.stderr)
+
+    progress = Progress(checkpoint_path, resumed_from)
+    records = islice(open_records(arguments.path, arguments.input_format), resumed_from, None)
+
+    started = time.perf_counter()
 
-    for dictionary in data:
-        sample = Sample.model_validate(dictionary)
-        db.add_sample(sample)
-        print(f"Sample ({sample.assay}, {sample.tissue}) successfully added.")
+    # Bound the number of chunks held in memory to a couple per worker
+    slots = threading.BoundedSemaphore(2 * arguments.workers)
+    futures: List[Future] = []
+
+    with ThreadPoolExecutor(max_workers=arguments.workers) as executor:
+        for start, chunk in chunked(records, arguments.chunk_size, resumed_from):
+            slots.acquire()
+            future = executor.submit(insert_chunk, db, progress, start, chunk)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+
+            # Fail fast on database errors, keeping the checkpoint at the last fully processed record
+            for future in [future for future in futures if future.done()]:
+                future.result()
+                futures.remove(future)
+
+        for future in futures:
+            future.result()
+
+    elapsed = time.perf_counter() - started
+    processed = progress.watermark - resumed_from
+    db.close()
+
+    print(
+        f"Processed {processed} records in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.0f} records/s): "
+        f"{progress.inserted} inserted, {progress.conflicts} conflicts, {progress.failures} failures."
+    )
 
 
 if __name__ == "__main__":
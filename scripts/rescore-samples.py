@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import argparse
+import time
+
+from autospatialqc_api import Database, create_backend
+from autospatialqc_api.models.qc import QCThresholds
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-score the QC flags of every sample against its assay.")
+    parser.add_argument("--thresholds", help="JSON file of QC thresholds (default: the built-in thresholds)")
+    return parser.parse_args()
+
+
+def main():
+
+    arguments = parse_arguments()
+
+    thresholds = QCThresholds()
+    if arguments.thresholds is not None:
+        with open(arguments.thresholds) as file:
+            thresholds = QCThresholds.model_validate_json(file.read())
+
+    db = Database(
+        backend=create_backend(),
+        pool_size=1,
+        qc_thresholds=thresholds,
+    )
+
+    started = time.perf_counter()
+    scored = db.rescore_samples()
+    db.close()
+
+    print(f"Scored {scored} samples in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
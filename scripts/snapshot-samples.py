@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+import argparse
+import time
+
+from autospatialqc_api import Database, create_backend
+from autospatialqc_api.models.snapshot import SampleSnapshot
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Write or refresh a columnar .npy snapshot of the samples table.")
+    parser.add_argument("directory", help="snapshot directory")
+    parser.add_argument("--full", action="store_true", help="rewrite the snapshot instead of reading changes only")
+    parser.add_argument(
+        "--interval", type=float, help="keep refreshing the snapshot, waiting this many seconds between refreshes"
+    )
+    return parser.parse_args()
+
+
+def main():
+
+    arguments = parse_arguments()
+
+    db = Database(
+        backend=create_backend(),
+        pool_size=1,
+    )
+
+    snapshot = SampleSnapshot(arguments.directory)
+    full = arguments.full
+
+    try:
+        while True:
+            started = time.perf_counter()
+            manifest = snapshot.refresh(db, full=full)
+            full = False
+
+            print(
+                f"Generation {manifest.generation} has {manifest.rows} samples in {len(manifest.segments)} segment(s), "
+                f"refreshed in {time.perf_counter() - started:.1f}s (watermark: {manifest.watermark}).",
+                flush=True,
+            )
+
+            if arguments.interval is None:
+                break
+            time.sleep(arguments.interval)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
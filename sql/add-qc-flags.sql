@@ -0,0 +1,7 @@
+USE autospatialqc;
+
+-- Add ingest-time QC flags to an existing samples table; run
+-- `scripts/rescore-samples.py` afterwards to score the existing samples
+ALTER TABLE samples
+    ADD COLUMN qc_status    ENUM('pass', 'warn', 'fail') NULL AFTER transcripts_per_feature,
+    ADD COLUMN qc_flags     JSON NULL AFTER qc_status;
@@ -0,0 +1,7 @@
+USE autospatialqc;
+
+-- Add a per-row write counter for sample entity tags, and keep sub-second
+-- modification times for If-Modified-Since
+ALTER TABLE samples
+    ADD COLUMN version      INT NOT NULL DEFAULT 1 AFTER qc_flags,
+    MODIFY COLUMN updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
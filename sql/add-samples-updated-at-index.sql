@@ -0,0 +1,6 @@
+USE autospatialqc;
+
+-- Index modification times, so that snapshot refreshes read recently
+-- changed samples without scanning the table
+ALTER TABLE samples
+    ADD INDEX samples_updated_at (updated_at);
@@ -44,6 +44,7 @@ CREATE TABLE samples (
 
     assay                   VARCHAR(255) NOT NULL,
     tissue                  VARCHAR(255) NOT NULL,
+    -- also serves keyset pagination in (assay, tissue) order
     UNIQUE (assay, tissue),
     INDEX assay_tissue (assay, tissue),
 
@@ -66,6 +67,18 @@ CREATE TABLE samples (
     transcripts_per_area    DOUBLE NOT NULL,
     transcripts_per_feature DOUBLE NOT NULL,
 
+    -- ingest-time QC verdict against the other samples of the assay, and
+    -- the verdict of each metric; NULL until the assay is large enough
+    qc_status               ENUM('pass', 'warn', 'fail') NULL,
+    qc_flags                JSON NULL,
+
+    -- bumped by every write to the row, so that entity tags change even
+    -- when two writes land within the same clock tick
+    version                 INT NOT NULL DEFAULT 1,
+
     created_at              TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at              TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    updated_at              TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+
+    -- serves the snapshot's reads of recently changed samples
+    INDEX samples_updated_at (updated_at)
 );
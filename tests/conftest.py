@@ -0,0 +1,95 @@
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Iterator
+
+import flask
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api import create_app
+from autospatialqc_api.models import Database, Sample
+from autospatialqc_api.models.backends import SQLiteBackend
+
+
+@pytest.fixture
+def database() -> Iterator[Database]:
+    """An empty database, in memory."""
+
+    database = Database(backend=SQLiteBackend(":memory:"))
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def make_sample() -> Callable[..., Sample]:
+    """Make a valid sample, with every metric set to `value` unless given."""
+
+    def make_sample(tissue: str, assay: str = "cosmx", value: float = 1.0, **fields: Any) -> Sample:
+        metrics = {field: value for field in Sample.metric_fields()}
+        for field in ("cell_count", "cell_over25_count", "x_transcript_count", "y_transcript_count"):
+            metrics[field] = int(value)
+        return Sample.model_validate({"assay": assay, "tissue": tissue, **metrics, **fields})
+
+    return make_sample
+
+
+@pytest.fixture
+def app(database: Database, monkeypatch, tmp_path) -> flask.Flask:
+    """An app on the `database` fixture, with an admin who has every permission and a reader who can only read."""
+
+    monkeypatch.setenv("JWT_SECRET_KEY", "test-secret-key-that-is-long-enough-for-hs256")
+    monkeypatch.setenv("LOG_FILE", str(tmp_path / "app.log"))
+
+    database.add_user(
+        "admin@example.com",
+        "admin-password",
+        ["get_sample", "post_sample", "delete_sample", "create_user", "change_password"],
+        "Ada",
+        "Admin",
+    )
+    database.add_user("reader@example.com", "reader-password", ["get_sample"], "Rey", "Reader")
+
+    return create_app(
+        test_config={
+            "TESTING": True,
+            "DATABASE": database,
+            "METRICS_TOKEN": "metrics-token",
+            "SAMPLE_SNAPSHOT_DIR": str(tmp_path / "snapshot"),
+        }
+    )
+
+
+@pytest.fixture
+def client(app: flask.Flask) -> FlaskClient:
+    return app.test_client()
+
+
+@pytest.fixture
+def login(client: FlaskClient) -> Callable[[str, str], Dict[str, str]]:
+    """Log in, returning the headers that authorize later requests."""
+
+    def login(email: str, password: str) -> Dict[str, str]:
+        response = client.post("/login", json={"email": email, "password": password})
+        assert response.status_code == HTTPStatus.OK
+        return {"Authorization": f"Bearer {response.get_json()['access_token']}"}
+
+    return login
+
+
+@pytest.fixture
+def admin(login) -> Dict[str, str]:
+    return login("admin@example.com", "admin-password")
+
+
+@pytest.fixture
+def reader(login) -> Dict[str, str]:
+    return login("reader@example.com", "reader-password")
+
+
+@pytest.fixture
+def sample_data(make_sample: Callable[..., Sample]) -> Callable[..., Dict[str, Any]]:
+    """Make the JSON body of a valid sample, like `make_sample`."""
+
+    def sample_data(tissue: str, **fields: Any) -> Dict[str, Any]:
+        return make_sample(tissue, **fields).model_dump(include=set(Sample.data_fields()))
+
+    return sample_data
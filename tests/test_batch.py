@@ -0,0 +1,61 @@
+from http import HTTPStatus
+
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.errors import SampleNameCollision
+
+
+def test_add_samples_reports_collisions(database: Database, make_sample):
+    database.add_sample(make_sample("liver"))
+
+    collisions = database.add_samples(
+        [make_sample("lung"), make_sample("liver"), make_sample("heart"), make_sample("lung")], chunk_size=2
+    )
+
+    assert collisions == [1, 3]
+    assert [sample.tissue for sample in database.list_samples()] == ["heart", "liver", "lung"]
+
+
+def test_add_samples_atomic_inserts_nothing_on_collision(database: Database, make_sample):
+    database.add_sample(make_sample("liver"))
+
+    assert database.add_samples([make_sample("lung"), make_sample("liver")], atomic=True) == [1]
+    assert [sample.tissue for sample in database.list_samples()] == ["liver"]
+
+    assert database.add_samples([make_sample("lung"), make_sample("heart")], atomic=True) == []
+    assert len(database.list_samples()) == 3
+
+
+def test_add_samples_retries_a_failed_batch_row_by_row(database: Database, make_sample, monkeypatch):
+    database.add_sample(make_sample("liver"))
+
+    # As if another client inserted the sample between the check for existing keys and the insert
+    monkeypatch.setattr(Database, "_Database__existing_sample_keys", lambda self, connection, keys: set())
+
+    # The rows before the collision are rolled back with the batch, rather than kept and reported as collisions
+    assert database.add_samples([make_sample("lung"), make_sample("liver"), make_sample("heart")]) == [1]
+    assert [sample.tissue for sample in database.list_samples()] == ["heart", "liver", "lung"]
+
+    with pytest.raises(SampleNameCollision):
+        database.add_samples([make_sample("kidney"), make_sample("liver")], atomic=True)
+    assert len(database.list_samples()) == 3
+
+
+def test_batch_route(client: FlaskClient, admin, sample_data):
+    client.post("/sample", json=sample_data("liver"), headers=admin)
+
+    response = client.post(
+        "/samples/batch",
+        query_string={"mode": "best-effort"},
+        json=[sample_data("lung"), sample_data("liver"), {"assay": "cosmx"}],
+        headers=admin,
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.get_json()["created"] == 1
+    assert [result["status"] for result in response.get_json()["results"]] == ["created", "conflict", "invalid"]
+
+    response = client.post("/samples/batch", json=[sample_data("heart"), sample_data("lung")], headers=admin)
+    assert response.status_code == HTTPStatus.CONFLICT
+    assert [result["status"] for result in response.get_json()["results"]] == ["skipped", "conflict"]
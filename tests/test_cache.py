@@ -0,0 +1,103 @@
+from typing import Iterator
+
+import pytest
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models import cache as cache_module
+from autospatialqc_api.models.backends import SQLiteBackend
+from autospatialqc_api.models.cache import LRUCache
+from autospatialqc_api.models.errors import SampleNotFound
+from autospatialqc_api.models.sample import SampleUpdate
+
+
+@pytest.fixture
+def cached_database() -> Iterator[Database]:
+    database = Database(backend=SQLiteBackend(":memory:"), cache=LRUCache(), negative_cache_ttl=60.0)
+    yield database
+    database.close()
+
+
+def test_lru_cache(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now)
+    cache = LRUCache(max_size=2, ttl=10.0)
+
+    cache.set("a", 1)
+    cache.set("b", None, ttl=20.0)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    with pytest.raises(KeyError):
+        cache.get("c")
+
+    # "b" is the least recently used entry, so it is evicted first
+    cache.get("a")
+    cache.set("c", 3)
+    with pytest.raises(KeyError):
+        cache.get("b")
+
+    now = 110.0
+    with pytest.raises(KeyError):
+        cache.get("a")
+
+    statistics = cache.statistics()
+    assert (statistics.size, statistics.hits, statistics.misses) == (1, 3, 3)
+    assert (statistics.evictions, statistics.expirations) == (1, 1)
+
+    cache.delete("c")
+    cache.delete("c")
+    assert cache.statistics().size == 0
+
+    with pytest.raises(ValueError):
+        LRUCache(max_size=0)
+
+
+def test_get_sample_reads_through_cache(cached_database: Database, make_sample):
+    cached_database.add_sample(make_sample("liver", area=1.0))
+
+    assert cached_database.get_sample("cosmx", "liver").area == 1.0
+    assert cached_database.get_sample("cosmx", "liver").area == 1.0
+    statistics = cached_database.cache_statistics()
+    assert statistics is not None and (statistics.hits, statistics.misses) == (1, 1)
+
+    # Missing samples are remembered too
+    for _ in range(2):
+        with pytest.raises(SampleNotFound):
+            cached_database.get_sample("cosmx", "lung")
+    statistics = cached_database.cache_statistics()
+    assert statistics is not None and (statistics.hits, statistics.misses) == (2, 2)
+
+    assert Database(backend=SQLiteBackend(":memory:")).cache_statistics() is None
+
+
+def test_writes_invalidate_cache(cached_database: Database, make_sample):
+    with pytest.raises(SampleNotFound):
+        cached_database.get_sample("cosmx", "liver")
+
+    cached_database.add_sample(make_sample("liver", area=1.0))
+    assert cached_database.get_sample("cosmx", "liver").area == 1.0
+
+    cached_database.update_sample("cosmx", "liver", SampleUpdate(area=2.0))
+    assert cached_database.get_sample("cosmx", "liver").area == 2.0
+
+    cached_database.add_sample(make_sample("liver", area=4.0), upsert=True)
+    assert cached_database.get_sample("cosmx", "liver").area == 4.0
+
+    # Sessions read past the cache, and their writes are dropped from it once they end
+    with cached_database.session():
+        cached_database.update_sample("cosmx", "liver", SampleUpdate(area=5.0))
+        assert cached_database.get_sample("cosmx", "liver").area == 5.0
+    assert cached_database.get_sample("cosmx", "liver").area == 5.0
+
+    cached_database.delete_sample("cosmx", "liver")
+    with pytest.raises(SampleNotFound):
+        cached_database.get_sample("cosmx", "liver")
+
+
+def test_missing_samples_not_cached():
+    database = Database(backend=SQLiteBackend(":memory:"), cache=LRUCache(), negative_cache_ttl=None)
+
+    with pytest.raises(SampleNotFound):
+        database.get_sample("cosmx", "liver")
+    statistics = database.cache_statistics()
+    assert statistics is not None and statistics.size == 0
+    database.close()
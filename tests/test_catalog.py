@@ -0,0 +1,59 @@
+import time
+from typing import List, Tuple
+
+import pytest
+
+from autospatialqc_api.models import Database, Permissions
+from autospatialqc_api.models.catalog import PermissionCatalog
+from autospatialqc_api.models.errors import UnknownPermission
+
+
+class Table:
+    def __init__(self, rows: List[Tuple[int, str]]):
+        self.rows = rows
+        self.loads = 0
+
+    def load(self) -> List[Tuple[int, str]]:
+        self.loads += 1
+        return list(self.rows)
+
+
+def test_catalog_loads_once():
+    table = Table([(1, "get_sample"), (2, "post_sample")])
+    catalog = PermissionCatalog(table.load)
+
+    assert catalog.ids(["post_sample", "get_sample"]) == [2, 1]
+    assert catalog.flags([1, 2]) == Permissions.GET_SAMPLE | Permissions.POST_SAMPLE
+    assert table.loads == 1
+
+
+def test_catalog_limits_reloads_on_unknown_names(monkeypatch):
+    table = Table([(1, "get_sample")])
+    catalog = PermissionCatalog(table.load, refresh_interval=60.0)
+    catalog.ids(["get_sample"])
+
+    # Unknown names are rejected without reading the table again until the interval has passed
+    for _ in range(3):
+        with pytest.raises(UnknownPermission):
+            catalog.ids(["no_such_permission"])
+        assert catalog.flags([1, 7]) == Permissions.GET_SAMPLE
+    assert table.loads == 1
+
+    # A permission added by another process is found by the next reload
+    table.rows.append((2, "delete_sample"))
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61.0)
+    assert catalog.ids(["delete_sample"]) == [2]
+    assert table.loads == 2
+
+    # Explicit refreshes always reload
+    catalog.refresh()
+    assert table.loads == 3
+
+
+def test_unknown_permissions_are_rejected(database: Database):
+    with pytest.raises(UnknownPermission):
+        database.add_user("new@example.com", "password", ["no_such_permission"], "New", "User")
+
+    database.add_user("new@example.com", "password", ["get_sample"], "New", "User")
+    assert database.get_user("new@example.com", "password").permissions == Permissions.GET_SAMPLE
@@ -0,0 +1,96 @@
+import gzip
+import json
+import zlib
+from typing import Callable, Optional
+
+import pytest
+from flask.testing import FlaskClient
+from werkzeug.test import TestResponse
+
+from autospatialqc_api.compression import available_encodings, parse_levels
+
+
+def decompressor(encoding: str) -> Callable[[bytes], bytes]:
+    """Make an incremental decompressor for one encoding, skipping the test if its package is missing."""
+
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS).decompress
+    if encoding == "br":
+        return pytest.importorskip("brotli").Decompressor().process
+    return pytest.importorskip("zstandard").ZstdDecompressor().decompressobj().decompress
+
+
+@pytest.fixture
+def export(client: FlaskClient, admin, sample_data) -> Callable[[str], TestResponse]:
+    """Export 20 samples in chunks of 5 with an `Accept-Encoding` header."""
+
+    client.post("/samples/batch", json=[sample_data(f"tissue_{index}") for index in range(20)], headers=admin)
+    client.application.config["SAMPLE_EXPORT_CHUNK_SIZE"] = 5
+
+    def export(accept_encoding: str) -> TestResponse:
+        return client.get("/samples/export", headers={**admin, "Accept-Encoding": accept_encoding})
+
+    return export
+
+
+def encoding_of(export: Callable[[str], TestResponse], accept_encoding: str) -> Optional[str]:
+    """Get the encoding chosen for an export, closing it unread."""
+
+    response = export(accept_encoding)
+    response.close()
+    return response.headers.get("Content-Encoding")
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_streamed_export_compression(export: Callable[[str], TestResponse], encoding: str):
+    plain = export("identity")
+    assert "Content-Encoding" not in plain.headers
+    # The in-memory database has one connection, which a stream holds until it is read
+    expected = plain.get_data()
+
+    response = export(encoding)
+    assert response.status_code == 200
+    assert response.is_streamed and "Content-Length" not in response.headers
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+    # Every chunk is flushed, so each one decodes to the rows sent so far
+    decompress = decompressor(encoding)
+    chunks = [decompress(chunk) for chunk in response.iter_encoded()]
+    assert all(chunk.endswith(b"\n") for chunk in chunks if chunk)
+    assert len([json.loads(line) for line in chunks[0].splitlines()]) == 5
+    assert b"".join(chunks) == expected
+
+
+def test_encoding_negotiation(export: Callable[[str], TestResponse]):
+    preferred = available_encodings()[0]
+    assert encoding_of(export, "gzip, br, zstd") == preferred
+    assert encoding_of(export, "gzip;q=1, br;q=0.5, zstd;q=0.5") == "gzip"
+    assert encoding_of(export, "compress") is None
+
+    if "br" in available_encodings():
+        assert encoding_of(export, "br, gzip;q=0.9") == "br"
+
+
+def test_buffered_responses(client: FlaskClient, admin, sample_data):
+    client.post("/samples/batch", json=[sample_data(f"tissue_{index}") for index in range(20)], headers=admin)
+
+    response = client.get("/samples", headers={**admin, "Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.get_data()))
+
+    # Small bodies are not worth compressing
+    response = client.get("/sample", query_string={"assay": "cosmx", "tissue": "tissue_1"}, headers=admin)
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json()["tissue"] == "tissue_1"
+
+    client.application.config["COMPRESSION_ENABLED"] = False
+    assert "Content-Encoding" not in client.get("/samples", headers={**admin, "Accept-Encoding": "gzip"}).headers
+
+
+def test_parse_levels():
+    assert parse_levels("gzip=1")["gzip"] == 1
+    assert parse_levels(None)["gzip"] == 6
+
+    with pytest.raises(ValueError):
+        parse_levels("deflate=1")
@@ -0,0 +1,34 @@
+from http import HTTPStatus
+
+from flask.testing import FlaskClient
+
+KEY = {"assay": "cosmx", "tissue": "liver"}
+
+
+def test_if_none_match(client: FlaskClient, admin, sample_data):
+    client.post("/sample", json=sample_data("liver"), headers=admin)
+
+    etag = client.get("/sample", query_string=KEY, headers=admin).headers["ETag"]
+    response = client.get("/sample", query_string=KEY, headers={**admin, "If-None-Match": etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+
+    # Every write changes the entity tag, however soon it follows the previous one
+    client.patch("/sample", query_string=KEY, json={"area": 7.0}, headers=admin)
+    response = client.get("/sample", query_string=KEY, headers={**admin, "If-None-Match": etag})
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["ETag"] != etag
+
+
+def test_if_modified_since(client: FlaskClient, admin, sample_data):
+    client.post("/sample", json=sample_data("liver"), headers=admin)
+
+    # Clients send back the Last-Modified they received, which has whole seconds
+    last_modified = client.get("/sample", query_string=KEY, headers=admin).headers["Last-Modified"]
+    response = client.get("/sample", query_string=KEY, headers={**admin, "If-Modified-Since": last_modified})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+    response = client.get(
+        "/sample", query_string=KEY, headers={**admin, "If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    )
+    assert response.status_code == HTTPStatus.OK
@@ -0,0 +1,44 @@
+import pytest
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.errors import SampleNameCollision, SampleNotFound
+
+
+def test_add_and_get_sample(database: Database, make_sample):
+    database.add_sample(make_sample("liver", area=2.5))
+
+    sample = database.get_sample("cosmx", "liver")
+    assert sample.area == 2.5
+    assert sample.id is not None
+    assert sample.version == 1
+    assert sample.updated_at is not None
+
+    with pytest.raises(SampleNotFound):
+        database.get_sample("cosmx", "lung")
+
+
+def test_add_sample_collision(database: Database, make_sample):
+    database.add_sample(make_sample("liver"))
+
+    with pytest.raises(SampleNameCollision):
+        database.add_sample(make_sample("liver"))
+
+
+def test_delete_sample(database: Database, make_sample):
+    database.add_sample(make_sample("liver"))
+    database.delete_sample("cosmx", "liver")
+
+    with pytest.raises(SampleNotFound):
+        database.get_sample("cosmx", "liver")
+    with pytest.raises(SampleNotFound):
+        database.delete_sample("cosmx", "liver")
+
+
+def test_sessions_roll_back(database: Database, make_sample):
+    with pytest.raises(RuntimeError):
+        with database.session():
+            database.add_sample(make_sample("liver"))
+            raise RuntimeError()
+
+    assert database.list_samples() == []
+    assert database.sample_statistics() == []
@@ -0,0 +1,83 @@
+import sqlite3
+from http import HTTPStatus
+from typing import List
+
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.backends import SQLiteBackend
+from autospatialqc_api.models.profiling import OperationProfile, QueryHook, QueryProfiler, StatementProfile
+from autospatialqc_api.models.query import SampleFilter
+
+
+def test_delete_samples(database: Database, make_sample):
+    database.add_samples([make_sample(tissue, value=value) for tissue, value in [("a", 1), ("b", 2), ("c", 3)]])
+
+    assert database.delete_samples(keys=[("cosmx", "a"), ("cosmx", "z")], dry_run=True) == (1, [("cosmx", "a")])
+    assert len(database.list_samples()) == 3
+
+    assert database.delete_samples(keys=[("cosmx", "a"), ("cosmx", "z")]) == (1, [("cosmx", "a")])
+    assert database.delete_samples(sample_filter=SampleFilter(ranges={"area": (2.5, None)})) == (1, [("cosmx", "c")])
+    assert [sample.tissue for sample in database.list_samples()] == ["b"]
+
+    with pytest.raises(ValueError):
+        database.delete_samples()
+
+
+class DeleteConcurrently(QueryHook):
+    """Tries to delete a sample from another database object as soon as `delete_samples` has found its samples."""
+
+    def __init__(self, other: Database):
+        self.other = other
+        self.errors: List[Exception] = []
+
+    def statement_executed(self, profile: OperationProfile, statement: StatementProfile):
+        if statement.operation == "delete_samples" and statement.sql.lstrip().startswith("SELECT") and not self.errors:
+            try:
+                self.other.delete_sample("cosmx", "a")
+            except Exception as e:
+                self.errors.append(e)
+
+
+def test_delete_samples_locks_what_it_finds(tmp_path, make_sample):
+    path = str(tmp_path / "samples.db")
+    database = Database(backend=SQLiteBackend(path))
+    other = Database(backend=SQLiteBackend(path, timeout=0.1))
+    hook = DeleteConcurrently(other)
+    database.profiler = QueryProfiler([hook])
+
+    try:
+        database.add_samples([make_sample("a"), make_sample("b")])
+
+        # The other client cannot delete a sample between the time it is found and deleted, so every key returned was
+        # deleted by this call
+        assert database.delete_samples(keys=[("cosmx", "a"), ("cosmx", "b")]) == (2, [("cosmx", "a"), ("cosmx", "b")])
+        assert len(hook.errors) == 1 and isinstance(hook.errors[0], sqlite3.OperationalError)
+    finally:
+        database.close()
+        other.close()
+
+
+def test_delete_samples_route(client: FlaskClient, admin, sample_data):
+    client.post("/samples/batch", json=[sample_data("liver"), sample_data("lung")], headers=admin)
+
+    assert client.delete("/samples", headers=admin).status_code == HTTPStatus.BAD_REQUEST
+
+    # Keys and filter arguments cannot be combined
+    response = client.delete(
+        "/samples",
+        query_string={"tissue": "liver"},
+        json={"keys": [{"assay": "cosmx", "tissue": "lung"}]},
+        headers=admin,
+    )
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    lung = {"keys": [{"assay": "cosmx", "tissue": "lung"}]}
+    response = client.delete("/samples", query_string={"dry_run": "true"}, json=lung, headers=admin)
+    assert response.get_json() == {"deleted": 1, "dry_run": True, "keys": [{"assay": "cosmx", "tissue": "lung"}]}
+
+    response = client.delete("/samples", json=lung, headers=admin)
+    assert response.get_json()["deleted"] == 1
+    response = client.delete("/samples", query_string={"assay": "cosmx"}, headers=admin)
+    assert response.get_json()["keys"] == [{"assay": "cosmx", "tissue": "liver"}]
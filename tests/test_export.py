@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+from http import HTTPStatus
+
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.query import SampleFilter
+
+
+def test_iter_samples(database: Database, make_sample):
+    database.add_samples([make_sample(tissue, value=value) for value, tissue in enumerate(["lung", "heart", "liver"])])
+
+    rows = list(database.iter_samples(SampleFilter(ranges={"area": (1.0, None)}), columns=["tissue", "area"]))
+    assert rows == [{"tissue": "heart", "area": 1.0}, {"tissue": "liver", "area": 2.0}]
+
+    # Closing a stream early leaves the database usable
+    rows = database.iter_samples()
+    assert next(rows)["tissue"] == "heart"
+    rows.close()
+    assert len(database.list_samples()) == 3
+
+    with pytest.raises(ValueError):
+        list(database.iter_samples(columns=["password"]))
+
+
+def test_export_route(client: FlaskClient, admin, sample_data):
+    client.post("/samples/batch", json=[sample_data(f"tissue_{index}") for index in range(5)], headers=admin)
+    client.application.config["SAMPLE_EXPORT_CHUNK_SIZE"] = 2
+
+    response = client.get("/samples/export", headers=admin)
+    assert response.status_code == HTTPStatus.OK
+    assert response.mimetype == "application/x-ndjson"
+    assert response.is_streamed
+    chunks = list(response.response)
+    assert len(chunks) == 3
+    rows = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert [row["tissue"] for row in rows] == [f"tissue_{index}" for index in range(5)]
+    assert rows[0]["area"] == 1.0 and "id" in rows[0]
+
+    response = client.get(
+        "/samples/export", query_string={"tissue": "tissue_3"}, headers={**admin, "Accept": "text/csv"}
+    )
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row["tissue"] for row in rows] == ["tissue_3"]
+    assert float(rows[0]["area"]) == 1.0
+
+    response = client.get("/samples/export", headers={**admin, "Accept": "application/xml"})
+    assert response.status_code == HTTPStatus.NOT_ACCEPTABLE
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+from typing import Iterator
+
+import flask
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.backends import SQLiteBackend
+from autospatialqc_api.models.hashing import PasswordHashingPool
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+
+
+def run_in_fork(child) -> int:
+    """Run a function in a forked process, returning its exit status, or failing if it hangs."""
+
+    if (pid := os.fork()) == 0:
+        try:
+            status = 0 if child() else 1
+        except BaseException:
+            status = 2
+        os._exit(status)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if (result := os.waitpid(pid, os.WNOHANG))[0] == pid:
+            return os.waitstatus_to_exitcode(result[1]) if hasattr(os, "waitstatus_to_exitcode") else result[1] >> 8
+        time.sleep(0.05)
+
+    os.kill(pid, 9)
+    os.waitpid(pid, 0)
+    pytest.fail("The forked process hung.")
+
+
+@pytest.fixture
+def database(tmp_path) -> Iterator[Database]:
+    # In-memory databases live in the memory of the process that opened them, so forks need a file
+    database = Database(backend=SQLiteBackend(str(tmp_path / "fork.db")))
+    yield database
+    database.close()
+
+
+def test_forked_workers_build_statistics(app: flask.Flask, client: FlaskClient, database: Database, admin, sample_data):
+    client.post("/sample", json=sample_data("liver"), headers=admin)
+    assert database.sample_statistics()[0].count == 1
+
+    def child() -> bool:
+        client.post("/sample", json=sample_data("lung"), headers=admin)
+        database.rebuild_sample_statistics()
+        return database.sample_statistics()[0].count == 2
+
+    # As if the parent's background build was running at the time of the fork, which the worker does not inherit
+    with database._Database__statistics_lock:  # type: ignore[attr-defined]
+        assert run_in_fork(child) == 0
+
+
+def test_forked_workers_write_logs(app: flask.Flask, tmp_path):
+    app.logger.info("Logged by the parent.")
+
+    def child() -> bool:
+        app.logger.info("Logged by the worker.", extra={"event": "worker"})
+        for handler in app.logger.handlers:
+            if hasattr(handler, "stop"):
+                handler.stop()
+        return True
+
+    assert run_in_fork(child) == 0
+
+    messages = [json.loads(line)["message"] for line in (tmp_path / "app.log").read_text().splitlines()]
+    assert "Logged by the worker." in messages
+
+
+def test_forked_workers_hash_passwords():
+    hashing = PasswordHashingPool(workers=1, time_cost=1, memory_cost=8, parallelism=1)
+    password_hash = hashing.hash("password")
+
+    def child() -> bool:
+        # The parent's worker thread, which the pool would otherwise wait on forever, does not exist here
+        return hashing.verify(password_hash, "password") and hashing.statistics().in_flight == 0
+
+    # As if another request was hashing at the time of the fork
+    with hashing._PasswordHashingPool__lock:  # type: ignore[attr-defined]
+        assert run_in_fork(child) == 0
+    hashing.shutdown()
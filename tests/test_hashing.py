@@ -0,0 +1,98 @@
+import threading
+from http import HTTPStatus
+from typing import Iterator
+
+import argon2
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.backends import SQLiteBackend
+from autospatialqc_api.models.errors import HashingOverloaded
+from autospatialqc_api.models.hashing import PasswordHashingPool
+
+CHEAP = {"time_cost": 1, "memory_cost": 8, "parallelism": 1}
+
+
+class BlockingHasher(argon2.PasswordHasher):
+    """A hasher whose verifications wait until released, to hold the pool's only worker."""
+
+    def __init__(self):
+        super().__init__(**CHEAP)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def verify(self, hash, password) -> bool:
+        self.started.set()
+        assert self.release.wait(10)
+        return super().verify(hash, password)
+
+
+@pytest.fixture
+def hashing() -> PasswordHashingPool:
+    return PasswordHashingPool(workers=1, queue_limit=0, retry_after=7, **CHEAP)
+
+
+@pytest.fixture
+def database(hashing: PasswordHashingPool) -> Iterator[Database]:
+    database = Database(backend=SQLiteBackend(":memory:"), hashing=hashing)
+    yield database
+    database.close()
+
+
+def hold_worker(hashing: PasswordHashingPool) -> threading.Thread:
+    """Occupy the pool's only worker until its hasher is released."""
+
+    password_hash = hashing.hash("password")
+    hashing.hasher = BlockingHasher()
+    thread = threading.Thread(target=hashing.verify, args=(password_hash, "password"))
+    thread.start()
+    assert hashing.hasher.started.wait(10)
+    return thread
+
+
+def test_pool_rejects_when_full(hashing: PasswordHashingPool):
+    assert hashing.verify(hashing.hash("password"), "password")
+    assert not hashing.verify(hashing.hash("password"), "wrong-password")
+
+    thread = hold_worker(hashing)
+    try:
+        with pytest.raises(HashingOverloaded):
+            hashing.hash("password")
+        assert hashing.statistics().in_flight == 1
+    finally:
+        hashing.hasher.release.set()  # type: ignore[attr-defined]
+        thread.join()
+
+    statistics = hashing.statistics()
+    assert (statistics.in_flight, statistics.hashes, statistics.verifications, statistics.rejections) == (0, 3, 3, 1)
+
+
+def test_login_overloaded(client: FlaskClient, hashing: PasswordHashingPool):
+    thread = hold_worker(hashing)
+    try:
+        response = client.post("/login", json={"email": "admin@example.com", "password": "admin-password"})
+    finally:
+        hashing.hasher.release.set()  # type: ignore[attr-defined]
+        thread.join()
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "7"
+
+
+def test_login_rehashes_outdated_hash(database: Database, hashing: PasswordHashingPool):
+    database.add_user("user@example.com", "password", [], "Una", "User")
+
+    def stored_hash() -> str:
+        with database.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT password_hash FROM users WHERE email = %s", ("user@example.com",))
+                return cursor.fetchone()["password_hash"]
+
+    outdated = stored_hash()
+    hashing.hasher = argon2.PasswordHasher(**{**CHEAP, "time_cost": 2})
+    assert hashing.needs_rehash(outdated)
+
+    assert database.get_user("user@example.com", "password").authenticated
+    assert stored_hash() != outdated and not hashing.needs_rehash(stored_hash())
+    assert database.get_user("user@example.com", "password").authenticated
@@ -0,0 +1,103 @@
+import importlib.util
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.backends import SQLiteBackend
+
+# The script's name is not a module name, so it is loaded from its path
+spec = importlib.util.spec_from_file_location(
+    "insert_samples", Path(__file__).parent.parent / "scripts" / "insert-samples.py"
+)
+assert spec is not None and spec.loader is not None
+insert_samples = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(insert_samples)
+
+
+def test_iter_ndjson():
+    records = list(insert_samples.iter_ndjson(io.StringIO('{"a": 1}\n\n{"a": \n[2]\n')))
+
+    assert records[0] == {"a": 1}
+    assert isinstance(records[1], json.JSONDecodeError)
+    assert records[2] == [2]
+
+
+def test_iter_json_array():
+    text = '[{"a": "' + "x" * 100 + '"}, 1234567 ,\n[3, 4]]'
+
+    # Blocks smaller than an element are joined until it decodes, and numbers aren't cut at block boundaries
+    for block_size in (1, 7, 1 << 16):
+        records = list(insert_samples.iter_json_array(io.StringIO(text), block_size=block_size))
+        assert records == [{"a": "x" * 100}, 1234567, [3, 4]]
+    assert list(insert_samples.iter_json_array(io.StringIO(" [ ] "))) == []
+
+    with pytest.raises(ValueError):
+        list(insert_samples.iter_json_array(io.StringIO('{"a": 1}')))
+    with pytest.raises(ValueError):
+        list(insert_samples.iter_json_array(io.StringIO("[1, 2")))
+
+
+def test_open_records(tmp_path):
+    (tmp_path / "samples.jsonl").write_text('{"a": 1}\n{"a": 2}\n')
+    (tmp_path / "samples.json").write_text('[{"a": 1}, {"a": 2}]')
+
+    assert list(insert_samples.open_records(str(tmp_path / "samples.jsonl"), "auto")) == [{"a": 1}, {"a": 2}]
+    assert list(insert_samples.open_records(str(tmp_path / "samples.json"), "auto")) == [{"a": 1}, {"a": 2}]
+
+
+def test_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint")
+    assert insert_samples.read_checkpoint(path) == 0
+
+    insert_samples.write_checkpoint(path, 42)
+    assert insert_samples.read_checkpoint(path) == 42
+    assert not (tmp_path / "checkpoint.tmp").exists()
+
+
+def test_progress_advances_over_contiguous_chunks(tmp_path):
+    path = str(tmp_path / "checkpoint")
+    progress = insert_samples.Progress(path, 10)
+
+    # A later chunk finishing first doesn't move the checkpoint past the unfinished one before it
+    progress.finish_chunk(15, 5, 4, 1, 0)
+    assert progress.watermark == 10 and insert_samples.read_checkpoint(path) == 10
+
+    progress.finish_chunk(10, 5, 3, 0, 2)
+    assert progress.watermark == 20 and insert_samples.read_checkpoint(path) == 20
+    assert (progress.inserted, progress.conflicts, progress.failures) == (7, 1, 2)
+
+
+def test_chunked():
+    chunks = list(insert_samples.chunked(iter(range(5)), 2, 10))
+    assert chunks == [(10, [0, 1]), (12, [2, 3]), (14, [4])]
+
+
+def test_insert_chunk(database: Database, sample_data):
+    database.add_sample(insert_samples.Sample.model_validate(sample_data("liver")))
+    progress = insert_samples.Progress(None, 0)
+
+    records = [sample_data("liver"), sample_data("lung"), {"tissue": "heart"}, json.JSONDecodeError("", "", 0)]
+    insert_samples.insert_chunk(database, progress, 0, records)
+
+    assert (progress.inserted, progress.conflicts, progress.failures, progress.watermark) == (1, 1, 2, 4)
+    assert [sample.tissue for sample in database.list_samples()] == ["liver", "lung"]
+
+
+def test_main_resumes_from_checkpoint(tmp_path, monkeypatch, sample_data):
+    path = tmp_path / "samples.ndjson"
+    path.write_text("".join(json.dumps(sample_data(f"tissue_{index}")) + "\n" for index in range(7)))
+    insert_samples.write_checkpoint(f"{path}.checkpoint", 2)
+
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "samples.db"))
+    monkeypatch.setattr(sys, "argv", ["insert-samples.py", str(path), "--chunk-size", "2", "--workers", "2"])
+    insert_samples.main()
+
+    database = Database(backend=SQLiteBackend(str(tmp_path / "samples.db")))
+    assert sorted(sample.tissue for sample in database.list_samples()) == [f"tissue_{index}" for index in range(2, 7)]
+    database.close()
+    assert insert_samples.read_checkpoint(f"{path}.checkpoint") == 7
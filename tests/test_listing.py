@@ -0,0 +1,58 @@
+from http import HTTPStatus
+
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.query import SampleFilter, encode_cursor
+
+
+def test_list_samples_pages(database: Database, make_sample):
+    database.add_samples([make_sample(f"tissue_{index}") for index in range(5)])
+
+    first = database.list_samples(limit=2)
+    second = database.list_samples(limit=2, after=(first[-1].assay, first[-1].tissue))
+
+    assert [sample.tissue for sample in first + second] == [f"tissue_{index}" for index in range(4)]
+    assert [sample.tissue for sample in database.list_samples(SampleFilter(tissue="tissue_3"))] == ["tissue_3"]
+
+    by_id = database.list_samples(limit=2, order_by="id")
+    assert [sample.tissue for sample in database.list_samples(after=(by_id[-1].id,), order_by="id")] == [
+        f"tissue_{index}" for index in range(2, 5)
+    ]
+
+
+def test_list_samples_route_pages(client: FlaskClient, admin, sample_data):
+    for index in range(5):
+        client.post("/sample", json=sample_data(f"tissue_{index}"), headers=admin)
+
+    for order in ("key", "id"):
+        first = client.get("/samples", query_string={"limit": 3, "order": order}, headers=admin).get_json()
+        second = client.get(
+            "/samples", query_string={"limit": 3, "order": order, "cursor": first["next_cursor"]}, headers=admin
+        ).get_json()
+
+        assert [sample["tissue"] for sample in first["samples"] + second["samples"]] == [
+            f"tissue_{index}" for index in range(5)
+        ]
+        assert second["next_cursor"] is None
+
+    response = client.get("/samples", query_string={"limit": 3}, headers=admin)
+    etag = response.headers["ETag"]
+    response = client.get("/samples", query_string={"limit": 3}, headers={**admin, "If-None-Match": etag})
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_list_samples_rejects_bad_cursors(client: FlaskClient, admin):
+    for order, cursor in [
+        ("id", encode_cursor("abc")),
+        ("id", encode_cursor(True)),
+        ("id", encode_cursor("cosmx", "liver")),
+        ("key", encode_cursor(1, 2)),
+        ("key", encode_cursor("cosmx")),
+        ("key", "not-a-cursor"),
+    ]:
+        response = client.get("/samples", query_string={"order": order, "cursor": cursor}, headers=admin)
+        assert response.status_code == HTTPStatus.BAD_REQUEST, (order, cursor)
+
+    assert client.get("/samples", query_string={"limit": 0}, headers=admin).status_code == HTTPStatus.BAD_REQUEST
+    assert client.get("/samples", query_string={"order": "area"}, headers=admin).status_code == HTTPStatus.BAD_REQUEST
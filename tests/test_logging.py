@@ -0,0 +1,95 @@
+import json
+import logging
+import sys
+
+import flask
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api import structured_logging
+from autospatialqc_api.structured_logging import JSONFormatter, SamplingFilter, parse_sample_rates
+
+
+@pytest.fixture(autouse=True)
+def sample_rates(monkeypatch):
+    # Read when the app is created, so set before the `app` fixture
+    monkeypatch.setenv("LOG_SAMPLE_RATES", "sample_read=0, sample_lookup=1")
+
+
+def make_record(level: int = logging.INFO, event=None, **fields) -> logging.LogRecord:
+    record = logging.LogRecord("tests", level, __file__, 1, "Sample '%s' read.", ("liver",), None)
+    if event is not None:
+        record.event = event
+    record.__dict__.update(fields)
+    return record
+
+
+def test_json_formatter():
+    record = make_record(event="sample_read", request_id="abc", count=3)
+    entry = json.loads(JSONFormatter().format(record))
+
+    assert set(entry) == {"time", "level", "logger", "message", "event", "request_id", "count"}
+    assert entry["message"] == "Sample 'liver' read."
+    assert (entry["level"], entry["logger"], entry["count"]) == ("INFO", "tests", 3)
+    assert entry["time"].endswith("+00:00")
+
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        record = make_record(level=logging.ERROR)
+        record.exc_info = sys.exc_info()
+    entry = json.loads(JSONFormatter().format(record))
+    assert "ValueError: broken" in entry["exception"]
+
+
+def test_sampling_filter(monkeypatch):
+    sampling = SamplingFilter({"sample_read": 0.25, "sample_delete": 0.0})
+
+    monkeypatch.setattr(structured_logging.random, "random", lambda: 0.2)
+    record = make_record(event="sample_read")
+    assert sampling.filter(record) and record.sample_rate == 0.25  # type: ignore[attr-defined]
+
+    monkeypatch.setattr(structured_logging.random, "random", lambda: 0.3)
+    assert not sampling.filter(make_record(event="sample_read"))
+    assert not sampling.filter(make_record(event="sample_delete"))
+
+    # Warnings, unlisted events and records without an event name are always kept
+    record = make_record(level=logging.WARNING, event="sample_delete")
+    assert sampling.filter(record) and not hasattr(record, "sample_rate")
+    assert sampling.filter(make_record(event="sample_update"))
+    assert sampling.filter(make_record(event=["sample_read"]))
+    assert sampling.filter(make_record())
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates(None) == {}
+    assert parse_sample_rates(" sample_read=0.01, ,sample_lookup = 1") == {"sample_read": 0.01, "sample_lookup": 1.0}
+
+    with pytest.raises(ValueError):
+        parse_sample_rates("sample_read=2")
+    with pytest.raises(ValueError):
+        parse_sample_rates("sample_read")
+
+
+def test_app_logs(app: flask.Flask, client: FlaskClient, admin, sample_data, tmp_path):
+    client.post("/sample", json=sample_data("liver"), headers=admin)
+    client.get("/sample", query_string={"assay": "cosmx", "tissue": "liver"}, headers=admin)
+    response = client.post(
+        "/samples/lookup", json=[["cosmx", "liver"]], headers={**admin, "X-Request-ID": "lookup-request"}
+    )
+    assert response.headers["X-Request-ID"] == "lookup-request"
+    response = client.post("/samples/lookup", json=[["cosmx", "liver"]], headers={**admin, "X-Request-ID": "a b"})
+    assert response.headers["X-Request-ID"] != "a b"
+
+    for handler in app.logger.handlers:
+        if hasattr(handler, "stop"):
+            handler.stop()
+
+    entries = [json.loads(line) for line in (tmp_path / "app.log").read_text().splitlines()]
+    events = [entry.get("event") for entry in entries]
+    assert "sample_read" not in events
+    assert events.count("sample_lookup") == 2
+
+    lookup = next(entry for entry in entries if entry.get("event") == "sample_lookup")
+    assert (lookup["request_id"], lookup["sample_rate"]) == ("lookup-request", 1.0)
+    assert lookup["message"] == "1 of 1 looked up samples returned."
@@ -0,0 +1,42 @@
+from http import HTTPStatus
+
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+
+
+def test_get_samples(database: Database, make_sample):
+    database.add_samples([make_sample("liver"), make_sample("lung")])
+
+    samples = database.get_samples([("cosmx", "lung"), ("cosmx", "heart"), ("cosmx", "liver")], chunk_size=1)
+
+    assert list(samples) == [("cosmx", "lung"), ("cosmx", "heart"), ("cosmx", "liver")]
+    assert samples[("cosmx", "heart")] is None
+    assert samples[("cosmx", "lung")] is not None and samples[("cosmx", "lung")].tissue == "lung"
+
+
+def test_lookup(client: FlaskClient, admin, sample_data):
+    client.post("/samples/batch", json=[sample_data("liver"), sample_data("lung")], headers=admin)
+
+    response = client.post("/samples/lookup", json=[["cosmx", "lung"], ["cosmx", "heart"]], headers=admin)
+    assert [result["status"] for result in response.get_json()["results"]] == ["found", "not_found"]
+    assert response.get_json()["results"][0]["sample"]["tissue"] == "lung"
+
+    response = client.post("/samples/lookup", json={"keys": [{"assay": "cosmx", "tissue": "liver"}]}, headers=admin)
+    assert [result["status"] for result in response.get_json()["results"]] == ["found"]
+
+    response = client.get("/samples/lookup", query_string={"assay": "cosmx", "tissue": "liver"}, headers=admin)
+    assert [result["status"] for result in response.get_json()["results"]] == ["found"]
+
+
+def test_lookup_errors(client: FlaskClient, admin):
+    unpaired = {"assay": ["cosmx", "cosmx"], "tissue": "liver"}
+    response = client.get("/samples/lookup", query_string=unpaired, headers=admin)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    response = client.post("/samples/lookup", json=[["cosmx"]], headers=admin)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    client.application.config["SAMPLE_LOOKUP_MAX_SIZE"] = 1
+    response = client.post("/samples/lookup", json=[["cosmx", "liver"], ["cosmx", "lung"]], headers=admin)
+    assert response.status_code == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
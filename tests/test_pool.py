@@ -0,0 +1,127 @@
+import threading
+import time
+from http import HTTPStatus
+from typing import Iterator, List
+
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.backends import SQLiteBackend
+from autospatialqc_api.models.errors import PoolTimeout
+from autospatialqc_api.models.pool import ConnectionPool
+
+
+class FakeError(Exception):
+    pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.open = True
+        self.alive = True
+
+    def ping(self, reconnect: bool = False):
+        if not self.alive:
+            raise FakeError()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def connections() -> List[FakeConnection]:
+    return []
+
+
+def make_pool(connections: List[FakeConnection], **options) -> ConnectionPool:
+    def connect() -> FakeConnection:
+        connections.append(FakeConnection())
+        return connections[-1]
+
+    return ConnectionPool(connect, error=FakeError, **options)  # type: ignore[arg-type]
+
+
+def test_pool_reuses_connections(connections):
+    pool = make_pool(connections, max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+
+    assert pool.statistics().connections_created == 1
+    assert pool.statistics().checkouts == 2
+
+
+def test_pool_times_out(connections):
+    pool = make_pool(connections, max_size=1, timeout=0.05)
+
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            pool.acquire()
+
+    assert pool.statistics().timeouts == 1
+
+
+def test_pool_recycles_stale_connections(connections):
+    pool = make_pool(connections, recycle=0.05)
+
+    with pool.connection() as first:
+        pass
+    time.sleep(0.1)
+    with pool.connection() as second:
+        assert second is not first
+
+    assert not first.open
+    assert pool.statistics().connections_recycled == 1
+
+    # Connections that fail their ping are replaced too
+    second.alive = False
+    with pool.connection() as third:
+        assert third is not second
+    assert pool.statistics().failed_pings == 1
+
+
+def test_pool_fills_on_first_use(connections):
+    pool = make_pool(connections, max_size=4, min_size=2)
+    assert connections == []
+
+    with pool.connection():
+        statistics = pool.statistics()
+    assert (statistics.open, statistics.in_use) == (2, 1)
+
+
+@pytest.fixture
+def database(tmp_path) -> Iterator[Database]:
+    """A database with a single connection, which requests give up waiting for quickly."""
+
+    database = Database(backend=SQLiteBackend(str(tmp_path / "pool.db")), pool_size=1, pool_timeout=0.1)
+    yield database
+    database.close()
+
+
+def test_exhausted_pool_is_unavailable(client: FlaskClient, database: Database, admin):
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        with database.connection():
+            held.set()
+            done.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    try:
+        response = client.get("/sample", query_string={"assay": "cosmx", "tissue": "liver"}, headers=admin)
+        assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    finally:
+        done.set()
+        thread.join()
+
+    response = client.get("/sample", query_string={"assay": "cosmx", "tissue": "liver"}, headers=admin)
+    assert response.status_code == HTTPStatus.NOT_FOUND
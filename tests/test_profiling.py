@@ -0,0 +1,101 @@
+import logging
+import time
+from datetime import datetime
+from typing import Iterator, List
+
+import pytest
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.backends import SQLiteBackend
+from autospatialqc_api.models.profiling import (ExplainCapture, OperationProfile, QueryHook, QueryProfiler,
+                                                SlowQueryLog, StatementProfile, parameter_shape)
+
+THRESHOLD = 0.05
+
+
+class SlowStatements(QueryHook):
+    """Makes the statements of chosen operations slow."""
+
+    def __init__(self, *operations: str):
+        self.operations = operations
+
+    def statement_executed(self, profile: OperationProfile, statement: StatementProfile):
+        if profile.operation in self.operations:
+            time.sleep(2 * THRESHOLD)
+
+
+class Recorder(QueryHook):
+    def __init__(self):
+        self.profiles: List[OperationProfile] = []
+
+    def finish_operation(self, profile: OperationProfile):
+        self.profiles.append(profile)
+
+
+@pytest.fixture
+def logger() -> logging.Logger:
+    return logging.getLogger("tests.slow_queries")
+
+
+@pytest.fixture
+def database(logger: logging.Logger) -> Iterator[Database]:
+    profiler = QueryProfiler([SlowStatements("get_sample"), SlowQueryLog(THRESHOLD, logger)])
+    database = Database(backend=SQLiteBackend(":memory:"), profiler=profiler)
+    yield database
+    database.close()
+
+
+def test_parameter_shape():
+    assert parameter_shape(None) is None
+    assert parameter_shape(("cosmx", 1, None, datetime.now())) == ["str", "int", "null", "datetime"]
+    assert parameter_shape({"assay": "cosmx"}) == {"assay": "str"}
+    assert parameter_shape(list(range(20)) + ["x"]) == {"length": 21, "types": ["int", "str"]}
+
+
+def test_slow_query_log(database: Database, make_sample, caplog):
+    database.add_sample(make_sample("liver"))
+
+    with caplog.at_level(logging.WARNING, logger="tests.slow_queries"):
+        database.list_samples()
+        database.get_sample("cosmx", "liver")
+
+    # Only the operation slower than the threshold is logged
+    [record] = caplog.records
+    assert record.event == "slow_query"  # type: ignore[attr-defined]
+    profile = record.query_profile  # type: ignore[attr-defined]
+    assert profile["operation"] == "get_sample"
+    assert profile["total_seconds"] >= THRESHOLD
+
+    # Statements are logged on one line, with the types of their parameters but not their values
+    [statement] = profile["statements"]
+    assert statement["sql"] == "SELECT * FROM samples WHERE assay = %s and tissue = %s"
+    assert statement["parameter_shape"] == ["str", "str"]
+    assert statement["rows"] == 1
+    assert "parameters" not in statement and "liver" not in str(profile)
+
+
+def test_explain_capture(make_sample):
+    recorder = Recorder()
+    database = Database(backend=SQLiteBackend(":memory:"), profiler=QueryProfiler([recorder]))
+    assert database.profiler is not None
+    database.profiler.hooks.insert(0, ExplainCapture(database, 0.0))
+
+    database.add_sample(make_sample("liver"))
+    database.get_sample("cosmx", "liver")
+
+    [statement] = recorder.profiles[-1].statements
+    assert statement.plan
+    database.close()
+
+
+def test_failing_hooks_are_ignored(make_sample, caplog):
+    class Failing(QueryHook):
+        def finish_operation(self, profile: OperationProfile):
+            raise RuntimeError()
+
+    database = Database(backend=SQLiteBackend(":memory:"), profiler=QueryProfiler([Failing()]))
+    database.add_sample(make_sample("liver"))
+
+    assert database.get_sample("cosmx", "liver").tissue == "liver"
+    assert any("Failing" in record.getMessage() for record in caplog.records)
+    database.close()
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from autospatialqc_api.models import Database, Sample
+from autospatialqc_api.models.qc import QCThresholds, score_samples
+from autospatialqc_api.models.stats import SampleStatistics
+
+
+def test_qc_flags_outliers(database: Database, make_sample):
+    database.add_samples([make_sample(f"tissue_{value}", value=value) for value in range(10, 20)])
+
+    # New samples are scored against the samples already in their assay
+    database.add_sample(make_sample("outlier", value=1000))
+    database.add_sample(make_sample("typical", value=15))
+    assert database.get_sample("cosmx", "outlier").qc_status == "fail"
+    assert database.get_sample("cosmx", "typical").qc_status == "pass"
+
+    # Re-scoring scores every sample, including those added before their assay was large enough
+    assert database.get_sample("cosmx", "tissue_10").qc_status is None
+    assert database.rescore_samples() == 12
+
+    statuses = {sample.tissue: sample.qc_status for sample in database.list_samples()}
+    assert statuses["outlier"] == "fail"
+    assert statuses["tissue_10"] == "pass"
+    assert database.get_sample("cosmx", "outlier").qc_flags == {field: "fail" for field in Sample.metric_fields()}
+
+
+def test_score_samples_thresholds(make_sample):
+    statistics = SampleStatistics(["area", "sparsity"])
+    statistics.rebuild(dict(make_sample(f"tissue_{value}", value=value)) for value in range(10, 20))
+    reference = statistics.reference("cosmx")
+
+    # The reference's median is 14.5 and its scaled median absolute deviation about 3.7
+    values = np.array([[14.5, 14.5], [29.0, 29.0], [55.0, 55.0]])
+    results = score_samples(values, reference, statistics.fields, QCThresholds(metrics={"sparsity": (10.0, 20.0)}))
+
+    assert [result.status for result in results] == ["pass", "warn", "fail"]
+    assert results[1].flags == {"area": "warn", "sparsity": "pass"}
+    assert results[2].flags == {"area": "fail", "sparsity": "warn"}
+
+    # Assays smaller than the minimum reference are not scored
+    assert score_samples(values, reference, statistics.fields, QCThresholds(min_reference=11))[2].status is None
+    assert score_samples(values, None, statistics.fields, QCThresholds())[2].status is None
+
+    with pytest.raises(ValidationError):
+        QCThresholds(metrics={"no_such_metric": (1.0, 2.0)})
@@ -0,0 +1,67 @@
+from http import HTTPStatus
+
+from flask.testing import FlaskClient
+
+
+def test_login(client: FlaskClient):
+    response = client.post("/login", json={"email": "admin@example.com", "password": "wrong-password"})
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+    response = client.get("/sample", query_string={"assay": "cosmx", "tissue": "liver"})
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_sample_lifecycle(client: FlaskClient, admin, sample_data):
+    key = {"assay": "cosmx", "tissue": "liver"}
+
+    assert client.post("/sample", json=sample_data("liver"), headers=admin).status_code == HTTPStatus.OK
+    assert client.post("/sample", json=sample_data("liver"), headers=admin).status_code == HTTPStatus.CONFLICT
+
+    response = client.get("/sample", query_string=key, headers=admin)
+    assert response.status_code == HTTPStatus.OK
+    assert response.get_json()["tissue"] == "liver"
+
+    assert client.delete("/sample", query_string=key, headers=admin).status_code == HTTPStatus.OK
+    assert client.get("/sample", query_string=key, headers=admin).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_permissions(client: FlaskClient, reader, sample_data):
+    assert client.post("/sample", json=sample_data("liver"), headers=reader).status_code == HTTPStatus.UNAUTHORIZED
+    response = client.post(
+        "/create-user",
+        json={
+            "email": "new@example.com",
+            "password": "password",
+            "permissions": [],
+            "first_name": "New",
+            "last_name": "User",
+        },
+        headers=reader,
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_create_user(client: FlaskClient, admin, login):
+    user = {
+        "email": "new@example.com",
+        "password": "new-password",
+        "permissions": ["get_sample"],
+        "first_name": "New",
+        "last_name": "User",
+    }
+
+    assert client.post("/create-user", json=user, headers=admin).status_code == HTTPStatus.OK
+    assert client.post("/create-user", json=user, headers=admin).status_code == HTTPStatus.CONFLICT
+    login("new@example.com", "new-password")
+
+
+def test_metrics(client: FlaskClient):
+    assert client.get("/metrics").status_code == HTTPStatus.UNAUTHORIZED
+
+    # Methods outside the fixed set share one label value
+    client.open("/sample", method="PROPFIND")
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer metrics-token"})
+    assert response.status_code == HTTPStatus.OK
+    assert 'method="<other>"' in response.get_data(as_text=True)
+    assert 'method="PROPFIND"' not in response.get_data(as_text=True)
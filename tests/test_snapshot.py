@@ -0,0 +1,144 @@
+import io
+import os
+from http import HTTPStatus
+
+import flask
+import numpy as np
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.sample import SampleUpdate
+from autospatialqc_api.models.snapshot import SampleSnapshot
+
+
+def set_updated_at(database: Database, tissue: str, updated_at: str):
+    """Backdate a sample, as if its write had committed long after it was made."""
+
+    with database.connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE samples SET updated_at = %s WHERE tissue = %s", (updated_at, tissue))
+        connection.commit()
+
+
+def assert_matches(snapshot: SampleSnapshot, database: Database):
+    columns = snapshot.load()
+    rows = sorted(database.iter_samples(columns=["id", "tissue", "area", "updated_at"]), key=lambda row: row["id"])
+
+    assert columns["id"].tolist() == [row["id"] for row in rows]
+    assert columns["tissue"].tolist() == [row["tissue"] for row in rows]
+    assert columns["area"].tolist() == [row["area"] for row in rows]
+    assert snapshot.manifest().rows == len(rows)  # type: ignore[union-attr]
+
+
+def test_incremental_refresh(database: Database, make_sample, tmp_path):
+    snapshot = SampleSnapshot(str(tmp_path), compact_ratio=10.0)
+    database.add_samples([make_sample(f"tissue_{index}") for index in range(10)])
+
+    manifest = snapshot.refresh(database)
+    assert (manifest.generation, len(manifest.segments), manifest.rows) == (0, 1, 10)
+    assert_matches(snapshot, database)
+    assert isinstance(snapshot.load()["area"], np.memmap)
+
+    # Nothing changed, so nothing is written
+    assert snapshot.refresh(database) == manifest
+
+    database.add_sample(make_sample("added"))
+    database.update_sample("cosmx", "tissue_3", SampleUpdate(area=9.0))
+    deleted_id = database.get_sample("cosmx", "tissue_5").id
+    database.delete_sample("cosmx", "tissue_5")
+    manifest = snapshot.refresh(database)
+
+    # Only the changed rows are written, with the ids of deleted ones
+    [base, delta] = manifest.segments
+    assert (manifest.generation, base.generation, delta.generation) == (1, 0, 1)
+    assert delta.rows == 2 and delta.deleted is not None
+    assert np.load(snapshot.path(delta.deleted)).tolist() == [deleted_id]
+    assert_matches(snapshot, database)
+
+    # A refresh from scratch gives the same snapshot as a single segment
+    manifest = snapshot.refresh(database, full=True)
+    assert len(manifest.segments) == 1
+    assert_matches(snapshot, database)
+
+
+def test_late_commits(database: Database, make_sample, tmp_path):
+    snapshot = SampleSnapshot(str(tmp_path), compact_ratio=10.0)
+    database.add_sample(make_sample("early"))
+    snapshot.refresh(database)
+
+    # Rows whose writes committed after the watermark passed them
+    database.add_samples([make_sample("late"), make_sample("later")])
+    set_updated_at(database, "late", "2000-01-01 00:00:00.000")
+    database.update_sample("cosmx", "early", SampleUpdate(area=2.0))
+    manifest = snapshot.refresh(database)
+
+    assert manifest.segments[-1].rows == 3
+    assert_matches(snapshot, database)
+
+    # Updates behind the watermark are picked up within the lookback
+    set_updated_at(database, "later", "2000-01-01 00:00:00.000")
+    manifest = snapshot.refresh(database)
+    database.update_sample("cosmx", "later", SampleUpdate(area=3.0))
+    assert manifest.watermark is not None
+    set_updated_at(database, "later", str(manifest.watermark.replace(microsecond=0)))
+    snapshot.refresh(database, lookback=5.0)
+    assert_matches(snapshot, database)
+
+
+def test_compaction(database: Database, make_sample, tmp_path):
+    snapshot = SampleSnapshot(str(tmp_path), max_segments=3, compact_ratio=10.0)
+    database.add_samples([make_sample(f"tissue_{index}") for index in range(4)])
+    snapshot.refresh(database)
+
+    for index in range(2):
+        database.update_sample("cosmx", f"tissue_{index}", SampleUpdate(area=5.0))
+        manifest = snapshot.refresh(database)
+    assert [segment.generation for segment in manifest.segments] == [0, 1, 2]
+
+    # A fourth segment would exceed the maximum, so the segments are merged
+    database.delete_sample("cosmx", "tissue_3")
+    manifest = snapshot.refresh(database)
+    assert [segment.generation for segment in manifest.segments] == [3]
+    assert_matches(snapshot, database)
+
+    # Only the files of this and the previous manifest are kept
+    assert {file.split(".")[1] for file in os.listdir(tmp_path) if file.endswith(".npy")} == {"0", "1", "2", "3"}
+    database.add_sample(make_sample("added"))
+    snapshot.refresh(database)
+    assert {file.split(".")[1] for file in os.listdir(tmp_path) if file.endswith(".npy")} == {"3", "4"}
+
+    # Many changed rows are merged too
+    snapshot = SampleSnapshot(str(tmp_path), compact_ratio=0.25)
+    database.update_sample("cosmx", "tissue_0", SampleUpdate(area=6.0))
+    database.update_sample("cosmx", "tissue_1", SampleUpdate(area=6.0))
+    assert len(snapshot.refresh(database).segments) == 1
+    assert_matches(snapshot, database)
+
+
+def test_snapshot_routes(app: flask.Flask, client: FlaskClient, database: Database, admin, sample_data):
+    assert client.get("/samples/snapshot", headers=admin).status_code == HTTPStatus.NOT_FOUND
+
+    client.post("/samples/batch", json=[sample_data(f"tissue_{index}") for index in range(8)], headers=admin)
+    snapshot: SampleSnapshot = app.extensions["sample_snapshot"]
+    snapshot.refresh(database)
+    client.delete("/sample", query_string={"assay": "cosmx", "tissue": "tissue_2"}, headers=admin)
+    snapshot.refresh(database)
+
+    manifest = client.get("/samples/snapshot", headers=admin).get_json()
+    assert (manifest["generation"], manifest["rows"], len(manifest["segments"])) == (1, 7, 2)
+
+    # Columns are merged from every segment
+    response = client.get("/samples/snapshot/tissue", headers=admin)
+    assert "tissue_2" not in np.load(io.BytesIO(response.get_data())).tolist()
+    assert len(np.load(io.BytesIO(response.get_data()))) == 7
+
+    # A segment's files can be cached
+    response = client.get("/samples/snapshot/deleted", query_string={"generation": 1}, headers=admin)
+    assert response.status_code == HTTPStatus.OK
+    assert response.cache_control.immutable
+    assert len(np.load(io.BytesIO(response.get_data()))) == 1
+
+    response = client.get("/samples/snapshot/area", query_string={"generation": 7}, headers=admin)
+    assert response.status_code == HTTPStatus.GONE
+    assert client.get("/samples/snapshot/deleted", headers=admin).status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/samples/snapshot/password", headers=admin).status_code == HTTPStatus.NOT_FOUND
@@ -0,0 +1,51 @@
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.errors import SampleNotFound
+from autospatialqc_api.models.sample import SampleUpdate
+
+
+def test_sample_statistics(database: Database, make_sample):
+    database.add_samples([make_sample(f"tissue_{value}", value=value) for value in range(1, 6)])
+    database.add_sample(make_sample("liver", assay="visium"))
+
+    (summary,) = database.sample_statistics("cosmx")
+    assert summary.count == 5
+    assert summary.metrics["area"].median == 3.0
+    assert summary.metrics["area"].maximum == 5.0
+
+    ranks = database.percentile_ranks("cosmx", "tissue_5")
+    assert ranks.count == 5
+    assert ranks.ranks["area"] == 90.0
+    assert database.percentile_ranks("cosmx", "tissue_1").ranks["area"] == 10.0
+
+    with pytest.raises(SampleNotFound):
+        database.percentile_ranks("cosmx", "liver")
+
+
+def test_sample_statistics_follow_writes(database: Database, make_sample):
+    database.add_sample(make_sample("liver"))
+    assert database.sample_statistics("cosmx")[0].count == 1
+
+    database.add_samples([make_sample("lung"), make_sample("heart")])
+    database.delete_sample("cosmx", "liver")
+    database.update_sample("cosmx", "lung", SampleUpdate(area=9.0))
+
+    (summary,) = database.sample_statistics("cosmx")
+    assert summary.count == 2
+    assert summary.metrics["area"].maximum == 9.0
+
+
+def test_statistics_routes(client: FlaskClient, admin, sample_data):
+    for value in range(1, 6):
+        client.post("/sample", json=sample_data(f"tissue_{value}", value=value), headers=admin)
+
+    (summary,) = client.get("/samples/stats", headers=admin).get_json()["assays"]
+    assert summary["count"] == 5
+    assert summary["metrics"]["area"]["median"] == 3.0
+
+    response = client.get(
+        "/samples/stats/percentiles", query_string={"assay": "cosmx", "tissue": "tissue_1"}, headers=admin
+    )
+    assert response.get_json()["ranks"]["area"] == 10.0
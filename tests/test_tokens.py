@@ -0,0 +1,54 @@
+from http import HTTPStatus
+
+import flask
+from flask.testing import FlaskClient
+from flask_jwt_extended import create_access_token, decode_token
+
+from autospatialqc_api.models import Permissions
+
+KEY = {"assay": "cosmx", "tissue": "liver"}
+
+
+def test_compact_claims(app: flask.Flask, client: FlaskClient, admin, sample_data):
+    with app.app_context():
+        claims = decode_token(admin["Authorization"].split(" ", 1)[1])
+
+    assert isinstance(claims["sub"], str)
+    assert claims["eml"] == "admin@example.com"
+    assert Permissions(claims["prm"]) & Permissions.CREATE_USER
+
+    # Repeated requests with one token are served from the decoded users
+    assert client.post("/sample", json=sample_data("liver"), headers=admin).status_code == HTTPStatus.OK
+    assert client.get("/sample", query_string=KEY, headers=admin).status_code == HTTPStatus.OK
+
+
+def test_legacy_token_still_authorizes(app: flask.Flask, client: FlaskClient, admin, sample_data):
+    client.post("/sample", json=sample_data("liver"), headers=admin)
+
+    # Tokens issued before the compact claims had the whole user as their subject
+    with app.app_context():
+        token = create_access_token(
+            identity={
+                "id": 2,
+                "email": "reader@example.com",
+                "permissions": int(Permissions.GET_SAMPLE),
+                "authenticated": True,
+                "first_name": "Rey",
+                "last_name": "Reader",
+            }
+        )
+    legacy = {"Authorization": f"Bearer {token}"}
+
+    response = client.get("/sample", query_string=KEY, headers=legacy)
+    assert response.status_code == HTTPStatus.OK
+    assert response.get_json()["tissue"] == "liver"
+
+    assert client.post("/sample", json=sample_data("lung"), headers=legacy).status_code == HTTPStatus.UNAUTHORIZED
+
+
+def test_malformed_claims(app: flask.Flask, client: FlaskClient):
+    with app.app_context():
+        token = create_access_token(identity="1", additional_claims={"ver": 2})
+
+    response = client.get("/sample", query_string=KEY, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
@@ -0,0 +1,55 @@
+from http import HTTPStatus
+
+import pytest
+from flask.testing import FlaskClient
+
+from autospatialqc_api.models import Database
+from autospatialqc_api.models.errors import SampleNotFound
+from autospatialqc_api.models.sample import SampleUpdate
+
+
+def test_upsert_overwrites_sample(database: Database, make_sample):
+    database.add_sample(make_sample("liver", area=1.0))
+    database.add_sample(make_sample("liver", area=3.0), upsert=True)
+
+    sample = database.get_sample("cosmx", "liver")
+    assert sample.area == 3.0
+    assert sample.version == 2
+
+
+def test_update_sample(database: Database, make_sample):
+    database.add_sample(make_sample("liver"))
+    database.update_sample("cosmx", "liver", SampleUpdate(area=4.0))
+
+    sample = database.get_sample("cosmx", "liver")
+    assert sample.area == 4.0
+    assert sample.complexity == 1.0
+    assert sample.version == 2
+    assert sample.qc_status is None
+
+    sample_id, version, updated_at = database.get_sample_version("cosmx", "liver")
+    assert (sample_id, version, updated_at) == (sample.id, sample.version, sample.updated_at)
+
+    with pytest.raises(SampleNotFound):
+        database.update_sample("cosmx", "lung", SampleUpdate(area=4.0))
+    with pytest.raises(ValueError):
+        database.update_sample("cosmx", "liver", SampleUpdate())
+
+
+def test_patch_and_upsert_routes(client: FlaskClient, admin, sample_data):
+    key = {"assay": "cosmx", "tissue": "liver"}
+    assert client.post("/sample", json=sample_data("liver"), headers=admin).status_code == HTTPStatus.OK
+
+    assert client.patch("/sample", query_string=key, json={"area": 7.0}, headers=admin).status_code == HTTPStatus.OK
+    assert client.get("/sample", query_string=key, headers=admin).get_json()["area"] == 7.0
+
+    response = client.post("/sample", query_string={"upsert": "true"}, json=sample_data("liver"), headers=admin)
+    assert response.status_code == HTTPStatus.OK
+    assert client.get("/sample", query_string=key, headers=admin).get_json()["area"] == 1.0
+
+    response = client.patch("/sample", query_string=key, json={}, headers=admin)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    response = client.patch("/sample", query_string=key, json={"area": "large"}, headers=admin)
+    assert response.status_code == HTTPStatus.BAD_REQUEST
+    response = client.patch("/sample", query_string={**key, "tissue": "lung"}, json={"area": 7.0}, headers=admin)
+    assert response.status_code == HTTPStatus.NOT_FOUND